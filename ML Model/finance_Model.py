@@ -33,14 +33,14 @@ TARGET = "max_possible_saving"
 X = df[FEATURES].copy()
 y = df[TARGET].astype(float).copy()
 
- works.
 X_train, X_test, y_train, y_test = train_test_split(
     X, y, test_size=max(1, int(0.2 * len(df))), random_state=42
 )
 
+model = Pipeline(
     steps=[
         ("scaler", StandardScaler()),
-        ("ridge", RidgeCV(alphas=(0.1, 1.0, 10.0, 100.0), store_cv_values=True)),
+        ("ridge", RidgeCV(alphas=(0.1, 1.0, 10.0, 100.0))),
     ]
 )
 
@@ -48,7 +48,7 @@ model.fit(X_train, y_train)
 
 preds = model.predict(X_test)
 mae = mean_absolute_error(y_test, preds)
-rmse = mean_squared_error(y_test, preds, squared=False)
+rmse = np.sqrt(mean_squared_error(y_test, preds))
 r2 = r2_score(y_test, preds)
 
 print("== Test Metrics ==")
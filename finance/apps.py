@@ -6,12 +6,20 @@ class FinanceConfig(AppConfig):
     name = 'finance'
 
     def ready(self):
-        # Import signals to enable automatic MongoDB syncing
-        try:
-            from . import signals  # noqa: F401
-        except Exception:
-            # Fail-safe: do not block Django startup if Mongo sync wiring fails
-            pass
+        # Keep ledger rollups in step with every CashTransaction write
+        from . import ledger  # noqa: F401
+
+        # Categorize transactions from their description when they are saved
+        from . import categories  # noqa: F401
+
+        # Flag the savings-model feature months a write touches
+        from . import features  # noqa: F401
+
+        # Drop cached savings predictions of those months
+        from . import prediction_cache  # noqa: F401
+
+        # Queue MongoDB sync through the outbox; pymongo is only needed by the worker
+        from . import signals  # noqa: F401
 
 
 
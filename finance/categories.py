@@ -0,0 +1,151 @@
+"""
+Server-side transaction categorization.
+
+The keyword rules are the same `transaction_keywords` the AI agent page
+uses (static/config/openai_config.json), with the same semantics: a
+case-insensitive substring match, the first category in config order wins,
+and anything unmatched is 'other'. Each category's keywords are compiled
+into a single regex trie (shared prefixes factored out), so a description
+costs one C-level search per category instead of a Python loop over every
+keyword. The category is stored on CashTransaction when it is saved;
+backfill() categorizes rows that predate the column (migration 0011 runs
+it, and `manage.py categorize_transactions` re-runs it after keyword edits).
+"""
+import json
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CashTransaction
+
+
+CONFIG_PATH = 'static/config/openai_config.json'
+OTHER = 'other'
+
+# Used when the config file is missing; mirrors the fallback in ai-agent.js
+DEFAULT_KEYWORDS = {
+    'food': ['restaurant', 'grocery', 'food', 'dining', 'meal'],
+    'transport': ['gas', 'fuel', 'uber', 'taxi', 'transport'],
+    'entertainment': ['movie', 'cinema', 'game', 'entertainment'],
+    'shopping': ['store', 'shop', 'amazon', 'purchase'],
+    'utilities': ['electric', 'water', 'internet', 'phone'],
+}
+
+
+def load_keywords(path=CONFIG_PATH):
+    try:
+        with open(os.path.join(settings.BASE_DIR, path), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return DEFAULT_KEYWORDS
+    return (config.get('openai') or {}).get('transaction_keywords') or config.get('transaction_keywords') or DEFAULT_KEYWORDS
+
+
+def trie_pattern(words):
+    """Compile words into one regex with shared prefixes factored out"""
+    trie = {}
+    for word in filter(None, words):
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        if list(node) == ['']:
+            return ''
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # A keyword ends here; the empty match is enough for substring semantics
+            return f'(?:{pattern})?'
+        return pattern
+
+    return build(trie)
+
+
+class Categorizer:
+    """Map descriptions to categories with one compiled regex trie per category"""
+
+    def __init__(self, keywords):
+        # Checked in config order, so the first matching category wins like in
+        # ai-agent.js; lowercasing once is cheaper than re.IGNORECASE.
+        self.rules = [
+            (category, re.compile(trie_pattern([w.lower() for w in words])))
+            for category, words in keywords.items()
+            if any(words)
+        ]
+
+    def categorize(self, text):
+        if not text:
+            return OTHER
+        text = text.lower()
+        for category, regex in self.rules:
+            if regex.search(text):
+                return category
+        return OTHER
+
+    def categorize_many(self, texts):
+        categorize = self.categorize
+        return [categorize(text) for text in texts]
+
+
+@lru_cache(maxsize=1)
+def default_categorizer():
+    return Categorizer(load_keywords())
+
+
+def categorize(text):
+    return default_categorizer().categorize(text)
+
+
+def backfill(model=CashTransaction, batch_size=5000, dry_run=False, on_change=None, categorizer=None):
+    """Recategorize every row of `model` from its description in pk-ordered chunks; returns (scanned, changed)
+
+    Each chunk runs one UPDATE per category it moves rows into, and moves
+    updated_at too, so `export_to_mongo --since-last-run` picks the rows up.
+    update() skips post_save, so `on_change(created_ats)` is called inside
+    each chunk's transaction with the changed rows' timestamps. `model` may
+    be a migration's historical model.
+    """
+    categorizer = categorizer or default_categorizer()
+    scanned = changed = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'description', 'category', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return scanned, changed
+        last_pk = rows[-1][0]
+        scanned += len(rows)
+
+        moves = defaultdict(list)
+        created = []
+        for (pk, _, old, created_at), category in zip(rows, categorizer.categorize_many(row[1] for row in rows)):
+            if old != category:
+                moves[category].append(pk)
+                created.append(created_at)
+        changed += len(created)
+        if dry_run or not created:
+            continue
+        now = timezone.now()
+        with transaction.atomic():
+            for category, pks in moves.items():
+                model.objects.filter(pk__in=pks).update(category=category, updated_at=now)
+            if on_change is not None:
+                on_change(created)
+
+
+@receiver(pre_save, sender=CashTransaction, dispatch_uid='finance.categories.assign_category')
+def assign_category(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.category = categorize(instance.description)
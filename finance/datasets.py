@@ -0,0 +1,190 @@
+"""
+Columnar storage for the savings-model dataset.
+
+convert() streams a CSV (or another supported file) into Parquet or Arrow
+IPC with the FEATURES and target columns as float32. load_frame() and
+iter_frames() read any of the formats by file suffix:
+
+- .arrow / .feather (Arrow IPC, uncompressed): memory-mapped, and every
+  column is a zero-copy NumPy view of the mapped file, so loading costs
+  page faults rather than parsing and the pages are shared between
+  processes.
+- .parquet: smaller on disk; read with memory_map=True, but pages still have
+  to be decoded into fresh buffers.
+- .csv: parsed with pandas, as before.
+
+pyarrow is optional and imported only for the columnar formats.
+"""
+from pathlib import Path
+
+from .features import FEATURES, TARGET
+
+
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+
+
+class DatasetError(Exception):
+    """Raised when a dataset file cannot be read, written or lacks the model columns"""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise DatasetError('Parquet and Arrow datasets need pyarrow (pip install pyarrow)')
+    return pyarrow
+
+
+def file_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in ARROW_SUFFIXES:
+        return 'arrow'
+    if suffix in PARQUET_SUFFIXES:
+        return 'parquet'
+    return 'csv'
+
+
+def model_columns(target=TARGET):
+    """FEATURES plus the target column; just FEATURES when `target` is None (inference inputs)"""
+    return FEATURES + [target] if target else list(FEATURES)
+
+
+def _check_columns(available, columns, path):
+    missing = [name for name in columns if name not in available]
+    if missing:
+        raise DatasetError(f'{path} is missing columns: {", ".join(missing)}')
+
+
+def _arrow_table(path, columns):
+    """The Arrow IPC file at `path` as a memory-mapped table (no copy)"""
+    pa = _pyarrow()
+    try:
+        table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+    except (OSError, pa.ArrowInvalid) as e:
+        raise DatasetError(f'Cannot read {path}: {e}')
+    _check_columns(table.column_names, columns, path)
+    return table.select(columns)
+
+
+def _to_frame(table):
+    """DataFrame over an Arrow table; numeric columns without nulls stay zero-copy"""
+    import pandas as pd
+
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if column.num_chunks == 1 and column.null_count == 0:
+            columns[name] = column.chunk(0).to_numpy(zero_copy_only=True)
+        else:
+            columns[name] = column.to_numpy()
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_frame(path, target=TARGET):
+    """FEATURES (+ target unless None) from `path` as a float32 DataFrame"""
+    import numpy as np
+    import pandas as pd
+
+    path = Path(path)
+    columns = model_columns(target)
+    fmt = file_format(path)
+    if fmt == 'arrow':
+        return _to_frame(_arrow_table(path, columns))
+    if fmt == 'parquet':
+        pa = _pyarrow()
+        try:
+            table = pa.parquet.read_table(path, columns=columns, memory_map=True)
+        except (OSError, pa.ArrowInvalid) as e:
+            raise DatasetError(f'Cannot read {path}: {e}')
+        return _to_frame(table.combine_chunks())
+    try:
+        frame = pd.read_csv(path, usecols=columns, dtype=np.float32)
+    except OSError as e:
+        raise DatasetError(f'Cannot read {path}: {e}')
+    except ValueError as e:
+        raise DatasetError(f'{path} does not have the columns {", ".join(columns)}: {e}')
+    return frame[columns]
+
+
+def iter_frames(path, chunksize, target=TARGET):
+    """Yield DataFrames of FEATURES (+ target unless None) from `path`, about `chunksize` rows each"""
+    import numpy as np
+    import pandas as pd
+
+    path = Path(path)
+    columns = model_columns(target)
+    fmt = file_format(path)
+    if fmt == 'arrow':
+        # Slices of the mapped table; nothing is read until a chunk is touched
+        for batch in _arrow_table(path, columns).to_batches(max_chunksize=chunksize):
+            yield _to_frame(_pyarrow().Table.from_batches([batch]))
+        return
+    if fmt == 'parquet':
+        pa = _pyarrow()
+        try:
+            parquet = pa.parquet.ParquetFile(path, memory_map=True)
+        except (OSError, pa.ArrowInvalid) as e:
+            raise DatasetError(f'Cannot read {path}: {e}')
+        _check_columns(parquet.schema_arrow.names, columns, path)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield _to_frame(pa.Table.from_batches([batch]))
+        return
+    try:
+        for chunk in pd.read_csv(path, chunksize=chunksize, usecols=columns, dtype=np.float32):
+            yield chunk[columns]
+    except OSError as e:
+        raise DatasetError(f'Cannot read {path}: {e}')
+    except ValueError as e:
+        raise DatasetError(f'{path} does not have the columns {", ".join(columns)}: {e}')
+
+
+def convert(source, dest, target=TARGET, chunksize=None, compression='zstd'):
+    """Write `source` to `dest` (.parquet or .arrow) as float32 columns; returns the row count
+
+    Parquet is streamed with one row group per `chunksize` rows (default
+    1,000,000) and `compression`. Arrow IPC is written uncompressed so it can
+    be memory-mapped, and by default as a single record batch: every column
+    is then one contiguous buffer that load_frame() maps without copying,
+    at the cost of holding the float32 table in memory once while
+    converting. Pass `chunksize` to stream Arrow in batches instead;
+    iter_frames() stays zero-copy, but load_frame() then has to concatenate.
+    """
+    import numpy as np
+
+    pa = _pyarrow()
+    dest = Path(dest)
+    fmt = file_format(dest)
+    if fmt == 'csv':
+        raise DatasetError(
+            f'Write Parquet ({", ".join(PARQUET_SUFFIXES)}) or Arrow ({", ".join(ARROW_SUFFIXES)}), '
+            f'not {dest.suffix or "no suffix"}'
+        )
+    columns = model_columns(target)
+    schema = pa.schema([(name, pa.float32()) for name in columns])
+    if fmt == 'arrow' and not chunksize:
+        frames = [load_frame(source, target)]
+    else:
+        frames = iter_frames(source, chunksize or 1000000, target)
+    staging = dest.with_name(dest.name + '.tmp')
+    rows = 0
+    try:
+        if fmt == 'parquet':
+            writer = pa.parquet.ParquetWriter(staging, schema, compression=compression)
+        else:
+            writer = pa.ipc.new_file(str(staging), schema)
+        with writer:
+            for frame in frames:
+                table = pa.Table.from_pandas(frame.astype(np.float32), schema=schema, preserve_index=False)
+                if fmt == 'parquet':
+                    writer.write_table(table, row_group_size=len(table))
+                else:
+                    writer.write_table(table)
+                rows += len(frame)
+        staging.replace(dest)
+    except OSError as e:
+        raise DatasetError(f'Cannot write {dest}: {e}')
+    finally:
+        staging.unlink(missing_ok=True)
+    return rows
@@ -0,0 +1,116 @@
+"""
+Watermarks and tombstones for the incremental (--since-last-run) Mongo exports.
+
+Each exported collection keeps a high-watermark on a change column
+(updated_at, or pk for append-only tables). The next run only reads rows at
+or after it; re-sending boundary rows is harmless because exports upsert on
+a stable key. Once any watermark exists, deleted rows leave an ExportTombstone
+so deletes replicate too; tombstones no incremental export will read are
+pruned after each run.
+"""
+from datetime import timedelta
+
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import mongo_sync
+from .models import ExportTombstone, ExportWatermark
+
+
+# Rows saved just before a run starts may commit after it has read past them;
+# overlapping runs by this much keeps them from being skipped.
+SAFETY_MARGIN = timedelta(minutes=5)
+
+
+def ensure_watermarks(names):
+    """Create missing watermarks before a first incremental run reads anything
+
+    Deletes during that run then already leave tombstones. Commands call
+    this on the main thread, so export worker threads only read watermarks.
+    """
+    existing = set(ExportWatermark.objects.filter(name__in=names).values_list('name', flat=True))
+    ExportWatermark.objects.bulk_create(
+        [ExportWatermark(name=name) for name in names if name not in existing], ignore_conflicts=True,
+    )
+
+
+def changed_since_last_run(queryset, name, field):
+    """Filter `queryset` to rows changed since the watermark `name`
+
+    Returns (queryset, commit) where commit() advances the watermark and must
+    only be called once the rows were exported successfully.
+    """
+    mark = ExportWatermark.objects.filter(name=name).first() or ExportWatermark(name=name)
+
+    if field == 'pk':
+        if mark.last_pk is not None:
+            queryset = queryset.filter(pk__gt=mark.last_pk)
+        highest = queryset.aggregate(highest=Max('pk'))['highest']
+
+        def commit():
+            if highest is not None:
+                ExportWatermark.objects.update_or_create(name=name, defaults={'last_pk': highest})
+        return queryset, commit
+
+    if mark.value is not None:
+        queryset = queryset.filter(**{f'{field}__gte': mark.value})
+    started = timezone.now()
+
+    def commit():
+        ExportWatermark.objects.update_or_create(name=name, defaults={'value': started - SAFETY_MARGIN})
+    return queryset, commit
+
+
+def record_tombstone(instance):
+    """Remember a deleted row for the next incremental export
+
+    Deployments that never run an export with --since-last-run have no
+    watermarks, and full exports don't read tombstones, so nothing is
+    recorded for them.
+    """
+    if not ExportWatermark.objects.exists():
+        return
+    database, collection = mongo_sync.target_for(instance)
+    ExportTombstone.objects.create(database=database, collection=collection, key={'django_id': instance.pk})
+
+
+def record_payment_tombstones(items):
+    """Remember the payment documents of (item, paid_at) pairs whose payment was undone or deleted
+
+    The derived `transactions` collection is keyed on the item and the time
+    it was paid, so the caller passes the paid_at the document was built from.
+    """
+    items = [(item, paid_at) for item, paid_at in items if paid_at is not None]
+    if not items or not ExportWatermark.objects.exists():
+        return
+    database, collection = mongo_sync.bill_split_collection('transactions')
+    ExportTombstone.objects.bulk_create([
+        ExportTombstone(database=database, collection=collection,
+                        key={'transaction_id': mongo_sync.payment_transaction_id(item.pk, paid_at)})
+        for item, paid_at in items
+    ])
+
+
+def prune_tombstones():
+    """Delete tombstones older than every watermark; returns how many were removed
+
+    Each incremental run clears its own collection's tombstones, so any left
+    from before the oldest run belong to collections no incremental export
+    reads.
+    """
+    oldest = ExportWatermark.objects.aggregate(oldest=Min('updated_at'))['oldest']
+    if oldest is None:
+        return ExportTombstone.objects.all().delete()[0]
+    return ExportTombstone.objects.filter(deleted_at__lt=oldest).delete()[0]
+
+
+def apply_tombstones(database, collection, writer):
+    """Queue deletes for pending tombstones on `writer`; returns a callable that clears them"""
+    tombstones = list(ExportTombstone.objects.filter(database=database, collection=collection))
+    for tombstone in tombstones:
+        writer.delete(tombstone.key)
+
+    def clear():
+        ExportTombstone.objects.filter(pk__in=[t.pk for t in tombstones]).delete()
+        prune_tombstones()
+    return clear
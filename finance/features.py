@@ -0,0 +1,270 @@
+"""
+Monthly feature store for the savings model.
+
+Computes the FEATURES vector of `ML Model/finance_Model.py` for every
+calendar month of the cash ledger with vectorized pandas groupbys and keeps
+it in SavingsFeatures, which both training and inference read.
+
+CashTransaction writes only mark their month (and the next one, since
+`recurring_amount` and `carry_forward_balance` look one month back) dirty;
+refresh_features() then recomputes just the dirty months from one range
+scan. pandas/numpy are imported when features are computed, so the web
+process does not pay for them on every save.
+"""
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import CashTransaction, SavingsFeatures
+
+
+FEATURES = [
+    "income",
+    "total_spend",
+    "food_ratio",
+    "shopping_ratio",
+    "subscriptions_ratio",
+    "essential_ratio",
+    "spend_variability",
+    "avg_txn_size",
+    "txn_count",
+    "recurring_amount",
+    "end_of_month_spike",
+    "emi",
+    "carry_forward_balance",
+]
+TARGET = "max_possible_saving"
+# Observed saving stored next to the features. It is income - total_spend of
+# the same month, so ledger-trained models predict the *next* month's value.
+LEDGER_TARGET = "net_saving"
+LEDGER_FORECAST_TARGET = "next_month_net_saving"
+
+ESSENTIAL_CATEGORIES = ('food', 'transport', 'utilities', 'healthcare', 'housing', 'education')
+SUBSCRIPTION_PATTERN = r'\b(?:subscription|netflix|spotify|prime|hotstar|youtube premium|membership)\b'
+EMI_PATTERN = r'\b(?:emi|loan|instal?lment)\b'
+# A month "spikes" when its last SPIKE_DAYS average SPIKE_FACTOR times its daily spend
+SPIKE_DAYS = 5
+SPIKE_FACTOR = 1.5
+
+# Sent by mark_dirty() with the set of months whose features are now stale
+feature_months_dirtied = Signal()
+
+
+def month_start(created_at, tz=None):
+    if timezone.is_aware(created_at):
+        created_at = created_at.astimezone(tz or timezone.get_current_timezone())
+    return created_at.date().replace(day=1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def previous_month(month):
+    return date(month.year - (month.month == 1), (month.month - 2) % 12 + 1, 1)
+
+
+def mark_dirty(months):
+    """Flag the months (and the months after them) for recomputation, in one upsert"""
+    dirty = set()
+    for month in months:
+        dirty.update((month, next_month(month)))
+    if not dirty:
+        return 0
+    now = timezone.now()
+    SavingsFeatures.objects.bulk_create(
+        [SavingsFeatures(month=month, dirty_at=now) for month in dirty],
+        update_conflicts=True,
+        unique_fields=['month'],
+        update_fields=['dirty_at'],
+    )
+    feature_months_dirtied.send(sender=SavingsFeatures, months=dirty)
+    return len(dirty)
+
+
+def mark_dirty_for(transactions):
+    """mark_dirty() for the months of many transactions; for bulk write paths"""
+    tz = timezone.get_current_timezone()
+    return mark_dirty({month_start(tx.created_at, tz) for tx in transactions})
+
+
+@receiver(post_save, sender=CashTransaction, dispatch_uid='finance.features.mark_saved_month')
+def mark_saved_month(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    months = {month_start(instance.created_at)}
+    # Set by finance.ledger before the save; an edit may move the row to another month
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is not None:
+        months.add(month_start(previous[0]))
+    mark_dirty(months)
+
+
+@receiver(post_delete, sender=CashTransaction, dispatch_uid='finance.features.mark_deleted_month')
+def mark_deleted_month(sender, instance, **kwargs):
+    mark_dirty([month_start(instance.created_at)])
+
+
+def _month_ranges(months):
+    """Collapse months into [start, end) datetime ranges of consecutive months"""
+    ranges = []
+    for month in sorted(months):
+        if ranges and ranges[-1][1] == month:
+            ranges[-1][1] = next_month(month)
+        else:
+            ranges.append([month, next_month(month)])
+    tz = timezone.get_current_timezone()
+    return [
+        (timezone.make_aware(datetime(s.year, s.month, 1), tz),
+         timezone.make_aware(datetime(e.year, e.month, 1), tz))
+        for s, e in ranges
+    ]
+
+
+def load_transactions(months=None):
+    """CashTransactions of `months` (all when None) as a DataFrame"""
+    import pandas as pd
+
+    queryset = CashTransaction.objects.order_by()
+    if months is not None:
+        condition = Q()
+        for start, end in _month_ranges(months):
+            condition |= Q(created_at__gte=start, created_at__lt=end)
+        queryset = queryset.filter(condition)
+    columns = ['created_at', 'type', 'amount', 'category', 'party', 'description']
+    rows = queryset.values_list(
+        'created_at', 'type', 'amount', 'category', 'source_or_destination', 'description'
+    ).iterator(chunk_size=10000)
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    frame['amount'] = frame['amount'].astype(float)
+    created = pd.to_datetime(frame['created_at'], utc=True).dt.tz_convert(timezone.get_current_timezone_name())
+    frame['month'] = created.dt.tz_localize(None).dt.to_period('M')
+    frame['day'] = created.dt.day
+    return frame.drop(columns='created_at')
+
+
+def compute_features(frame):
+    """One row of FEATURES (plus net_saving) per month present in `frame`, indexed by month"""
+    import numpy as np
+    import pandas as pd
+
+    months = pd.PeriodIndex(frame['month'].unique(), freq='M').sort_values()
+    expenses = frame[frame['type'] == 'expense']
+    spend = expenses.groupby('month')['amount']
+
+    total_spend = spend.sum().reindex(months, fill_value=0.0)
+    txn_count = spend.size().reindex(months, fill_value=0)
+    income = frame.loc[frame['type'] == 'income'].groupby('month')['amount'].sum().reindex(months, fill_value=0.0)
+
+    by_category = (
+        expenses.groupby(['month', 'category'])['amount'].sum()
+        .unstack(fill_value=0.0)
+        .reindex(months, fill_value=0.0)
+    )
+
+    def category_total(names):
+        present = [name for name in names if name in by_category.columns]
+        return by_category[present].sum(axis=1) if present else pd.Series(0.0, index=months)
+
+    descriptions = expenses['description'].str.lower()
+    subscriptions = expenses['amount'].where(descriptions.str.contains(SUBSCRIPTION_PATTERN), 0.0)
+    emi = expenses['amount'].where(descriptions.str.contains(EMI_PATTERN), 0.0)
+
+    # Population std of daily spend over every day of the month, from per-day sums
+    days_in_month = pd.Series(months.days_in_month, index=months).astype(float)
+    daily = expenses.groupby(['month', 'day'])['amount'].sum()
+    sum_of_squares = (daily ** 2).groupby(level='month').sum().reindex(months, fill_value=0.0)
+    mean_daily = total_spend / days_in_month
+    variance = (sum_of_squares / days_in_month - mean_daily ** 2).clip(lower=0.0)
+
+    late = expenses['day'] > expenses['month'].dt.days_in_month - SPIKE_DAYS
+    late_spend = expenses.loc[late].groupby('month')['amount'].sum().reindex(months, fill_value=0.0)
+    spike = (late_spend / SPIKE_DAYS > SPIKE_FACTOR * mean_daily) & (total_spend > 0)
+
+    # Recurring: spend with a counterparty that was also paid the month before
+    payees = pd.MultiIndex.from_arrays([expenses['month'], expenses['party'].str.strip().str.lower()])
+    paid_last_month = pd.MultiIndex.from_arrays([payees.get_level_values(0) + 1, payees.get_level_values(1)]).unique()
+    recurring = expenses['amount'].where(payees.isin(paid_last_month), 0.0)
+
+    net_saving = income - total_spend
+    previous = months - 1
+    carry_forward = pd.Series(net_saving.reindex(previous).to_numpy(), index=months).fillna(0.0)
+
+    def ratio(part):
+        return (part / total_spend).where(total_spend > 0, 0.0)
+
+    result = pd.DataFrame({
+        'income': income,
+        'total_spend': total_spend,
+        'food_ratio': ratio(category_total(['food'])),
+        'shopping_ratio': ratio(category_total(['shopping'])),
+        'subscriptions_ratio': ratio(subscriptions.groupby(expenses['month']).sum().reindex(months, fill_value=0.0)),
+        'essential_ratio': ratio(category_total(ESSENTIAL_CATEGORIES)),
+        'spend_variability': np.sqrt(variance),
+        'avg_txn_size': (total_spend / txn_count).where(txn_count > 0, 0.0),
+        'txn_count': txn_count.astype(int),
+        'recurring_amount': recurring.groupby(expenses['month']).sum().reindex(months, fill_value=0.0),
+        'end_of_month_spike': spike.astype(int),
+        'emi': emi.groupby(expenses['month']).sum().reindex(months, fill_value=0.0),
+        'carry_forward_balance': carry_forward,
+        LEDGER_TARGET: net_saving,
+    }, index=months)
+    return result.round(4)
+
+
+def refresh_features(full=False):
+    """Recompute dirty months (every month when `full`); returns the number of months written"""
+    started = timezone.now()
+    if full:
+        dirty = None
+        SavingsFeatures.objects.update(dirty_at=started)
+    else:
+        dirty = set(SavingsFeatures.objects.filter(dirty_at__isnull=False).values_list('month', flat=True))
+        if not dirty:
+            return 0
+    import pandas as pd
+
+    # Each month needs the one before it for recurring/carry-forward features
+    frame = load_transactions(None if dirty is None else dirty | {previous_month(m) for m in dirty})
+    features = compute_features(frame) if len(frame) else None
+    rows = []
+    if features is not None:
+        if dirty is not None:
+            features = features[features.index.isin([pd.Period(month, 'M') for month in dirty])]
+        for period, values in features.iterrows():
+            rows.append(SavingsFeatures(
+                month=period.to_timestamp().date(),
+                computed_at=started,
+                **{name: values[name] for name in FEATURES + [LEDGER_TARGET]},
+            ))
+
+    with transaction.atomic():
+        SavingsFeatures.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['month'],
+            update_fields=FEATURES + [LEDGER_TARGET, 'computed_at'],
+            batch_size=500,
+        )
+        written = {row.month for row in rows}
+        settled = SavingsFeatures.objects.filter(dirty_at__lte=started)
+        # Months left without transactions have no features
+        settled.exclude(month__in=written).delete()
+        settled.update(dirty_at=None)
+    return len(rows)
+
+
+def feature_frame(months=None):
+    """SavingsFeatures rows as a float DataFrame indexed by month; what training and inference read"""
+    import pandas as pd
+
+    queryset = SavingsFeatures.objects.filter(computed_at__isnull=False)
+    if months is not None:
+        queryset = queryset.filter(month__in=list(months))
+    rows = queryset.order_by('month').values_list('month', *FEATURES, LEDGER_TARGET)
+    frame = pd.DataFrame.from_records(rows, columns=['month'] + FEATURES + [LEDGER_TARGET], index='month')
+    return frame.astype(float)
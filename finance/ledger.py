@@ -0,0 +1,185 @@
+"""
+Incrementally maintained income/expense rollups for the cash ledger.
+
+Every CashTransaction save/delete adjusts the matching day and month rows of
+LedgerRollup with F() expressions, so dashboard totals read O(days) rows
+instead of scanning finance_cashtransaction. rebuild_rollups()/verify_rollups()
+back the `rebuild_ledger_rollups` management command.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CashTransaction, LedgerRollup
+
+
+CENTS = Decimal('0.01')
+
+
+def _to_decimal(amount):
+    # Views may still hand us floats; store what the DecimalField will store
+    return Decimal(str(amount)).quantize(CENTS)
+
+
+def period_keys(created_at):
+    """Return the (period, period_start) rollup keys a transaction belongs to"""
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    day = created_at.date()
+    return [('day', day), ('month', day.replace(day=1))]
+
+
+def apply_delta(created_at, type_value, amount, count):
+    """Add `amount` (may be negative) and `count` to the rollups of one transaction"""
+    if type_value not in ('income', 'expense'):
+        return
+    amount = _to_decimal(amount)
+    with transaction.atomic():
+        for period, period_start in period_keys(created_at):
+            row, _ = LedgerRollup.objects.get_or_create(period=period, period_start=period_start)
+            LedgerRollup.objects.filter(pk=row.pk).update(
+                **{type_value: F(type_value) + amount},
+                txn_count=F('txn_count') + count,
+            )
+
+
+def apply_bulk(transactions):
+    """Add many new transactions to the rollups with one update per touched bucket
+
+    For bulk_create paths, which skip the post_save receivers below.
+    """
+    tz = timezone.get_current_timezone()
+    days = {}
+    for tx in transactions:
+        if tx.type not in ('income', 'expense'):
+            continue
+        created_at = tx.created_at.astimezone(tz) if timezone.is_aware(tx.created_at) else tx.created_at
+        key = (created_at.date(), tx.type)
+        total, count = days.get(key, (Decimal('0.00'), 0))
+        days[key] = (total + _to_decimal(tx.amount), count + 1)
+    deltas = {}
+    for (day, type_value), (total, count) in days.items():
+        for key in (('day', day), ('month', day.replace(day=1))):
+            bucket = deltas.setdefault(key, {'income': Decimal('0.00'), 'expense': Decimal('0.00'), 'txn_count': 0})
+            bucket[type_value] += total
+            bucket['txn_count'] += count
+    with transaction.atomic():
+        for (period, period_start), bucket in deltas.items():
+            row, _ = LedgerRollup.objects.get_or_create(period=period, period_start=period_start)
+            LedgerRollup.objects.filter(pk=row.pk).update(
+                income=F('income') + bucket['income'],
+                expense=F('expense') + bucket['expense'],
+                txn_count=F('txn_count') + bucket['txn_count'],
+            )
+    return len(deltas)
+
+
+@receiver(pre_save, sender=CashTransaction)
+def remember_previous_values(sender, instance: CashTransaction, **kwargs):
+    # cash_edit may change type, amount or both; keep the stored values to reverse them
+    instance._ledger_previous = None
+    if instance.pk is None:
+        return
+    instance._ledger_previous = (
+        CashTransaction.objects.filter(pk=instance.pk)
+        .values_list('created_at', 'type', 'amount')
+        .first()
+    )
+
+
+@receiver(post_save, sender=CashTransaction)
+def update_rollups_on_save(sender, instance: CashTransaction, created: bool, **kwargs):
+    previous = getattr(instance, '_ledger_previous', None)
+    current = (instance.created_at, instance.type, _to_decimal(instance.amount))
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            created_at, type_value, amount = previous
+            apply_delta(created_at, type_value, -amount, -1)
+        apply_delta(*current, 1)
+
+
+@receiver(post_delete, sender=CashTransaction)
+def update_rollups_on_delete(sender, instance: CashTransaction, **kwargs):
+    apply_delta(instance.created_at, instance.type, -_to_decimal(instance.amount), -1)
+
+
+def totals_from_rollups():
+    """Income/expense/balance summed over the month rollups"""
+    totals = LedgerRollup.objects.filter(period='month').aggregate(
+        income=Sum('income'),
+        expense=Sum('expense'),
+    )
+    # F() updates leave REAL values in SQLite, so the sums drift past 2 places
+    income = (totals['income'] or Decimal('0.00')).quantize(CENTS)
+    expense = (totals['expense'] or Decimal('0.00')).quantize(CENTS)
+    return {'income': income, 'expense': expense, 'balance': income - expense}
+
+
+def scan_rollups():
+    """Compute rollup values from a fresh grouped scan of CashTransaction"""
+    buckets = {}
+    truncs = {
+        'day': TruncDate('created_at'),
+        'month': TruncMonth('created_at', output_field=DateField()),
+    }
+    for period, trunc in truncs.items():
+        rows = (
+            CashTransaction.objects.order_by()
+            .annotate(bucket=trunc)
+            .values('bucket', 'type')
+            .annotate(total=Sum('amount'), n=Count('id'))
+        )
+        for row in rows:
+            values = buckets.setdefault((period, row['bucket']), {
+                'income': Decimal('0.00'),
+                'expense': Decimal('0.00'),
+                'txn_count': 0,
+            })
+            # SQLite sums decimals as floats; compare at the stored precision
+            values[row['type']] += _to_decimal(row['total'])
+            values['txn_count'] += row['n']
+    return buckets
+
+
+def rebuild_rollups(batch_size=1000):
+    """Replace all rollup rows with values from a fresh scan; returns the row count"""
+    buckets = scan_rollups()
+    with transaction.atomic():
+        LedgerRollup.objects.all().delete()
+        LedgerRollup.objects.bulk_create(
+            [
+                LedgerRollup(period=period, period_start=period_start, **values)
+                for (period, period_start), values in buckets.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(buckets)
+
+
+def verify_rollups():
+    """Compare stored rollups with a fresh scan; returns a list of mismatch descriptions"""
+    expected = scan_rollups()
+    stored = {
+        (row.period, row.period_start): {
+            'income': row.income,
+            'expense': row.expense,
+            'txn_count': row.txn_count,
+        }
+        for row in LedgerRollup.objects.all()
+    }
+    empty = {'income': Decimal('0.00'), 'expense': Decimal('0.00'), 'txn_count': 0}
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected.get(key, empty)
+        have = stored.get(key, empty)
+        if want != have:
+            period, period_start = key
+            mismatches.append(f"{period} {period_start}: expected {want}, stored {have}")
+    return mismatches
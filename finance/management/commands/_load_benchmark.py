@@ -0,0 +1,29 @@
+"""
+Child process of `convert_savings_dataset --benchmark`.
+
+Nothing here imports Django models at module level: with the spawn start
+method (Windows, macOS) the child unpickles timed_load() by importing this
+module in a fresh interpreter, before django.setup() has run.
+"""
+import time
+
+
+def timed_load(path, target, results):
+    """Load `path` and put ('ok', (load s, load+scan s, peak RSS MiB or None, rows)) or ('error', message)"""
+    try:
+        import django
+
+        django.setup()
+        from finance import datasets
+        from finance.training import peak_rss_mb
+
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        frame = datasets.load_frame(path, target)
+        loaded = time.perf_counter() - started
+        sum(frame[name].to_numpy().sum() for name in frame.columns)  # touch every value, so mapped pages count too
+        peak = peak_rss_mb()
+        rss = None if peak is None or baseline is None else peak - baseline
+        results.put(('ok', (loaded, time.perf_counter() - started, rss, len(frame))))
+    except BaseException as e:
+        results.put(('error', f'{type(e).__name__}: {e}'))
@@ -0,0 +1,83 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from finance import ledger
+from finance.models import CashTransaction
+from finance.services import cash_totals
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Time cash totals (Python sum, SQL aggregate, month rollups) at growing ledger sizes; "
+            "the seeded rows are rolled back")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                            help='Ledger sizes to time, in rows')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed calls per size (best is reported)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create while seeding')
+
+    def handle(self, *args, **options):
+        sizes = sorted(set(size for size in options['sizes'] if size > 0))
+        if not sizes:
+            raise CommandError('Give at least one positive --sizes value')
+        try:
+            with transaction.atomic():
+                self.run(sizes, max(1, options['repeat']), max(1, options['batch_size']))
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; seeded rows rolled back."))
+
+    def best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000
+
+    def run(self, sizes, repeat, batch_size):
+        rng = random.Random(0)
+        start = timezone.now() - timedelta(days=730)
+        existing = CashTransaction.objects.count()
+        seeded = 0
+        for size in sizes:
+            while seeded < size:
+                batch = [
+                    CashTransaction(
+                        description='benchmark',
+                        amount=Decimal(rng.randint(100, 500000)) / 100,
+                        type='income' if rng.random() < 0.3 else 'expense',
+                        source_or_destination='benchmark',
+                        created_at=start + timedelta(minutes=rng.randint(0, 730 * 24 * 60)),
+                    )
+                    for _ in range(min(batch_size, size - seeded))
+                ]
+                CashTransaction.objects.bulk_create(batch)
+                ledger.apply_bulk(batch)  # bulk_create skips the rollup receivers
+                seeded += len(batch)
+
+            def python_sum():
+                # What the views did before: load every row and add in Python
+                rows = list(CashTransaction.objects.all())
+                sum(t.amount for t in rows if t.type == 'income')
+                sum(t.amount for t in rows if t.type == 'expense')
+
+            timings = {
+                'python': self.best(python_sum, repeat),
+                'aggregate': self.best(lambda: cash_totals(CashTransaction.objects.all()), repeat),
+                'rollups': self.best(cash_totals, repeat),
+            }
+            self.stdout.write(
+                f"{existing + seeded:>9} rows: " + ', '.join(f"{name} {ms:9.2f}ms" for name, ms in timings.items())
+            )
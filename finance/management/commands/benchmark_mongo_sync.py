@@ -0,0 +1,94 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from finance import mongo_sync
+from finance.models import CashTransaction
+
+
+class _Delayed:
+    """Collection wrapper that sleeps for a simulated round trip before each bulk_write"""
+
+    def __init__(self, collection, delay):
+        self.collection = collection
+        self.delay = delay
+
+    def bulk_write(self, operations, **kwargs):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.collection.bulk_write(operations, **kwargs)
+
+
+class Command(BaseCommand):
+    help = ("Time document building and BulkWriter upserts in docs/sec, against mongomock (default) "
+            "or a MongoDB server given with --uri")
+
+    def add_arguments(self, parser):
+        # mongomock scans the collection on every upsert, so keep runs against it small
+        parser.add_argument('--docs', type=int, default=2000, help='Documents per run')
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 1000, 5000],
+                            help='BulkWriter batch sizes to time')
+        parser.add_argument('--uri', type=str, default=None,
+                            help='MongoDB URI (e.g. mongodb://localhost:27017); the benchmark database is dropped afterwards')
+        parser.add_argument('--rtt-ms', type=float, default=0.0,
+                            help='Simulated network round trip added to each bulk_write (useful with mongomock)')
+        parser.add_argument('--database', default='finbuddy_benchmark', help='Scratch database name')
+
+    def handle(self, *args, **options):
+        if options['uri']:
+            try:
+                from pymongo import MongoClient
+            except ImportError:
+                raise CommandError('pymongo is not installed. Please install it in your environment.')
+            client = MongoClient(options['uri'], serverSelectionTimeoutMS=5000)
+            target = options['uri']
+        else:
+            try:
+                import mongomock
+            except ImportError:
+                raise CommandError('Install mongomock (pip install mongomock) or pass --uri for a real server.')
+            client = mongomock.MongoClient()
+            target = 'mongomock'
+        if options['rtt_ms']:
+            target += f" +{options['rtt_ms']:g}ms rtt"
+        docs = max(1, options['docs'])
+
+        now = timezone.now()
+        transactions = [
+            CashTransaction(
+                pk=i + 1, description=f'Benchmark {i}', amount=Decimal(i % 50000) / 100,
+                type='income' if i % 3 == 0 else 'expense', source_or_destination='Benchmark',
+                category='food', created_at=now - timedelta(minutes=i),
+            )
+            for i in range(docs)
+        ]
+        started = time.perf_counter()
+        documents = [mongo_sync.transaction_document(tx) for tx in transactions]
+        seconds = time.perf_counter() - started
+        self.stdout.write(f"Built {docs} documents: {docs / seconds:,.0f} docs/s")
+
+        database = client[options['database']]
+        try:
+            for batch_size in options['batch_sizes']:
+                for label in ('insert', 'update'):
+                    collection = _Delayed(database[f'bench_{batch_size}'], options['rtt_ms'] / 1000)
+                    started = time.perf_counter()
+                    with mongo_sync.BulkWriter(collection, batch_size=max(1, batch_size)) as writer:
+                        for document in documents:
+                            writer.upsert({'django_id': document['django_id']}, document)
+                    seconds = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{target} batch {batch_size:>5} {label}: {docs / seconds:10,.0f} docs/s "
+                        f"({writer.batches} bulk_write calls, {seconds:.2f}s)"
+                    )
+                    # The second pass re-upserts existing documents with a changed field
+                    for document in documents:
+                        document['description'] += '*'
+        except Exception as e:
+            raise CommandError(f'Benchmark failed against {target}: {type(e).__name__}: {e}')
+        finally:
+            client.drop_database(options['database'])
+        self.stdout.write(self.style.SUCCESS("Benchmark finished."))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import ml
+
+
+class Command(BaseCommand):
+    help = "Time savings-model loading and predict_many() over a range of batch sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000, 100000],
+                            help='Batch sizes to time')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed calls per batch size (best is reported)')
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        started = time.perf_counter()
+        try:
+            model = ml.get_model()
+        except ml.ModelError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Loaded model {model.version} in {(time.perf_counter() - started) * 1000:.1f}ms "
+            f"({'folded linear' if model.linear is not None else 'pipeline'} path)."
+        )
+
+        rng = np.random.default_rng(0)
+        for size in options['sizes']:
+            rows = rng.uniform(0, 50000, size=(size, len(model.features)))
+            model.predict_many(rows)  # warm-up
+            timings = []
+            for _ in range(max(1, options['repeat'])):
+                call = time.perf_counter()
+                model.predict_many(rows)
+                timings.append(time.perf_counter() - call)
+            best = min(timings)
+            self.stdout.write(
+                f"batch {size:>7}: {best * 1e6:10.1f}us per call, {best / size * 1e6:8.3f}us per row, "
+                f"{size / best:14,.0f} rows/s"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark finished."))
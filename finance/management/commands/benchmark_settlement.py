@@ -0,0 +1,72 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from finance import settlement
+from finance.models import BillSplit, BillSplitItem, Person
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Time minimize_transfers() on synthetic balances, then the full settlement plan over seeded "
+            "people and bills (rolled back)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                            help='Numbers of non-zero balances for minimize_transfers()')
+        parser.add_argument('--people', type=int, default=2000, help='People seeded for the database run')
+        parser.add_argument('--bills', type=int, default=2000, help='Open bills seeded for the database run')
+        parser.add_argument('--per-bill', type=int, default=5, help='Participants per seeded bill')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        for size in options['sizes']:
+            balances = {key: rng.randint(-500000, 500000) for key in range(max(2, size) - 1)}
+            balances[len(balances)] = -sum(balances.values())
+            started = time.perf_counter()
+            transfers = settlement.minimize_transfers(balances)
+            seconds = time.perf_counter() - started
+            self.stdout.write(f"minimize_transfers {len(balances):>7} balances: {seconds * 1000:9.1f}ms, "
+                              f"{len(transfers)} transfers")
+
+        if options['people'] > 0 and options['bills'] > 0:
+            try:
+                with transaction.atomic():
+                    self.database_run(rng, options['people'], options['bills'], max(1, options['per_bill']))
+                    raise _Rollback
+            except _Rollback:
+                pass
+        self.stdout.write(self.style.SUCCESS("Benchmark finished."))
+
+    def database_run(self, rng, people_count, bill_count, per_bill):
+        people = Person.objects.bulk_create([
+            Person(name=f'Benchmark {i}', upi_id=f'bench{i}@upi') for i in range(people_count)
+        ])
+        bills = BillSplit.objects.bulk_create([
+            BillSplit(title=f'Benchmark {i}', total_amount=Decimal('0'), item_count=per_bill,
+                      paid_by=rng.choice(people) if rng.random() < 0.8 else None)
+            for i in range(bill_count)
+        ])
+        items = []
+        for bill in bills:
+            for person in rng.sample(people, min(per_bill, len(people))):
+                items.append(BillSplitItem(bill_split=bill, person=person,
+                                           amount=Decimal(rng.randint(100, 500000)) / 100))
+        BillSplitItem.objects.bulk_create(items, batch_size=5000)
+
+        started = time.perf_counter()
+        balances = settlement.net_balances()
+        netted = time.perf_counter()
+        plan = settlement.settlement_plan()
+        finished = time.perf_counter()
+        self.stdout.write(
+            f"{people_count} people, {bill_count} bills, {len(items)} items: net_balances "
+            f"{(netted - started) * 1000:.1f}ms ({len(balances)} balances), settlement_plan "
+            f"{(finished - netted) * 1000:.1f}ms ({len(plan)} transfers)"
+        )
@@ -0,0 +1,92 @@
+import random
+import time
+from functools import lru_cache
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from finance import sms
+from finance.categories import default_categorizer
+from finance.models import MongoOutbox
+
+TEMPLATES = (
+    ('JM-ICICIB', 'ICICI Bank Acct XX123 debited for Rs {amount} on 12-Oct-23; {party} credited. UPI:{ref}. '
+                  'Call 18002662 for dispute.'),
+    ('AD-SBIUPI', 'Dear UPI user A/C X1234 debited by {amount} on date 12Oct23 trf to {party} Refno {ref}. '
+                  'If not u? call 1800111109. -SBI'),
+    ('VM-HDFCBK', 'Money Received - INR {amount} in your A/c XX1234 on 12-10-23 from {party} (UPI Ref No {ref}). '
+                  'Avl bal: INR 5,000'),
+    ('VM-HDFCBK', 'Rs.{amount} debited from a/c **1234 on 12-10-23 to VPA {party}@hdfcbank (UPI Ref No {ref}). '
+                  'Not you? Call 18002586161'),
+    ('AX-AXISBK', 'INR {amount} debited A/c no. XX1234 12-10-23 10:00:00 UPI/P2M/{ref}/{party} Not you? SMS BLOCK'),
+    ('XY-HDFCBK', '{ref} is your OTP for txn of Rs {amount} at {party}. Do not share.'),
+)
+PARTIES = ('SWIGGY', 'ZOMATO', 'UBER', 'AMAZON', 'NETFLIX', 'RAHUL', 'BIGBAZAAR', 'METROCARD')
+
+
+class _Rollback(Exception):
+    pass
+
+
+def synthetic_messages(count, seed=0):
+    """Bank-style SMS records (about one in six is an OTP that parses to nothing)"""
+    rng = random.Random(seed)
+    start = 1697040000000
+    for i in range(count):
+        sender, body = rng.choice(TEMPLATES)
+        yield {
+            'address': sender,
+            'body': body.format(amount=f'{rng.randint(100, 7000000) / 100:.2f}', party=rng.choice(PARTIES),
+                                ref=100000000000 + i),
+            'date': start + i * 60000,
+        }
+
+
+class Command(BaseCommand):
+    help = ("Time SMS ingest (parse, insert, rollups, outbox) on synthetic messages in msgs/s; "
+            "everything written is rolled back")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=100000, help='Synthetic messages to ingest')
+        parser.add_argument('--chunk', type=int, default=5000, help='Rows per insert chunk')
+        parser.add_argument('--target-seconds', type=float, default=60.0,
+                            help='Report whether 1M messages would ingest within this many seconds')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        if count <= 0:
+            raise CommandError('--messages must be positive')
+        chunk = max(1, options['chunk'])
+        messages = list(synthetic_messages(count))
+
+        categorize = lru_cache(maxsize=1 << 16)(default_categorizer().categorize)
+        started = time.perf_counter()
+        parsed = sum(1 for record in messages if sms.transaction_from_record(record, categorize) is not None)
+        self.report('parse only', count, time.perf_counter() - started, f'{parsed} transactions')
+
+        try:
+            with transaction.atomic():
+                outbox_before = MongoOutbox.objects.count()
+                started = time.perf_counter()
+                stats = sms.ingest(messages, chunk)
+                seconds = time.perf_counter() - started
+                queued = MongoOutbox.objects.count() - outbox_before
+                self.report('ingest', count, seconds, f"{stats['inserted']} inserted, {queued} outbox rows")
+
+                started = time.perf_counter()
+                again = sms.ingest(messages, chunk)
+                self.report('re-ingest', count, time.perf_counter() - started,
+                            f"{again['inserted']} inserted, {again['duplicates']} duplicates")
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        projected = seconds * 1000000 / count
+        verdict = 'within' if projected <= options['target_seconds'] else 'over'
+        self.stdout.write(f"Projected 1M messages: {projected:.1f}s ({verdict} the "
+                          f"{options['target_seconds']:g}s target)")
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; ingested rows rolled back."))
+
+    def report(self, label, count, seconds, detail):
+        self.stdout.write(f"{label:>10}: {count} messages in {seconds:.2f}s "
+                          f"({count / seconds:,.0f} msgs/s), {detail}")
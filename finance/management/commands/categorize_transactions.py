@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from finance import features
+from finance.categories import backfill
+
+
+class Command(BaseCommand):
+    help = ("Re-assign categories to existing CashTransactions from their descriptions "
+            "(migration 0011 does this once; re-run after editing transaction_keywords)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=5000, help='Rows read and updated per chunk')
+        parser.add_argument('--dry-run', action='store_true', help='Categorize without writing; report throughput')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        scanned, changed = backfill(
+            batch_size=max(1, options['batch']),
+            dry_run=options['dry_run'],
+            # Category ratios of these months change
+            on_change=lambda created: features.mark_dirty({features.month_start(c) for c in created}),
+        )
+        seconds = time.perf_counter() - started
+        rate = scanned / seconds if seconds else 0
+        verb = 'Would recategorize' if options['dry_run'] else 'Recategorized'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {changed} of {scanned} transactions in {seconds:.2f}s ({rate:,.0f} rows/s)."
+        ))
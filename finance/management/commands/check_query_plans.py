@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from finance.models import BillSplit, BillSplitHistory, BillSplitItem, CashTransaction, LedgerRollup, SavingsFeatures
+
+
+def hot_queries():
+    """The querysets behind the finance pages, keyed by a short label"""
+    return {
+        'bill_split_home recent expenses': CashTransaction.objects.filter(type='expense').order_by('-created_at')[:10],
+        'cash page keyset (per type)': CashTransaction.objects.filter(type='income').order_by('-created_at', '-id')[:51],
+        'transactions keyset': CashTransaction.objects.order_by('-created_at', '-id')[:51],
+        'bill_split_home recent bills': BillSplit.objects.order_by('-created_at')[:5],
+        'unsettled bills': BillSplit.objects.filter(is_settled=False).order_by('-created_at')[:50],
+        'bill paid items': BillSplitItem.objects.filter(bill_split_id=1, is_paid=True).order_by().values_list('amount'),
+        'bill history': BillSplitHistory.objects.filter(bill_split_id=1).order_by('-created_at'),
+        'category breakdown': CashTransaction.objects.filter(type='expense').order_by().values('category').annotate(total=Sum('amount')),
+        'ledger month totals': LedgerRollup.objects.filter(period='month').values_list('income', 'expense'),
+        'dirty feature months': SavingsFeatures.objects.filter(dirty_at__isnull=False).values_list('month', flat=True),
+    }
+
+
+def partial_indexes(cursor):
+    """Names of the partial (WHERE ...) indexes in the SQLite schema"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def plan_problems(details, bounded=False, partial=()):
+    """Return plan lines that read more rows than the query needs
+
+    SEARCH is always fine. A SCAN passes only when it reads a partial index
+    (so it visits matching rows only) or when `bounded`: the query has no
+    filter, an ORDER BY served by the scanned index and a LIMIT, so it stops
+    after LIMIT rows. Temp B-tree sorts always fail.
+    """
+    problems = []
+    for detail in details:
+        if 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+        elif detail.startswith('SCAN '):
+            index = detail.split(' INDEX ', 1)[1].split()[0] if ' INDEX ' in detail else None
+            if index is None or not (bounded or index in partial):
+                problems.append(detail)
+    return problems
+
+
+def is_bounded(queryset):
+    """True for an unfiltered, ordered, LIMITed queryset"""
+    query = queryset.query
+    return query.high_mark is not None and bool(query.order_by) and not query.where
+
+
+def explain(cursor, queryset):
+    """EXPLAIN QUERY PLAN detail lines for a queryset"""
+    sql, params = queryset.query.sql_with_params()
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def check_plans():
+    """[(label, plan details, problems)] for every hot query"""
+    results = []
+    with connection.cursor() as cursor:
+        partial = partial_indexes(cursor)
+        for label, queryset in hot_queries().items():
+            details = explain(cursor, queryset)
+            results.append((label, details, plan_problems(details, is_bounded(queryset), partial)))
+    return results
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN QUERY PLAN for the hot finance queries and fail on unbounded scans or temp B-tree sorts"
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('check_query_plans only understands SQLite query plans.')
+
+        failures = 0
+        for label, details, problems in check_plans():
+            if problems:
+                failures += 1
+                self.stderr.write(f"FAIL {label}: {'; '.join(problems)}")
+            else:
+                self.stdout.write(f"ok   {label}: {'; '.join(details)}")
+
+        if failures:
+            raise CommandError(f"{failures} hot queries regressed to an unbounded scan or temp sort.")
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
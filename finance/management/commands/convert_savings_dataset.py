@@ -0,0 +1,75 @@
+import multiprocessing
+import queue
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import datasets
+from finance.features import TARGET
+from finance.training import format_mb
+
+from finance.management.commands._load_benchmark import timed_load
+
+
+class Command(BaseCommand):
+    help = "Convert the savings dataset to float32 Parquet or Arrow IPC, optionally benchmarking the formats"
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='CSV, Parquet or Arrow dataset to read')
+        parser.add_argument('dest', help='Output file: .parquet, or .arrow/.feather for memory-mapped reads')
+        parser.add_argument('--target', default=TARGET, help='Label column to keep alongside FEATURES')
+        parser.add_argument('--chunksize', type=int,
+                            help='Rows per Parquet row group / Arrow batch (default: 1M for Parquet, '
+                                 'one batch for Arrow so loads are zero-copy)')
+        parser.add_argument('--compression', default='zstd', help='Parquet compression codec')
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Afterwards, time loading source and dest in fresh processes')
+        parser.add_argument('--timeout', type=float, default=3600,
+                            help='Seconds to wait for each --benchmark load before giving up')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            rows = datasets.convert(
+                options['source'], options['dest'], target=options['target'],
+                chunksize=options['chunksize'] and max(1, options['chunksize']), compression=options['compression'],
+            )
+        except datasets.DatasetError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {rows} rows to {options['dest']} in {time.perf_counter() - started:.1f}s."
+        ))
+        if options['benchmark']:
+            for path in (options['source'], options['dest']):
+                self.benchmark(path, options['target'], options['timeout'])
+
+    def benchmark(self, path, target, timeout=3600):
+        # The default start method: fork where it is available, spawn on Windows
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        child = context.Process(target=timed_load, args=(path, target, results))
+        child.start()
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    status, value = results.get(timeout=1)
+                    break
+                except queue.Empty:
+                    if not child.is_alive():
+                        # e.g. killed for running out of memory before it could report
+                        raise CommandError(f"Loading {path} failed: child exited with code {child.exitcode}")
+                    if time.monotonic() > deadline:
+                        raise CommandError(f"Loading {path} took longer than {timeout:g}s")
+        finally:
+            child.join(timeout=5)
+            if child.is_alive():
+                child.terminate()
+                child.join()
+        if status != 'ok':
+            raise CommandError(f"Loading {path} failed: {value}")
+        loaded, touched, rss, rows = value
+        self.stdout.write(
+            f"{datasets.file_format(path):>8} {path}: load {loaded:.2f}s, load+scan {touched:.2f}s, "
+            f"peak RSS +{format_mb(rss)} for {rows} rows"
+        )
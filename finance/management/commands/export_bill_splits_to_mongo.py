@@ -1,169 +1,115 @@
-import json
-from decimal import Decimal
-from pathlib import Path
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 
 from finance.models import BillSplit, BillSplitItem, Person, BillSplitHistory
-from finance import mongo_sync
+from finance import export_state, mongo_sync
+
+
+def export_collection(collection, queryset, build, key_field, batch_size, watermark=None):
+    """Upsert every row of `queryset` into `collection`
+
+    With `watermark` as (name, field), only rows changed since the last
+    successful run are read. Returns (count, deleted, seconds, finish); the
+    caller runs finish() on the main thread to clear applied tombstones and
+    advance the watermark, keeping SQLite writes out of the worker threads.
+    """
+    started = time.perf_counter()
+    try:
+        # Keep the upserts index-backed; also rejects duplicate keys
+        collection.create_index(key_field, unique=True)
+        commit_watermark = None
+        if watermark is not None:
+            queryset, commit_watermark = export_state.changed_since_last_run(queryset, *watermark)
+        count = 0
+        with mongo_sync.BulkWriter(collection, batch_size) as writer:
+            for obj in queryset.iterator(chunk_size=batch_size):
+                doc = build(obj)
+                writer.upsert({key_field: doc[key_field]}, doc)
+                count += 1
+            clear_tombstones = export_state.apply_tombstones('bill_split', collection.name, writer)
+    finally:
+        # Each worker thread opens its own DB connection
+        connection.close()
+
+    def finish():
+        clear_tombstones()
+        if commit_watermark is not None:
+            commit_watermark()
+    return count, writer.deleted, time.perf_counter() - started, finish
 
 
 class Command(BaseCommand):
     help = "Export Bill Split data to separate MongoDB Atlas database"
 
     def add_arguments(self, parser):
-        parser.add_argument('--config', type=str, default='static/config/mongo_transfer.json', help='Path to mongo transfer config JSON')
-        parser.add_argument('--batch', type=int, default=100, help='Batch size for operations')
+        parser.add_argument('--config', type=str, default=mongo_sync.DEFAULT_CONFIG_PATH, help='Path to mongo transfer config JSON')
+        parser.add_argument('--batch', type=int, default=1000, help='Documents per bulk_write')
+        parser.add_argument('--workers', type=int, default=5, help='Collections exported concurrently')
+        parser.add_argument('--since-last-run', action='store_true', help='Only export rows changed since the last successful run')
         parser.add_argument('--uri', type=str, default=None, help='Override MongoDB Atlas connection URI (takes precedence over config/env)')
 
     def handle(self, *args, **options):
-        config_path = Path(options['config'])
-        if not config_path.exists():
-            raise CommandError(f"Config file not found: {config_path}")
-
-        try:
-            with config_path.open('r', encoding='utf-8') as f:
-                cfg = json.load(f)
-        except Exception as e:
-            raise CommandError(f"Failed to read config: {e}")
-
-        mongodb_cfg = cfg.get('mongodb') or {}
-        # Resolve URI: CLI --uri > env via atlas_uri_env > atlas_uri in config
-        atlas_uri = options.get('uri')
-        if not atlas_uri:
-            atlas_uri_env = mongodb_cfg.get('atlas_uri_env')
-            if atlas_uri_env:
-                import os
-                atlas_uri = os.getenv(atlas_uri_env)
-        if not atlas_uri:
-            atlas_uri = mongodb_cfg.get('atlas_uri')
-        
-        bill_split_db_name = mongodb_cfg.get('bill_split_database', 'bill_split_db')
-
-        if not atlas_uri or '<username>' in atlas_uri or '<cluster>' in atlas_uri:
-            raise CommandError('Invalid MongoDB Atlas URI. Set a valid URI in config.mongodb.atlas_uri or provide environment variable via config.mongodb.atlas_uri_env.')
-
         try:
-            from pymongo import MongoClient
-        except Exception as e:
-            raise CommandError('pymongo is not installed. Please install it in your environment.')
+            mongodb_cfg = mongo_sync.load_config(options['config'])
+            client = mongo_sync.get_client(options.get('uri'), mongodb_cfg)
+        except mongo_sync.MongoSyncError as e:
+            raise CommandError(str(e))
 
-        client = MongoClient(atlas_uri)
+        bill_split_db_name = mongo_sync.database_name('bill_split', mongodb_cfg)
         bill_split_db = client[bill_split_db_name]
-        
-        # Get collections
-        users = bill_split_db['users']
-        bills = bill_split_db['bills']
-        bill_items = bill_split_db['bill_items']
-        transactions = bill_split_db['transactions']
-        history = bill_split_db['history']
-
-        # Export People
-        people_docs = []
-        for person in Person.objects.all():
-            doc = {
-                'user_id': f'user_{person.pk}',
-                'django_id': person.pk,
-                'name': person.name,
-                'upi_id': person.upi_id,
-                'phone': person.phone,
-                'email': person.email,
-                'created_at': person.created_at.isoformat(),
-                'updated_at': person.updated_at.isoformat(),
-            }
-            people_docs.append(doc)
-
-        # Export Bills
-        bills_docs = []
-        for bill in BillSplit.objects.all():
-            doc = {
-                'bill_id': f'bill_{bill.pk}',
-                'django_id': bill.pk,
-                'title': bill.title,
-                'description': bill.description,
-                'total_amount': float(bill.total_amount),
-                'split_type': bill.split_type,
-                'is_settled': bill.is_settled,
-                'created_at': bill.created_at.isoformat(),
-                'updated_at': bill.updated_at.isoformat(),
-                'settled_at': bill.settled_at.isoformat() if bill.settled_at else None,
+        collection_names = mongodb_cfg.get('bill_split_collections') or {}
+
+        # (collection, queryset, document builder, stable key, change column)
+        exports = {
+            'users': (Person.objects.all(), mongo_sync.person_document, 'django_id', 'updated_at'),
+            'bills': (BillSplit.objects.all(), mongo_sync.bill_document, 'django_id', 'updated_at'),
+            'bill_items': (BillSplitItem.objects.all(), mongo_sync.bill_item_document, 'django_id', 'updated_at'),
+            # History rows are append-only
+            'history': (BillSplitHistory.objects.all(), mongo_sync.history_document, 'django_id', 'pk'),
+            # Payment transactions are derived from paid items
+            'transactions': (
+                BillSplitItem.objects.filter(is_paid=True, paid_at__isnull=False),
+                mongo_sync.payment_transaction_document,
+                'transaction_id',
+                'updated_at',
+            ),
+        }
+
+        if options['since_last_run']:
+            export_state.ensure_watermarks([f'bill_split.{name}' for name in exports])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {
+                name: pool.submit(
+                    export_collection,
+                    bill_split_db[collection_names.get(name, name)],
+                    queryset.order_by('pk'),
+                    build,
+                    key_field,
+                    options['batch'],
+                    (f'bill_split.{name}', change_field) if options['since_last_run'] else None,
+                )
+                for name, (queryset, build, key_field, change_field) in exports.items()
             }
-            bills_docs.append(doc)
-
-        # Export Bill Items
-        bill_items_docs = []
-        for item in BillSplitItem.objects.all():
-            doc = {
-                'item_id': f'item_{item.pk}',
-                'django_id': item.pk,
-                'bill_id': f'bill_{item.bill_split.pk}',
-                'user_id': f'user_{item.person.pk}',
-                'amount': float(item.amount),
-                'is_paid': item.is_paid,
-                'paid_at': item.paid_at.isoformat() if item.paid_at else None,
-                'notes': item.notes,
-                'created_at': item.created_at.isoformat(),
-            }
-            bill_items_docs.append(doc)
-
-        # Export History
-        history_docs = []
-        for hist in BillSplitHistory.objects.all():
-            doc = {
-                'history_id': f'hist_{hist.pk}',
-                'django_id': hist.pk,
-                'bill_id': f'bill_{hist.bill_split.pk}',
-                'action': hist.action,
-                'description': hist.description,
-                'created_at': hist.created_at.isoformat(),
-            }
-            history_docs.append(doc)
-
-        # Export Transactions (create from paid items)
-        transaction_docs = []
-        for item in BillSplitItem.objects.filter(is_paid=True, paid_at__isnull=False):
-            doc = {
-                'transaction_id': f'txn_{item.pk}_{int(item.paid_at.timestamp())}',
-                'user_id': f'user_{item.person.pk}',
-                'bill_id': f'bill_{item.bill_split.pk}',
-                'amount': float(item.amount),
-                'type': 'payment',
-                'status': 'completed',
-                'created_at': item.paid_at.isoformat(),
-            }
-            transaction_docs.append(doc)
-
-        # Bulk insert in batches
-        def bulk_insert(collection, docs, batch_size):
-            if not docs:
-                return 0
-            inserted = 0
-            for i in range(0, len(docs), batch_size):
-                chunk = docs[i:i+batch_size]
-                if not chunk:
-                    continue
-                # Use upsert to avoid duplicates
-                for doc in chunk:
-                    collection.update_one(
-                        {'django_id': doc.get('django_id')}, 
-                        {'$set': doc}, 
-                        upsert=True
-                    )
-                    inserted += 1
-            return inserted
-
-        # Insert all data
-        ins_people = bulk_insert(users, people_docs, options['batch'])
-        ins_bills = bulk_insert(bills, bills_docs, options['batch'])
-        ins_items = bulk_insert(bill_items, bill_items_docs, options['batch'])
-        ins_history = bulk_insert(history, history_docs, options['batch'])
-        ins_transactions = bulk_insert(transactions, transaction_docs, options['batch'])
-
+            results = {}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    raise CommandError(f"Export of '{name}' failed: {e}")
+
+        for *_, finish in results.values():
+            finish()
+
+        lines = []
+        for name, (count, deleted, seconds, _) in results.items():
+            rate = count / seconds if seconds else 0
+            removed = f", {deleted} removed" if deleted else ""
+            lines.append(f"- {count} {name}{removed} in {seconds:.2f}s ({rate:,.0f} docs/s)")
         self.stdout.write(self.style.SUCCESS(
-            f"Exported to MongoDB '{bill_split_db_name}':\n"
-            f"- {ins_people} users\n"
-            f"- {ins_bills} bills\n"
-            f"- {ins_items} bill items\n"
-            f"- {ins_history} history entries\n"
-            f"- {ins_transactions} transactions"
+            f"Exported to MongoDB '{bill_split_db_name}' in {time.perf_counter() - started:.2f}s:\n" + "\n".join(lines)
         ))
@@ -1,96 +1,128 @@
-import json
-import os
-from decimal import Decimal
-from pathlib import Path
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
 
+from finance import export_state, mongo_sync
 from finance.models import CashTransaction
 
 
+def transaction_documents(queryset, chunk_size):
+    """Yield (type, document) pairs straight off a server-side cursor"""
+    for tx in queryset.iterator(chunk_size=chunk_size):
+        yield tx.type, mongo_sync.transaction_document(tx)
+
+
+def export_range(collections, queryset, batch_size, pk_range=None, move_types=False):
+    """Stream one pk range of `queryset` into MongoDB; returns {type: documents written}
+
+    At most `batch_size` documents per collection are buffered at a time, so
+    memory does not grow with the ledger. With `move_types`, each document is
+    also removed from the other collection in case an edit changed its type.
+    """
+    queryset = queryset.order_by('pk')
+    if pk_range is not None:
+        queryset = queryset.filter(pk__gte=pk_range[0], pk__lt=pk_range[1])
+    counts = {type_value: 0 for type_value in collections}
+    try:
+        writers = {
+            type_value: mongo_sync.BulkWriter(collection, batch_size)
+            for type_value, collection in collections.items()
+        }
+        for type_value, doc in transaction_documents(queryset, batch_size):
+            writers[type_value].upsert({'django_id': doc['django_id']}, doc)
+            if move_types:
+                other = 'income' if type_value == 'expense' else 'expense'
+                writers[other].delete({'django_id': doc['django_id']})
+            counts[type_value] += 1
+        for writer in writers.values():
+            writer.flush()
+    finally:
+        if pk_range is not None:
+            # Worker threads each opened their own DB connection
+            connection.close()
+    return counts
+
+
+def partition(lowest, highest, parts):
+    """Split [lowest, highest] into `parts` half-open pk ranges"""
+    step = max(1, math.ceil((highest - lowest + 1) / parts))
+    return [(start, min(start + step, highest + 1)) for start in range(lowest, highest + 1, step)]
+
+
 class Command(BaseCommand):
     help = "Export CashTransaction data to MongoDB Atlas as expenses/incomes collections"
 
     def add_arguments(self, parser):
-        parser.add_argument('--config', type=str, default='static/config/mongo_transfer.json', help='Path to mongo transfer config JSON')
-        parser.add_argument('--batch', type=int, default=500, help='Batch size for inserts')
+        parser.add_argument('--config', type=str, default=mongo_sync.DEFAULT_CONFIG_PATH, help='Path to mongo transfer config JSON')
+        parser.add_argument('--batch', type=int, default=500, help='Documents per bulk_write')
+        parser.add_argument('--workers', type=int, default=1, help='Threads exporting disjoint id ranges')
+        parser.add_argument('--since-last-run', action='store_true', help='Only export rows changed since the last successful run')
         parser.add_argument('--uri', type=str, default=None, help='Override MongoDB Atlas connection URI (takes precedence over config/env)')
 
     def handle(self, *args, **options):
-        config_path = Path(options['config'])
-        if not config_path.exists():
-            raise CommandError(f"Config file not found: {config_path}")
-
         try:
-            with config_path.open('r', encoding='utf-8') as f:
-                cfg = json.load(f)
-        except Exception as e:
-            raise CommandError(f"Failed to read config: {e}")
-
-        mongodb_cfg = cfg.get('mongodb') or {}
-        # Resolve URI: CLI --uri > env via atlas_uri_env > atlas_uri in config
-        atlas_uri = options.get('uri')
-        if not atlas_uri:
-            atlas_uri_env = mongodb_cfg.get('atlas_uri_env')
-            if atlas_uri_env:
-                atlas_uri = os.getenv(atlas_uri_env)
-        if not atlas_uri:
-            atlas_uri = mongodb_cfg.get('atlas_uri')
-        db_name = mongodb_cfg.get('database', 'finance_tracker')
+            mongodb_cfg = mongo_sync.load_config(options['config'])
+            client = mongo_sync.get_client(options.get('uri'), mongodb_cfg)
+        except mongo_sync.MongoSyncError as e:
+            raise CommandError(str(e))
+
+        db_name = mongo_sync.database_name('finance', mongodb_cfg)
         col_expenses = (mongodb_cfg.get('collections') or {}).get('expenses', 'expenses')
         col_incomes = (mongodb_cfg.get('collections') or {}).get('incomes', 'incomes')
 
-        if not atlas_uri or '<username>' in atlas_uri or '<cluster>' in atlas_uri:
-            raise CommandError('Invalid MongoDB Atlas URI. Set a valid URI in config.mongodb.atlas_uri or provide environment variable via config.mongodb.atlas_uri_env.')
-
-        try:
-            from pymongo import MongoClient
-        except Exception as e:
-            raise CommandError('pymongo is not installed. Please install it in your environment.')
-
-        client = MongoClient(atlas_uri)
         db = client[db_name]
-        expenses = db[col_expenses]
-        incomes = db[col_incomes]
-
-        def to_number(value):
-            if isinstance(value, Decimal):
-                return float(value)
-            return float(value)
-
-        docs_expense = []
-        docs_income = []
-        for tx in CashTransaction.objects.all().iterator():
-            doc = {
-                'date': tx.created_at.strftime('%Y-%m-%d'),
-                'description': tx.description,
-                'amount': to_number(tx.amount if tx.type == 'expense' else -tx.amount) * -1 if tx.type == 'expense' else to_number(tx.amount),
-                'category': None,
-                'method': 'cash',
-                'source': tx.source_or_destination if tx.type == 'income' else None,
-                'type': tx.type,
-            }
-            if tx.type == 'expense':
-                docs_expense.append({k: v for k, v in doc.items() if k not in ('source',)})
-            else:
-                docs_income.append({k: v for k, v in doc.items() if k not in ('category',)})
-
-        # Bulk insert in batches
-        def bulk_insert(collection, docs, batch_size):
-            if not docs:
-                return 0
-            inserted = 0
-            for i in range(0, len(docs), batch_size):
-                chunk = docs[i:i+batch_size]
-                if not chunk:
-                    continue
-                res = collection.insert_many(chunk)
-                inserted += len(res.inserted_ids)
-            return inserted
-
-        ins_exp = bulk_insert(expenses, docs_expense, options['batch'])
-        ins_inc = bulk_insert(incomes, docs_income, options['batch'])
-
-        self.stdout.write(self.style.SUCCESS(f"Exported {ins_exp} expenses and {ins_inc} incomes to MongoDB '{db_name}'."))
-
-
+        collections = {'expense': db[col_expenses], 'income': db[col_incomes]}
+        for collection in collections.values():
+            # Re-runs upsert on django_id instead of inserting duplicates; documents
+            # written by older versions of this command have no django_id.
+            collection.create_index(
+                'django_id', unique=True,
+                partialFilterExpression={'django_id': {'$exists': True}},
+            )
+
+        queryset = CashTransaction.objects.all()
+        commit_watermark = None
+        if options['since_last_run']:
+            export_state.ensure_watermarks(['finance.cash'])
+            queryset, commit_watermark = export_state.changed_since_last_run(queryset, 'finance.cash', 'updated_at')
+
+        started = time.perf_counter()
+        workers = max(1, options['workers'])
+        incremental = options['since_last_run']
+        if workers == 1:
+            counts = export_range(collections, queryset, options['batch'], move_types=incremental)
+        else:
+            bounds = queryset.aggregate(lowest=Min('pk'), highest=Max('pk'))
+            counts = {'expense': 0, 'income': 0}
+            if bounds['lowest'] is not None:
+                ranges = partition(bounds['lowest'], bounds['highest'], workers)
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    futures = [
+                        pool.submit(export_range, collections, queryset, options['batch'], r, incremental)
+                        for r in ranges
+                    ]
+                    for future in futures:
+                        for type_value, count in future.result().items():
+                            counts[type_value] += count
+
+        # Replicate deletes recorded since the last run
+        deleted = 0
+        for collection in collections.values():
+            with mongo_sync.BulkWriter(collection, options['batch']) as writer:
+                clear_tombstones = export_state.apply_tombstones('finance', collection.name, writer)
+            clear_tombstones()
+            deleted += writer.deleted
+        if commit_watermark is not None:
+            commit_watermark()
+
+        seconds = time.perf_counter() - started
+        total = counts['expense'] + counts['income']
+        rate = total / seconds if seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {counts['expense']} expenses and {counts['income']} incomes to MongoDB '{db_name}' "
+            f"in {seconds:.2f}s ({rate:,.0f} docs/s); removed {deleted} deleted documents."
+        ))
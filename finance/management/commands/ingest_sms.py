@@ -0,0 +1,49 @@
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import sms
+
+
+class Command(BaseCommand):
+    help = "Parse bank SMS dumps (JSON array or NDJSON, optionally .gz) into CashTransactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="SMS dump files; '-' reads stdin")
+        parser.add_argument('--chunk', type=int, default=5000, help='Rows per bulk_create')
+        parser.add_argument('--dry-run', action='store_true', help='Parse and deduplicate without writing')
+
+    def handle(self, *args, **options):
+        totals = {}
+        started = time.perf_counter()
+        for path in options['paths']:
+            try:
+                if path == '-':
+                    stream = sys.stdin.buffer
+                elif path.endswith('.gz'):
+                    stream = gzip.open(path, 'rb')
+                else:
+                    stream = open(path, 'rb')
+            except OSError as e:
+                raise CommandError(f"Cannot read {path}: {e}")
+            try:
+                stats = sms.ingest(sms.iter_records(stream), max(1, options['chunk']), options['dry_run'])
+            except ValueError as e:
+                raise CommandError(f"{path} is not valid JSON/NDJSON: {e}")
+            finally:
+                if stream is not sys.stdin.buffer:
+                    stream.close()
+            self.stdout.write(f"{path}: {stats}")
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+
+        seconds = time.perf_counter() - started
+        rate = totals.get('read', 0) / seconds if seconds else 0
+        verb = 'Would insert' if options['dry_run'] else 'Inserted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals.get('inserted', 0)} transactions from {totals.get('read', 0)} messages "
+            f"({totals.get('duplicates', 0)} duplicates, {totals.get('skipped', 0)} skipped) "
+            f"in {seconds:.2f}s ({rate:,.0f} msgs/s)."
+        ))
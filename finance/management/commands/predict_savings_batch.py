@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import ml
+
+
+class Command(BaseCommand):
+    help = "Predict the savings target for every row of a CSV, Parquet or Arrow dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Dataset with the FEATURES columns')
+        parser.add_argument('--out', help='Write predictions to this .npy file (float32)')
+        parser.add_argument('--chunksize', type=int, default=1000000, help='Rows predicted per batch')
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        started = time.perf_counter()
+        try:
+            parts = [part.astype(np.float32) for part in ml.predict_file(options['path'], max(1, options['chunksize']))]
+        except ml.ModelError as e:
+            raise CommandError(str(e))
+        predictions = np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+        seconds = time.perf_counter() - started
+        if options['out']:
+            np.save(options['out'], predictions)
+            self.stdout.write(f"Wrote {options['out']}")
+        if len(predictions):
+            self.stdout.write(f"mean {predictions.mean():,.2f}, min {predictions.min():,.2f}, max {predictions.max():,.2f}")
+        rate = len(predictions) / seconds if seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Predicted {len(predictions)} rows in {seconds:.2f}s ({rate:,.0f} rows/s)."
+        ))
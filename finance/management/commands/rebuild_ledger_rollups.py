@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.ledger import rebuild_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-day/per-month LedgerRollup table from CashTransaction and verify it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only compare stored rollups against a fresh scan')
+        parser.add_argument('--batch', type=int, default=1000, help='Batch size for bulk inserts')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count = rebuild_rollups(batch_size=options['batch'])
+            self.stdout.write(f"Rebuilt {count} rollup rows.")
+
+        mismatches = verify_rollups()
+        if mismatches:
+            for line in mismatches:
+                self.stderr.write(line)
+            raise CommandError(f"{len(mismatches)} rollup rows do not match CashTransaction.")
+
+        self.stdout.write(self.style.SUCCESS("Ledger rollups match a fresh scan of CashTransaction."))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from finance.features import refresh_features
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-month SavingsFeatures rows that CashTransaction writes marked dirty"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every month, not just dirty ones')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = refresh_features(full=options['full'])
+        seconds = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Recomputed features for {count} months in {seconds:.2f}s."))
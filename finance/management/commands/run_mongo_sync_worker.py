@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import mongo_sync, outbox
+
+
+class Command(BaseCommand):
+    help = "Drain the MongoDB outbox in batches with bulk_write, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=500, help='Outbox rows per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--max-attempts', type=int, default=10, help='Stop retrying a row after this many failures')
+        parser.add_argument('--once', action='store_true', help='Drain what is due and exit')
+        parser.add_argument('--uri', type=str, default=None, help='Override MongoDB Atlas connection URI (takes precedence over config/env)')
+
+    def handle(self, *args, **options):
+        try:
+            mongo_sync.get_client(options['uri'])
+        except mongo_sync.MongoSyncError as e:
+            raise CommandError(str(e))
+
+        def get_database(alias):
+            return mongo_sync.get_database(alias, options['uri'])
+
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = outbox.drain(get_database, batch_size=options['batch'], max_attempts=options['max_attempts'])
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    self.stdout.write(f"Synced {sent} outbox rows ({failed} scheduled for retry).")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Synced {total_sent} rows, {total_failed} failures."))
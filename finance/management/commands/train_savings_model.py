@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import ml, training
+
+
+class Command(BaseCommand):
+    help = "Search model families for the savings model, then write a versioned artifact and serve it"
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group()
+        source.add_argument('--data', '--csv', dest='csv',
+                            help='Training CSV, Parquet or Arrow file (default: ML Model/finance_savings_dataset.csv)')
+        source.add_argument('--ledger', action='store_true',
+                            help="Train on the SavingsFeatures table, predicting next month's net_saving "
+                                 "(not served unless --promote is given)")
+        parser.add_argument('--chunksize', type=int,
+                            help='Stream --data in chunks of this many rows and '
+                                 'fit SGDRegressor out of core instead of searching in memory')
+        parser.add_argument('--epochs', type=int, default=5, help='Passes over the data in --chunksize mode')
+        parser.add_argument('--families', nargs='+', help='Model families to search (default: all)')
+        parser.add_argument('--n-iter', type=int, default=10, help='Sampled candidates per family')
+        parser.add_argument('--folds', type=int, default=5, help='Cross-validation folds')
+        parser.add_argument('--search-rows', type=int, default=200000,
+                            help='Rows of the training split sampled for the search')
+        parser.add_argument('--n-jobs', type=int, default=-1, help='Parallel fits (-1: every core)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for splits and models')
+        parser.add_argument('--out-dir', help='Artifact directory (default: ML Model/artifacts)')
+        parser.add_argument('--no-promote', action='store_true', help='Do not replace the served model')
+        parser.add_argument('--promote', action='store_true',
+                            help='Serve a --ledger model, replacing the max_possible_saving model')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['chunksize']:
+                artifact = self.train_out_of_core(options)
+                rows = sum(artifact['metrics']['rows'][key] for key in ('train', 'test'))
+            else:
+                artifact, rows = self.train_in_memory(options)
+        except training.TrainingError as e:
+            raise CommandError(str(e))
+
+        path = training.save_artifact(artifact, options['out_dir'])
+        self.stdout.write(f"Wrote {path} and metrics.json")
+        if options['ledger'] and not options['promote']:
+            self.stdout.write(f"Not serving the {artifact['target']} model; pass --promote to serve it")
+        elif not options['no_promote']:
+            served = training.promote(path, ml.model_path())
+            self.stdout.write(f"Now serving {artifact['version']} from {served}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained {artifact['metrics']['family']} on {rows} rows in {time.perf_counter() - started:.1f}s."
+        ))
+
+    def train_in_memory(self, options):
+        X, y, target = training.load_dataset(options['csv'], ledger=options['ledger'])
+        artifact = training.train(
+            X, y, target=target,
+            families=options['families'],
+            n_iter=max(1, options['n_iter']),
+            folds=options['folds'],
+            search_rows=max(1, options['search_rows']),
+            n_jobs=options['n_jobs'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        return artifact, len(X)
+
+    def train_out_of_core(self, options):
+        if options['ledger']:
+            raise CommandError('--chunksize streams a file; use --data instead of --ledger')
+        path = options['csv'] or training.DEFAULT_CSV_PATH
+        chunksize = max(1, options['chunksize'])
+        return training.train_out_of_core(
+            lambda: training.iter_chunks(path, chunksize),
+            epochs=max(1, options['epochs']),
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:01
+
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+
+
+def populate_rollups(apps, schema_editor):
+    CashTransaction = apps.get_model('finance', 'CashTransaction')
+    LedgerRollup = apps.get_model('finance', 'LedgerRollup')
+    truncs = {
+        'day': TruncDate('created_at'),
+        'month': TruncMonth('created_at', output_field=DateField()),
+    }
+    rollups = {}
+    for period, trunc in truncs.items():
+        rows = (
+            CashTransaction.objects.order_by()
+            .annotate(bucket=trunc)
+            .values('bucket', 'type')
+            .annotate(total=Sum('amount'), n=Count('id'))
+        )
+        for row in rows:
+            key = (period, row['bucket'])
+            rollup = rollups.setdefault(key, LedgerRollup(period=period, period_start=row['bucket']))
+            setattr(rollup, row['type'], row['total'])
+            rollup.txn_count += row['n']
+    LedgerRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_person_billsplit_billsplithistory_billsplititem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('txn_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['period', 'period_start'],
+                'unique_together': {('period', 'period_start')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
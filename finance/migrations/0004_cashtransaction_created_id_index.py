@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_ledgerrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cashtransaction',
+            index=models.Index(fields=['created_at', 'id'], name='cashtx_created_id_idx'),
+        ),
+    ]
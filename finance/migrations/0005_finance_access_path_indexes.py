@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_cashtransaction_created_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='billsplit',
+            index=models.Index(fields=['created_at'], name='billsplit_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='billsplithistory',
+            index=models.Index(fields=['bill_split', 'created_at'], name='billsplithist_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='billsplititem',
+            index=models.Index(fields=['bill_split', 'is_paid', 'amount'], name='billsplititem_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashtransaction',
+            index=models.Index(fields=['type', 'created_at', 'id'], name='cashtx_type_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0005_finance_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MongoOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database', models.CharField(help_text='Logical database alias: finance or bill_split', max_length=20)),
+                ('collection', models.CharField(max_length=100)),
+                ('operation', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=6)),
+                ('key', models.JSONField(help_text='Filter identifying the MongoDB document, e.g. {"django_id": 1}')),
+                ('document', models.JSONField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['available_at', 'id'], name='mongooutbox_due_idx')],
+            },
+        ),
+    ]
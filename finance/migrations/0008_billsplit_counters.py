@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    BillSplit = apps.get_model('finance', 'BillSplit')
+    paid = Q(billsplititem__is_paid=True)
+    bills = BillSplit.objects.order_by().annotate(
+        items=Count('billsplititem'),
+        paid=Count('billsplititem', filter=paid),
+        paid_sum=Coalesce(
+            Sum('billsplititem__amount', filter=paid),
+            Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        last_paid_at=Max('billsplititem__paid_at'),
+    )
+    for bill in bills.iterator(chunk_size=1000):
+        bill.item_count, bill.paid_count, bill.paid_amount = bill.items, bill.paid, bill.paid_sum
+        fields = ['item_count', 'paid_count', 'paid_amount']
+        if bill.items and bill.paid >= bill.items and not bill.is_settled:
+            bill.is_settled = True
+            bill.settled_at = bill.last_paid_at
+            fields += ['is_settled', 'settled_at']
+        bill.save(update_fields=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_incremental_export_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billsplit',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='billsplit',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='billsplit',
+            name='paid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='billsplit',
+            index=models.Index(fields=['is_settled', 'created_at'], name='billsplit_settled_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_billsplit_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billsplit',
+            name='paid_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bills_paid', to='finance.person'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0009_billsplit_paid_by'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='billsplit',
+            name='split_type',
+            field=models.CharField(choices=[('equal', 'Equal Split'), ('custom', 'Custom Amounts'), ('percentage', 'Percentages'), ('weighted', 'Weighted Shares')], default='equal', max_length=20),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:16
+
+from django.db import migrations, models
+
+
+def backfill_categories(apps, schema_editor):
+    # Existing rows would otherwise all stay 'other' until categorize_transactions ran
+    from finance.categories import backfill
+
+    backfill(apps.get_model('finance', 'CashTransaction'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0010_billsplit_split_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashtransaction',
+            name='category',
+            field=models.CharField(default='other', max_length=32),
+        ),
+        migrations.RunPython(backfill_categories, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cashtransaction',
+            index=models.Index(fields=['type', 'category', 'amount'], name='cashtx_type_category_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_cashtransaction_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashtransaction',
+            name='sms_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='cashtransaction',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
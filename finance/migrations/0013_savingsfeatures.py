@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0012_cashtransaction_sms_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavingsFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('income', models.FloatField(default=0)),
+                ('total_spend', models.FloatField(default=0)),
+                ('food_ratio', models.FloatField(default=0)),
+                ('shopping_ratio', models.FloatField(default=0)),
+                ('subscriptions_ratio', models.FloatField(default=0)),
+                ('essential_ratio', models.FloatField(default=0)),
+                ('spend_variability', models.FloatField(default=0)),
+                ('avg_txn_size', models.FloatField(default=0)),
+                ('txn_count', models.IntegerField(default=0)),
+                ('recurring_amount', models.FloatField(default=0)),
+                ('end_of_month_spike', models.IntegerField(default=0)),
+                ('emi', models.FloatField(default=0)),
+                ('carry_forward_balance', models.FloatField(default=0)),
+                ('net_saving', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('dirty_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'savings features',
+                'ordering': ['month'],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0013_savingsfeatures'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='savingsfeatures',
+            name='dirty_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='savingsfeatures',
+            index=models.Index(condition=models.Q(('dirty_at__isnull', False)), fields=['month'], name='savingsfeat_dirty_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0014_savingsfeatures_dirty_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='billsplit',
+            name='billsplit_settled_idx',
+        ),
+        migrations.AddIndex(
+            model_name='billsplit',
+            index=models.Index(condition=models.Q(('is_settled', False)), fields=['created_at'], name='billsplit_unsettled_idx'),
+        ),
+    ]
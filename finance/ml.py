@@ -0,0 +1,220 @@
+"""
+In-process inference for the savings model.
+
+The artifact written by `ML Model/finance_Model.py` (a dict with the fitted
+"pipeline", its "features" and "target") is loaded once per worker process
+with joblib.load(mmap_mode='r'), so large NumPy arrays are memory-mapped and
+shared between workers through the page cache, and reloaded only when the
+file changes. Its feature list must be finance.features.FEATURES (in any
+order); inputs are arranged in the artifact's order before predicting.
+
+A StandardScaler + linear-model pipeline (what finance_Model.py trains) is
+folded into one weight vector at load time, so a prediction is a single
+matrix-vector product instead of a pass through scikit-learn's input
+validation; any other pipeline is called as is.
+"""
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from .features import FEATURES, TARGET
+from .models import SavingsFeatures
+
+
+DEFAULT_MODEL_PATH = Path(settings.BASE_DIR) / 'ML Model' / 'finbuddy_savings_model.pkl'
+
+
+class ModelError(Exception):
+    """Raised when the savings model is missing, invalid or given bad input"""
+
+
+def model_path():
+    return Path(getattr(settings, 'SAVINGS_MODEL_PATH', DEFAULT_MODEL_PATH))
+
+
+def _linear_form(pipeline):
+    """Return (weights, bias) equivalent to a scaler + linear-model pipeline, or None"""
+    import numpy as np
+
+    steps = [step for _, step in getattr(pipeline, 'steps', [(None, pipeline)])]
+    estimator = steps[-1]
+    coef = getattr(estimator, 'coef_', None)
+    if coef is None or np.ndim(coef) != 1:
+        return None
+    weights = np.asarray(coef, dtype=np.float64)
+    intercept = np.ravel(getattr(estimator, 'intercept_', 0.0))
+    if intercept.size != 1:
+        return None
+    bias = float(intercept[0])  # SGDRegressor keeps a 1-element array
+    for step in reversed(steps[:-1]):
+        if type(step).__name__ != 'StandardScaler':
+            return None
+        scale = step.scale_ if step.scale_ is not None else 1.0
+        mean = step.mean_ if step.mean_ is not None else 0.0
+        weights = weights / scale
+        bias -= float(np.dot(weights, mean))
+    return weights, bias
+
+
+class SavingsModel:
+    """A loaded savings-model artifact"""
+
+    def __init__(self, artifact, version):
+        import numpy as np
+
+        if not isinstance(artifact, dict) or 'pipeline' not in artifact or 'features' not in artifact:
+            raise ModelError('Model artifact must be a dict with "pipeline" and "features"')
+        features = list(artifact['features'])
+        if set(features) != set(FEATURES) or len(features) != len(FEATURES):
+            missing = sorted(set(FEATURES) - set(features))
+            extra = sorted(set(features) - set(FEATURES))
+            raise ModelError(
+                f'Model features do not match finance.features.FEATURES '
+                f'(missing: {missing or "none"}, unexpected or repeated: {extra or "none"})'
+            )
+        self.pipeline = artifact['pipeline']
+        n_features = getattr(self.pipeline, 'n_features_in_', len(features))
+        if n_features != len(features):
+            raise ModelError(f'Pipeline expects {n_features} features, artifact lists {len(features)}')
+        self.features = features
+        self.target = artifact.get('target', TARGET)
+        self.version = str(artifact.get('version') or version)
+        self.metrics = artifact.get('metrics') or {}
+
+        self.linear = _linear_form(self.pipeline)
+        if self.linear is not None:
+            # Only trust the folded form if it reproduces the pipeline
+            probe = np.vstack([np.zeros(len(features)), np.arange(1.0, len(features) + 1)])
+            if not np.allclose(self._predict_linear(probe), self._predict_pipeline(probe), rtol=1e-6, atol=1e-6):
+                self.linear = None
+
+    def _predict_linear(self, matrix):
+        weights, bias = self.linear
+        return matrix @ weights + bias
+
+    def _predict_pipeline(self, matrix):
+        import pandas as pd
+
+        # The pipeline was fitted on a DataFrame; keep column names to avoid sklearn warnings
+        return self.pipeline.predict(pd.DataFrame(matrix, columns=self.features))
+
+    def matrix(self, rows):
+        """Coerce rows to a float matrix in self.features order
+
+        Dicts and DataFrames are matched by feature name; sequences and arrays
+        must already be in self.features order.
+        """
+        import numpy as np
+
+        if hasattr(rows, 'columns'):
+            missing = [name for name in self.features if name not in rows.columns]
+            if missing:
+                raise ModelError(f'Missing features: {", ".join(missing)}')
+            matrix = rows[self.features].to_numpy(dtype=np.float64)
+        elif isinstance(rows, np.ndarray):
+            matrix = np.asarray(rows, dtype=np.float64)
+        else:
+            rows = list(rows)
+            if rows and isinstance(rows[0], dict):
+                try:
+                    rows = [[row[name] for name in self.features] for row in rows]
+                except KeyError as e:
+                    raise ModelError(f'Missing feature: {e.args[0]}')
+            try:
+                matrix = np.asarray(rows, dtype=np.float64)
+            except (TypeError, ValueError) as e:
+                raise ModelError(f'Features must be numbers: {e}')
+        if matrix.ndim == 1 and matrix.size == len(self.features):
+            matrix = matrix.reshape(1, -1)
+        if matrix.size == 0:
+            return matrix.reshape(0, len(self.features))
+        if matrix.ndim != 2 or matrix.shape[1] != len(self.features):
+            raise ModelError(f'Expected rows of {len(self.features)} features, got shape {matrix.shape}')
+        if not np.isfinite(matrix).all():
+            raise ModelError('Features must be finite numbers')
+        return matrix
+
+    def predict_many(self, rows):
+        """Predict the target for many rows at once; returns a float64 array"""
+        matrix = self.matrix(rows)
+        if not len(matrix):
+            return matrix[:, 0]
+        if self.linear is not None:
+            return self._predict_linear(matrix)
+        return self._predict_pipeline(matrix)
+
+    def predict(self, row):
+        return float(self.predict_many([row])[0])
+
+
+_lock = threading.Lock()
+_loaded = {'key': None, 'model': None}
+
+
+def get_model():
+    """The process-wide SavingsModel, loaded on first use and when the artifact changes"""
+    path = model_path()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise ModelError(f'No savings model at {path}; train one first')
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    if _loaded['key'] == key:
+        return _loaded['model']
+    with _lock:
+        if _loaded['key'] != key:
+            import joblib
+
+            try:
+                artifact = joblib.load(path, mmap_mode='r')
+            except Exception as e:
+                raise ModelError(f'Cannot load savings model from {path}: {e}')
+            _loaded['model'] = SavingsModel(artifact, version=f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+            _loaded['key'] = key
+    return _loaded['model']
+
+
+def predict_many(rows):
+    return get_model().predict_many(rows)
+
+
+def predict_months(months=None):
+    """Predictions for SavingsFeatures months as a list of {month, prediction} dicts
+
+    Only stored features are read; recomputing dirty months is left to
+    refresh_savings_features, so a request never runs the pandas pipeline.
+    Months still waiting for it are flagged `stale`. Predictions go through
+    finance.prediction_cache, so an unchanged month costs one row read.
+    """
+    import numpy as np
+
+    from . import prediction_cache
+
+    model = get_model()
+    queryset = SavingsFeatures.objects.filter(computed_at__isnull=False)
+    if months is not None:
+        queryset = queryset.filter(month__in=list(months))
+    rows = list(queryset.order_by('month').values_list('month', 'dirty_at', *model.features))
+    if not rows:
+        return []
+    labels = [row[0] for row in rows]
+    matrix = np.array([row[2:] for row in rows], dtype=np.float64)
+    predictions = prediction_cache.predict_cached(model, matrix, months=labels)
+    return [
+        {'month': row[0].strftime('%Y-%m'), 'prediction': round(value, 2), 'stale': row[1] is not None}
+        for row, value in zip(rows, predictions)
+    ]
+
+
+def predict_file(path, chunksize=1000000):
+    """Yield prediction arrays for a CSV/Parquet/Arrow dataset, one per chunk; Arrow files are memory-mapped"""
+    from . import datasets
+
+    model = get_model()
+    try:
+        for frame in datasets.iter_frames(path, chunksize, target=None):
+            yield model.predict_many(frame)
+    except datasets.DatasetError as e:
+        raise ModelError(str(e))
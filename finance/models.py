@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class CashTransaction(models.Model):
@@ -12,15 +13,85 @@ class CashTransaction(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     type = models.CharField(max_length=7, choices=TYPE_CHOICES)
     source_or_destination = models.CharField(max_length=255, help_text="Where the money came from or went to")
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Assigned from the description on save (finance.categories)
+    category = models.CharField(max_length=32, default="other")
+    # Ingested SMS keep their own timestamp, so this is a default, not auto_now_add
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # SHA-1 of the source SMS (finance.sms); unique so re-ingesting a dump is a no-op
+    sms_hash = models.CharField(max_length=40, null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="cashtx_created_id_idx"),
+            models.Index(fields=["type", "created_at", "id"], name="cashtx_type_created_idx"),
+            models.Index(fields=["type", "category", "amount"], name="cashtx_type_category_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.created_at:%Y-%m-%d %H:%M} {self.type} {self.amount} - {self.description}"
 
 
+class LedgerRollup(models.Model):
+    """Per-day and per-month income/expense totals maintained from CashTransaction writes"""
+    PERIOD_CHOICES = (
+        ("day", "Day"),
+        ("month", "Month"),
+    )
+
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    txn_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ["period", "period_start"]
+        ordering = ["period", "period_start"]
+
+    def __str__(self) -> str:
+        return f"{self.period} {self.period_start}: +{self.income} -{self.expense}"
+
+
+class SavingsFeatures(models.Model):
+    """Per-month input vector of the savings model, computed from CashTransaction (finance.features)"""
+    month = models.DateField(unique=True)
+    income = models.FloatField(default=0)
+    total_spend = models.FloatField(default=0)
+    food_ratio = models.FloatField(default=0)
+    shopping_ratio = models.FloatField(default=0)
+    subscriptions_ratio = models.FloatField(default=0)
+    essential_ratio = models.FloatField(default=0)
+    spend_variability = models.FloatField(default=0)
+    avg_txn_size = models.FloatField(default=0)
+    txn_count = models.IntegerField(default=0)
+    recurring_amount = models.FloatField(default=0)
+    end_of_month_spike = models.IntegerField(default=0)
+    emi = models.FloatField(default=0)
+    carry_forward_balance = models.FloatField(default=0)
+    # Observed income - total_spend; the label when training on the ledger
+    net_saving = models.FloatField(default=0)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    # Set when a transaction in this month (or the one before) changes
+    dirty_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['month']
+        verbose_name_plural = 'savings features'
+        indexes = [
+            # Only dirty months are indexed, so refresh_features() never reads clean rows
+            models.Index(
+                fields=['month'],
+                name='savingsfeat_dirty_idx',
+                condition=models.Q(dirty_at__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: spend {self.total_spend:,.2f} of {self.income:,.2f}"
+
+
 class Person(models.Model):
     """Store people and their UPI IDs for bill splitting"""
     name = models.CharField(max_length=100)
@@ -47,29 +118,48 @@ class BillSplit(models.Model):
         choices=[
             ('equal', 'Equal Split'),
             ('custom', 'Custom Amounts'),
+            ('percentage', 'Percentages'),
+            ('weighted', 'Weighted Shares'),
         ],
         default='equal'
     )
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    # Who paid the bill up front; empty means the app owner did
+    paid_by = models.ForeignKey(
+        Person, on_delete=models.SET_NULL, null=True, blank=True, related_name='bills_paid'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_settled = models.BooleanField(default=False)
     settled_at = models.DateTimeField(null=True, blank=True)
+    # Denormalized from the items; maintained by BillSplitService
+    item_count = models.PositiveIntegerField(default=0)
+    paid_count = models.PositiveIntegerField(default=0)
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='billsplit_created_idx'),
+            # Open bills only: is_settled=False compiles to NOT is_settled, which SQLite
+            # cannot seek on an (is_settled, created_at) index
+            models.Index(
+                fields=['created_at'],
+                name='billsplit_unsettled_idx',
+                condition=models.Q(is_settled=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - ${self.total_amount}"
 
     @property
     def split_count(self):
-        return self.billsplititem_set.count()
+        return self.item_count
 
     @property
     def remaining_amount(self):
-        paid_amount = sum(item.amount for item in self.billsplititem_set.filter(is_paid=True))
-        return self.total_amount - paid_amount
+        return self.total_amount - self.paid_amount
 
 
 class BillSplitItem(models.Model):
@@ -81,10 +171,15 @@ class BillSplitItem(models.Model):
     paid_at = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ['bill_split', 'person']
         ordering = ['person__name']
+        indexes = [
+            # Covers recounting a bill's paid items
+            models.Index(fields=['bill_split', 'is_paid', 'amount'], name='billsplititem_paid_idx'),
+        ]
 
     def __str__(self):
         return f"{self.person.name} - ${self.amount} ({'Paid' if self.is_paid else 'Pending'})"
@@ -109,9 +204,64 @@ class BillSplitHistory(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['bill_split', 'created_at'], name='billsplithist_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.bill_split.title} - {self.action}"
 
 
+class MongoOutbox(models.Model):
+    """Pending MongoDB writes, recorded in the same transaction as the model change"""
+    OPERATION_CHOICES = [
+        ('upsert', 'Upsert'),
+        ('delete', 'Delete'),
+    ]
+
+    database = models.CharField(max_length=20, help_text="Logical database alias: finance or bill_split")
+    collection = models.CharField(max_length=100)
+    operation = models.CharField(max_length=6, choices=OPERATION_CHOICES)
+    key = models.JSONField(help_text="Filter identifying the MongoDB document, e.g. {\"django_id\": 1}")
+    document = models.JSONField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['available_at', 'id'], name='mongooutbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.operation} {self.database}.{self.collection} {self.key}"
 
+
+class ExportWatermark(models.Model):
+    """High-watermark of the last successful incremental Mongo export per collection"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.DateTimeField(null=True, blank=True)
+    last_pk = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value or self.last_pk}"
+
+
+class ExportTombstone(models.Model):
+    """A deleted row whose MongoDB document the next export must remove"""
+    database = models.CharField(max_length=20)
+    collection = models.CharField(max_length=100)
+    key = models.JSONField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['database', 'collection', 'id'], name='exporttombstone_target_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.database}.{self.collection} {self.key}"
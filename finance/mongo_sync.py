@@ -0,0 +1,295 @@
+"""
+MongoDB Atlas wiring shared by the outbox worker and the export commands.
+
+Configuration comes from static/config/mongo_transfer.json; the connection
+URI is resolved as CLI override > environment variable named by
+`atlas_uri_env` > `atlas_uri`, and `options` (maxPoolSize, tls, ...) are
+passed to a lazily created, per-process MongoClient. Document builders are
+the single definition of every synced document shape, and BulkWriter merges
+many writes into unordered bulk_write calls. pymongo is only imported when a
+client is actually needed, so the web process never depends on it.
+"""
+import json
+import os
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+from .models import BillSplit, BillSplitHistory, BillSplitItem, CashTransaction, Person
+
+
+DEFAULT_CONFIG_PATH = 'static/config/mongo_transfer.json'
+
+
+class MongoSyncError(Exception):
+    """Raised when MongoDB is not configured or not reachable"""
+
+
+@lru_cache(maxsize=None)
+def load_config(path=DEFAULT_CONFIG_PATH):
+    config_path = os.path.join(settings.BASE_DIR, path)
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('mongodb') or {}
+    except (OSError, ValueError) as e:
+        raise MongoSyncError(f"Failed to read config {config_path}: {e}")
+
+
+def resolve_uri(mongodb_cfg, override=None):
+    atlas_uri = override
+    if not atlas_uri:
+        atlas_uri_env = mongodb_cfg.get('atlas_uri_env')
+        if atlas_uri_env:
+            atlas_uri = os.getenv(atlas_uri_env)
+    if not atlas_uri:
+        atlas_uri = mongodb_cfg.get('atlas_uri')
+    if not atlas_uri or '<username>' in atlas_uri or '<cluster>' in atlas_uri:
+        raise MongoSyncError(
+            'Invalid MongoDB Atlas URI. Set a valid URI in config.mongodb.atlas_uri '
+            'or provide environment variable via config.mongodb.atlas_uri_env.'
+        )
+    return atlas_uri
+
+
+def database_name(alias, mongodb_cfg=None):
+    """Map the logical database alias ('finance' or 'bill_split') to its configured name"""
+    mongodb_cfg = mongodb_cfg if mongodb_cfg is not None else load_config()
+    if alias == 'bill_split':
+        return mongodb_cfg.get('bill_split_database', 'bill_split_db')
+    return mongodb_cfg.get('database', 'finance_tracker')
+
+
+# One MongoClient per process and URI. MongoClient is thread-safe and pools
+# connections itself, but must not be shared across fork(); the pid check and
+# the at-fork hook make a forked worker build its own client on first use.
+_clients = {}
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _clients, _clients_pid, _clients_lock
+    _clients = {}
+    _clients_pid = os.getpid()
+    _clients_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def client_options(mongodb_cfg):
+    """MongoClient keyword options from config.mongodb.options (pool sizes, tls, appName...)"""
+    options = dict(mongodb_cfg.get('options') or {})
+    options.setdefault('maxPoolSize', 50)
+    return options
+
+
+def get_client(uri=None, mongodb_cfg=None):
+    """Return the process-wide MongoClient for the configured (or overridden) URI"""
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+    mongodb_cfg = mongodb_cfg if mongodb_cfg is not None else load_config()
+    atlas_uri = resolve_uri(mongodb_cfg, uri)
+    client = _clients.get(atlas_uri)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(atlas_uri)
+            if client is None:
+                try:
+                    from pymongo import MongoClient
+                except ImportError:
+                    raise MongoSyncError('pymongo is not installed. Please install it in your environment.')
+                client = MongoClient(atlas_uri, connect=False, **client_options(mongodb_cfg))
+                _clients[atlas_uri] = client
+    return client
+
+
+def get_database(alias, uri=None, mongodb_cfg=None):
+    return get_client(uri, mongodb_cfg)[database_name(alias, mongodb_cfg)]
+
+
+class BulkWriter:
+    """Buffer upserts/deletes for one collection and flush them as bulk_write(ordered=False)
+
+    Repeated writes to the same key inside one buffer collapse to the last one,
+    so each flush is a single round trip with at most one op per document.
+    """
+
+    def __init__(self, collection, batch_size=1000):
+        self.collection = collection
+        self.batch_size = batch_size
+        self._pending = {}
+        self.upserted = 0
+        self.modified = 0
+        self.deleted = 0
+        self.batches = 0
+
+    def upsert(self, key, document):
+        from pymongo import UpdateOne
+
+        self._add(key, UpdateOne(key, {'$set': document}, upsert=True))
+
+    def delete(self, key):
+        from pymongo import DeleteOne
+
+        self._add(key, DeleteOne(key))
+
+    def _add(self, key, operation):
+        self._pending[tuple(sorted(key.items()))] = operation
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        operations = list(self._pending.values())
+        self._pending = {}
+        result = self.collection.bulk_write(operations, ordered=False)
+        self.upserted += result.upserted_count
+        self.modified += result.modified_count
+        self.deleted += result.deleted_count
+        self.batches += 1
+
+    @property
+    def written(self):
+        return self.upserted + self.modified + self.deleted
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+# -- Targets -----------------------------------------------------------------
+
+def _collection(mapping_key, name, default):
+    return (load_config().get(mapping_key) or {}).get(name, default)
+
+
+def cash_collection(type_value):
+    name = 'incomes' if type_value == 'income' else 'expenses'
+    return ('finance', _collection('collections', name, name))
+
+
+def bill_split_collection(name):
+    return ('bill_split', _collection('bill_split_collections', name, name))
+
+
+def target_for(instance):
+    """Return (database alias, collection name) a model instance syncs to"""
+    if isinstance(instance, CashTransaction):
+        return cash_collection(instance.type)
+    if isinstance(instance, Person):
+        return bill_split_collection('users')
+    if isinstance(instance, BillSplit):
+        return bill_split_collection('bills')
+    if isinstance(instance, BillSplitItem):
+        return bill_split_collection('bill_items')
+    if isinstance(instance, BillSplitHistory):
+        return bill_split_collection('history')
+    raise MongoSyncError(f"No MongoDB target for {type(instance).__name__}")
+
+
+# -- Document builders -------------------------------------------------------
+
+def transaction_document(tx):
+    doc = {
+        'django_id': tx.pk,
+        'date': tx.created_at.strftime('%Y-%m-%d'),
+        'description': tx.description,
+        'amount': -float(tx.amount) if tx.type == 'expense' else float(tx.amount),
+        'method': 'cash',
+        'type': tx.type,
+    }
+    if tx.type == 'expense':
+        doc['category'] = tx.category
+    else:
+        doc['source'] = tx.source_or_destination
+    return doc
+
+
+def person_document(person):
+    return {
+        'user_id': f'user_{person.pk}',
+        'django_id': person.pk,
+        'name': person.name,
+        'upi_id': person.upi_id,
+        'phone': person.phone,
+        'email': person.email,
+        'created_at': person.created_at.isoformat(),
+        'updated_at': person.updated_at.isoformat(),
+    }
+
+
+def bill_document(bill):
+    return {
+        'bill_id': f'bill_{bill.pk}',
+        'django_id': bill.pk,
+        'title': bill.title,
+        'description': bill.description,
+        'total_amount': float(bill.total_amount),
+        'split_type': bill.split_type,
+        'paid_by': f'user_{bill.paid_by_id}' if bill.paid_by_id else None,
+        'is_settled': bill.is_settled,
+        'created_at': bill.created_at.isoformat(),
+        'updated_at': bill.updated_at.isoformat(),
+        'settled_at': bill.settled_at.isoformat() if bill.settled_at else None,
+    }
+
+
+def bill_item_document(item):
+    return {
+        'item_id': f'item_{item.pk}',
+        'django_id': item.pk,
+        'bill_id': f'bill_{item.bill_split_id}',
+        'user_id': f'user_{item.person_id}',
+        'amount': float(item.amount),
+        'is_paid': item.is_paid,
+        'paid_at': item.paid_at.isoformat() if item.paid_at else None,
+        'notes': item.notes,
+        'created_at': item.created_at.isoformat(),
+    }
+
+
+def history_document(hist):
+    return {
+        'history_id': f'hist_{hist.pk}',
+        'django_id': hist.pk,
+        'bill_id': f'bill_{hist.bill_split_id}',
+        'action': hist.action,
+        'description': hist.description,
+        'created_at': hist.created_at.isoformat(),
+    }
+
+
+def payment_transaction_id(item_pk, paid_at):
+    return f'txn_{item_pk}_{int(paid_at.timestamp())}'
+
+
+def payment_transaction_document(item, type_value='payment', status='completed'):
+    return {
+        'transaction_id': payment_transaction_id(item.pk, item.paid_at),
+        'user_id': f'user_{item.person_id}',
+        'bill_id': f'bill_{item.bill_split_id}',
+        'amount': float(item.amount),
+        'type': type_value,
+        'status': status,
+        'created_at': item.paid_at.isoformat(),
+    }
+
+
+BUILDERS = {
+    CashTransaction: transaction_document,
+    Person: person_document,
+    BillSplit: bill_document,
+    BillSplitItem: bill_item_document,
+    BillSplitHistory: history_document,
+}
+
+
+def document_for(instance):
+    return BUILDERS[type(instance)](instance)
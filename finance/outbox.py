@@ -0,0 +1,217 @@
+"""
+Transactional outbox for MongoDB sync.
+
+Signal handlers call enqueue_*() so the pending Mongo write is stored in the
+same database transaction as the model change; the web request never talks
+to MongoDB. `manage.py run_mongo_sync_worker` calls drain() to ship pending
+rows with one unordered bulk_write per collection. drain() leases rows in one
+short transaction, talks to MongoDB with no transaction open and records the
+outcome in a second one, so the SQLite write lock is never held across a
+Mongo call. Upserts are keyed on the
+document's stable id (django_id / transaction_id), so retries are idempotent.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import mongo_sync
+from .models import CashTransaction, MongoOutbox
+
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+# How long a claimed row stays invisible to other workers while its bulk_write runs
+LEASE_SECONDS = 300
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS))
+
+
+def _row(target, operation, key, document=None):
+    database, collection = target
+    return MongoOutbox(
+        database=database,
+        collection=collection,
+        operation=operation,
+        key=key,
+        document=document,
+    )
+
+
+def operations_for_save(instance, created=False):
+    """(target, operation, key, document) tuples that bring MongoDB in line with a saved instance
+
+    `created` marks a row that was just inserted, so there is no document in
+    another collection to remove.
+    """
+    operations = [(
+        mongo_sync.target_for(instance), 'upsert',
+        {'django_id': instance.pk}, mongo_sync.document_for(instance),
+    )]
+    if isinstance(instance, CashTransaction) and not created:
+        # An edit may move the row between the incomes and expenses collections
+        other = 'expense' if instance.type == 'income' else 'income'
+        operations.append((mongo_sync.cash_collection(other), 'delete', {'django_id': instance.pk}, None))
+    if getattr(instance, 'is_paid', False) and getattr(instance, 'paid_at', None):
+        payment = mongo_sync.payment_transaction_document(instance)
+        operations.append((
+            mongo_sync.bill_split_collection('transactions'), 'upsert',
+            {'transaction_id': payment['transaction_id']}, payment,
+        ))
+    return operations
+
+
+def rows_for_save(instance, created=False):
+    """Outbox rows that bring MongoDB in line with a saved instance"""
+    return [_row(*operation) for operation in operations_for_save(instance, created)]
+
+
+def enqueue_save(instance, created=False):
+    MongoOutbox.objects.bulk_create(rows_for_save(instance, created))
+
+
+def enqueue_save_many(instances, created=False):
+    """Queue many saved instances with one executemany INSERT; returns the number of rows
+
+    Skips building a MongoOutbox per row, which dominates bulk_create() on
+    large batches (SMS ingestion queues one row per transaction).
+    """
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    adapt_json = connection.ops.adapt_json_value
+    params = [
+        (database, collection, operation, adapt_json(key, None),
+         None if document is None else adapt_json(document, None), 0, now, '', now)
+        for instance in instances
+        for (database, collection), operation, key, document in operations_for_save(instance, created)
+    ]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(_insert_sql(), params)
+    return len(params)
+
+
+def _insert_sql():
+    quote = connection.ops.quote_name
+    columns = ('database', 'collection', 'operation', 'key', 'document', 'attempts', 'available_at', 'last_error', 'created_at')
+    fields = [MongoOutbox._meta.get_field(name).column for name in columns]
+    return (
+        f"INSERT INTO {quote(MongoOutbox._meta.db_table)} ({', '.join(map(quote, fields))}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))})"
+    )
+
+
+def enqueue_delete(instance):
+    _row(mongo_sync.target_for(instance), 'delete', {'django_id': instance.pk}).save()
+
+
+def _claim_batch(batch_size, max_attempts):
+    """Lease a batch of due rows in a short transaction and commit before any Mongo call
+
+    Claiming counts as an attempt and pushes available_at past the lease, so
+    another worker skips the rows while they are in flight, and rows left by
+    a crashed worker come back once the lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = MongoOutbox.objects.filter(available_at__lte=now, attempts__lt=max_attempts)
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        rows = list(queryset.order_by('id')[:batch_size])
+        # A retried row must not overwrite a newer change queued for the same document
+        superseded = [
+            row for row in rows
+            if row.attempts and MongoOutbox.objects.filter(
+                database=row.database, collection=row.collection, key=row.key, id__gt=row.pk,
+            ).exists()
+        ]
+        rows = [row for row in rows if row not in superseded]
+        if rows:
+            # Older rows for the same documents still backing off are stale once these are sent;
+            # drop them now, since a sent row is deleted and could no longer supersede them
+            claimed = {_document_id(row): row.pk for row in rows}
+            older = MongoOutbox.objects.filter(id__lt=max(claimed.values())).exclude(
+                pk__in=[row.pk for row in rows]
+            )
+            superseded += [
+                row for row in older.only('id', 'database', 'collection', 'key')
+                if row.pk < claimed.get(_document_id(row), 0)
+            ]
+        if superseded:
+            MongoOutbox.objects.filter(pk__in=[row.pk for row in superseded]).delete()
+        if rows:
+            MongoOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                attempts=F('attempts') + 1,
+                available_at=now + timedelta(seconds=LEASE_SECONDS),
+            )
+    for row in rows:
+        row.attempts += 1
+    return rows
+
+
+def _document_id(row):
+    return row.database, row.collection, tuple(sorted(row.key.items()))
+
+
+def _coalesce(rows):
+    """Group rows per (database, collection) keeping only the latest row per document"""
+    groups = {}
+    for row in rows:
+        database, collection, doc_key = _document_id(row)
+        groups.setdefault((database, collection), {})[doc_key] = row
+    return groups
+
+
+def _operation(row):
+    from pymongo import DeleteOne, UpdateOne
+
+    if row.operation == 'delete':
+        return DeleteOne(row.key)
+    return UpdateOne(row.key, {'$set': row.document}, upsert=True)
+
+
+def drain(get_database=mongo_sync.get_database, batch_size=500, max_attempts=10):
+    """Ship one batch of due outbox rows; returns (sent, failed)
+
+    `get_database` maps a logical alias to a pymongo (or mongomock) Database.
+    """
+    from pymongo.errors import BulkWriteError
+
+    rows = _claim_batch(batch_size, max_attempts)
+    if not rows:
+        return 0, 0
+
+    # No database transaction is open here, so web requests never wait on MongoDB
+    retry = {}
+    for (database, collection), latest in _coalesce(rows).items():
+        pending = list(latest.values())
+        try:
+            get_database(database)[collection].bulk_write(
+                [_operation(row) for row in pending], ordered=False
+            )
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                retry[pending[error['index']].pk] = error.get('errmsg', 'write error')
+        except Exception as e:
+            for row in pending:
+                retry[row.pk] = f"{type(e).__name__}: {e}"
+
+    now = timezone.now()
+    failed_rows = [row for row in rows if row.pk in retry]
+    for row in failed_rows:
+        row.available_at = now + backoff_delay(row.attempts)
+        row.last_error = retry[row.pk][:2000]
+        if row.attempts >= max_attempts:
+            logger.error("Giving up on outbox row %s after %s attempts: %s", row.pk, row.attempts, row.last_error)
+        else:
+            logger.warning("Outbox row %s failed (attempt %s): %s", row.pk, row.attempts, row.last_error)
+    done_ids = [row.pk for row in rows if row.pk not in retry]
+    with transaction.atomic():
+        MongoOutbox.objects.bulk_update(failed_rows, ['available_at', 'last_error'])
+        MongoOutbox.objects.filter(pk__in=done_ids).delete()
+    return len(done_ids), len(failed_rows)
@@ -0,0 +1,65 @@
+"""
+Keyset (cursor) pagination over (created_at, id).
+
+Pages are fetched with a `WHERE (created_at, id) < (cursor)` range on the
+composite index instead of OFFSET, so page N costs the same as page 1.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+# Largest id a 64-bit integer column holds; forged cursors beyond it are rejected
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(value):
+    """Return (created_at, pk) for a cursor string, or None if it is missing/invalid"""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value.encode('ascii')).decode('utf-8')
+        created_at, pk = raw.rsplit('|', 1)
+        created_at, pk = datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+    if not 0 < pk <= MAX_PK:
+        return None
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at)
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor=None, page_size=50, descending=True):
+    """Return (rows, next_cursor) for the page after `cursor`
+
+    next_cursor is None on the last page.
+    """
+    if descending:
+        queryset = queryset.order_by('-created_at', '-id')
+    else:
+        queryset = queryset.order_by('created_at', 'id')
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, pk = position
+        if descending:
+            after = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        else:
+            after = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        queryset = queryset.filter(after)
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.pk)
+    return rows, next_cursor
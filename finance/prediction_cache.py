@@ -0,0 +1,232 @@
+"""
+Cache of savings-model predictions.
+
+Entries are keyed by model version plus a SHA-1 of the float64 feature
+vector, so a hit can never return a prediction for other inputs or another
+model. By default they live in a per-process LRU with a TTL; setting
+SAVINGS_PREDICTION_CACHE to a CACHES alias stores them in that Django cache
+instead, shared by every worker.
+
+A separate month index records which key each month's prediction was
+stored under; it never takes LRU slots from predictions. When
+finance.features marks a month dirty (any CashTransaction save/delete,
+bulk ingest or recategorization in it), that month's entry is dropped.
+Hit/miss counters are kept per process.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+
+from .features import feature_months_dirtied
+
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TTL = 24 * 60 * 60
+PREFIX = 'savings-prediction'
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with a per-entry TTL"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires, value = entry
+                if expires < now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, values):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MonthIndex:
+    """Thread-safe month key -> prediction key map; one entry per month, so it stays small"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self._lock:
+            return {key: self._data[key] for key in keys if key in self._data}
+
+    def set_many(self, values):
+        with self._lock:
+            self._data.update(values)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCache:
+    """The LRUCache interface over a Django cache alias"""
+
+    def __init__(self, alias, ttl=DEFAULT_TTL):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def get_many(self, keys):
+        return self.cache.get_many(list(keys))
+
+    def set_many(self, values):
+        self.cache.set_many(values, timeout=self.ttl)
+
+    def delete_many(self, keys):
+        self.cache.delete_many(list(keys))
+
+    def clear(self):
+        self.cache.clear()
+
+
+def _backend():
+    ttl = getattr(settings, 'SAVINGS_PREDICTION_CACHE_TTL', DEFAULT_TTL)
+    alias = getattr(settings, 'SAVINGS_PREDICTION_CACHE', None)
+    if alias:
+        return DjangoCache(alias, ttl=ttl)
+    return LRUCache(getattr(settings, 'SAVINGS_PREDICTION_CACHE_SIZE', DEFAULT_MAXSIZE), ttl=ttl)
+
+
+def _month_index():
+    alias = getattr(settings, 'SAVINGS_PREDICTION_CACHE', None)
+    if alias:
+        # Shared by every worker, like the predictions themselves
+        return DjangoCache(alias, ttl=getattr(settings, 'SAVINGS_PREDICTION_CACHE_TTL', DEFAULT_TTL))
+    return MonthIndex()
+
+
+_lock = threading.Lock()
+_state = {'backend': None, 'index': None}
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def backend():
+    if _state['backend'] is None:
+        with _lock:
+            if _state['backend'] is None:
+                _state['backend'] = _backend()
+    return _state['backend']
+
+
+def month_index():
+    if _state['index'] is None:
+        with _lock:
+            if _state['index'] is None:
+                _state['index'] = _month_index()
+    return _state['index']
+
+
+def vector_key(version, row):
+    """Cache key for one float64 feature row under a model version"""
+    return f'{PREFIX}:{version}:{hashlib.sha1(row.tobytes()).hexdigest()}'
+
+
+def month_key(month):
+    return f'{PREFIX}:month:{month:%Y-%m}'
+
+
+def predict_cached(model, matrix, months=None):
+    """model.predict_many(matrix) through the cache; `months` labels the rows for invalidation"""
+    import numpy as np
+
+    matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+    keys = [vector_key(model.version, row) for row in matrix]
+    cache = backend()
+    found = cache.get_many(set(keys))
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    with _lock:
+        _stats['hits'] += len(keys) - len(missing)
+        _stats['misses'] += len(missing)
+
+    if missing:
+        predicted = model.predict_many(matrix[missing])
+        fresh = {keys[i]: float(value) for i, value in zip(missing, predicted)}
+        cache.set_many(fresh)
+        found.update(fresh)
+        if months is not None:
+            month_index().set_many({month_key(months[i]): keys[i] for i in missing})
+    return [found[key] for key in keys]
+
+
+def invalidate_months(months):
+    """Drop the cached predictions of `months`; returns how many months had one"""
+    month_keys = month_index().get_many([month_key(month) for month in months])
+    if month_keys:
+        backend().delete_many(list(month_keys.values()))
+        month_index().delete_many(list(month_keys))
+        with _lock:
+            _stats['invalidations'] += len(month_keys)
+    return len(month_keys)
+
+
+@receiver(feature_months_dirtied, dispatch_uid='finance.prediction_cache.drop_dirty_months')
+def drop_dirty_months(sender, months, **kwargs):
+    invalidate_months(months)
+
+
+def stats():
+    cache = backend()
+    with _lock:
+        result = dict(_stats)
+    lookups = result['hits'] + result['misses']
+    result['hit_rate'] = round(result['hits'] / lookups, 4) if lookups else None
+    if isinstance(cache, LRUCache):
+        result.update(backend='local', size=len(cache), maxsize=cache.maxsize, ttl=cache.ttl,
+                      indexed_months=len(month_index()))
+    else:
+        result.update(backend=getattr(settings, 'SAVINGS_PREDICTION_CACHE', None), ttl=cache.ttl)
+    return result
+
+
+def reset():
+    """Empty the cache and zero the counters (with a Django alias, the whole alias is cleared)"""
+    backend().clear()
+    month_index().clear()
+    with _lock:
+        _stats.update(hits=0, misses=0, invalidations=0)
@@ -0,0 +1,232 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, DateTimeField, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import export_state, outbox
+from .ledger import CENTS, totals_from_rollups
+from .models import BillSplit, BillSplitHistory, BillSplitItem, CashTransaction, Person
+from .splits import SplitError, from_minor, split_amount, to_minor
+
+
+ZERO = Decimal('0.00')
+
+
+def _sum_for_type(type_value):
+    return Coalesce(
+        Sum('amount', filter=Q(type=type_value)),
+        Value(ZERO),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def cash_totals(queryset=None):
+    """Income/expense/balance for the cash ledger
+
+    Whole-ledger totals come from the month rollups maintained by
+    finance.ledger; a filtered queryset falls back to one SQL aggregate.
+    """
+    if queryset is None:
+        return totals_from_rollups()
+    totals = queryset.order_by().aggregate(
+        income=_sum_for_type('income'),
+        expense=_sum_for_type('expense'),
+    )
+    # SQLite hands SUM() back as REAL; keep the 2-place amounts the templates expect
+    income = totals['income'].quantize(CENTS)
+    expense = totals['expense'].quantize(CENTS)
+    return {'income': income, 'expense': expense, 'balance': income - expense}
+
+
+def category_breakdown(queryset=None, type_value='expense'):
+    """Totals per category for one transaction type, largest first, as one GROUP BY"""
+    queryset = queryset if queryset is not None else CashTransaction.objects.all()
+    return list(
+        queryset.filter(type=type_value)
+        .order_by()
+        .values('category')
+        .annotate(
+            total=Coalesce(Sum('amount'), Value(ZERO), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            count=Count('id'),
+        )
+        .order_by('-total')
+    )
+
+
+# Sent once per bill inside its transaction; bulk_create skips post_save
+bill_split_items_created = Signal()
+
+
+class BillSplitError(Exception):
+    """Raised when a bill split request cannot be applied"""
+
+
+class BillSplitService:
+    """Create bill splits and their items in one transaction"""
+
+    @staticmethod
+    def _resolve_people(person_ids):
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in person_ids))
+        except (TypeError, ValueError):
+            raise BillSplitError('Invalid person selected')
+        if not ids:
+            raise BillSplitError('At least one person is required')
+        people = Person.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in people]
+        if missing:
+            raise BillSplitError(f'Unknown people: {", ".join(map(str, missing))}')
+        return [people[pk] for pk in ids]
+
+    @classmethod
+    def create(cls, title, total_amount, person_ids, split_type='equal', custom_amounts=(),
+               description='', history_description=None, paid_by_id=None):
+        """Create a BillSplit with one item per person; returns the bill"""
+        people = cls._resolve_people(person_ids)
+        if paid_by_id and not Person.objects.filter(pk=paid_by_id).exists():
+            raise BillSplitError('Unknown payer selected')
+        try:
+            total_amount = from_minor(to_minor(total_amount))
+            amounts = split_amount(total_amount, len(people), split_type, custom_amounts)
+        except (SplitError, ArithmeticError) as e:
+            raise BillSplitError(str(e))
+
+        with transaction.atomic():
+            bill_split = BillSplit.objects.create(
+                title=title,
+                description=description,
+                total_amount=total_amount,
+                split_type=split_type,
+                paid_by_id=paid_by_id or None,
+                item_count=len(people),
+            )
+            items = BillSplitItem.objects.bulk_create([
+                BillSplitItem(bill_split=bill_split, person=person, amount=amount)
+                for person, amount in zip(people, amounts)
+            ])
+            BillSplitHistory.objects.create(
+                bill_split=bill_split,
+                action='created',
+                description=history_description or (
+                    f'Bill "{title}" created with {len(people)} people, total ${total_amount}'
+                ),
+            )
+            bill_split_items_created.send(sender=BillSplit, bill_split=bill_split, items=items)
+        return bill_split
+
+    @classmethod
+    def set_paid(cls, item_pk, is_paid):
+        """Mark one item paid/unpaid and keep the bill's counters and settlement in step
+
+        The item and its bill are locked for the duration; the counters move by
+        F() deltas, so concurrent payments on the same bill never lose updates.
+        Returns (item, bill); unchanged items are returned without writing.
+        """
+        with transaction.atomic():
+            item = BillSplitItem.objects.select_for_update().select_related('person').get(pk=item_pk)
+            bill = BillSplit.objects.select_for_update().get(pk=item.bill_split_id)
+            if item.is_paid == is_paid:
+                return item, bill
+
+            now = timezone.now()
+            if not is_paid:
+                export_state.record_payment_tombstones([(item, item.paid_at)])
+            item.is_paid = is_paid
+            item.paid_at = now if is_paid else None
+            item.save(update_fields=['is_paid', 'paid_at', 'updated_at'])
+
+            sign = 1 if is_paid else -1
+            histories = [cls._payment_history(bill, item)]
+            if cls._apply_paid_delta(bill, sign, sign * item.amount, now):
+                histories.append(cls._settled_history(bill))
+            BillSplitHistory.objects.bulk_create(histories)
+            outbox.enqueue_save_many(histories)
+        return item, bill
+
+    @classmethod
+    def set_paid_many(cls, bill_pk, changes):
+        """Apply {item_id: is_paid} to one bill's items in a single transaction
+
+        Runs a fixed number of queries however many items change: one locked
+        read of the bill and of its items, one UPDATE of the items, one counter update
+        and one bulk_create each for history and the Mongo outbox. Returns
+        (changed item count, bill).
+        """
+        changes = {int(item_id): bool(is_paid) for item_id, is_paid in changes.items()}
+        with transaction.atomic():
+            bill = BillSplit.objects.select_for_update().get(pk=bill_pk)
+            items = list(
+                BillSplitItem.objects.select_for_update()
+                .select_related('person')
+                .filter(bill_split=bill, pk__in=changes)
+                .order_by()
+            )
+            missing = set(changes) - {item.pk for item in items}
+            if missing:
+                raise BillSplitError(f"Items {sorted(missing)} do not belong to bill {bill.pk}")
+
+            changed = [item for item in items if item.is_paid != changes[item.pk]]
+            if not changed:
+                return 0, bill
+            now = timezone.now()
+            export_state.record_payment_tombstones(
+                (item, item.paid_at) for item in changed if not changes[item.pk]
+            )
+            count_delta = 0
+            amount_delta = Decimal('0')
+            for item in changed:
+                item.is_paid = changes[item.pk]
+                item.paid_at = now if item.is_paid else None
+                item.updated_at = now
+                sign = 1 if item.is_paid else -1
+                count_delta += sign
+                amount_delta += sign * item.amount
+            # One UPDATE whatever the batch size; bulk_update() splits at SQLite's parameter limit
+            paid_ids = [item.pk for item in changed if item.is_paid]
+            BillSplitItem.objects.filter(pk__in=[item.pk for item in changed]).update(
+                is_paid=Case(When(pk__in=paid_ids, then=Value(True)), default=Value(False),
+                             output_field=BooleanField()),
+                paid_at=Case(When(pk__in=paid_ids, then=Value(now)), default=Value(None),
+                             output_field=DateTimeField()),
+                updated_at=now,
+            )
+
+            histories = [cls._payment_history(bill, item) for item in changed]
+            if cls._apply_paid_delta(bill, count_delta, amount_delta, now):
+                histories.append(cls._settled_history(bill))
+            BillSplitHistory.objects.bulk_create(histories)
+            # bulk_update/bulk_create skip post_save, so queue the Mongo sync here
+            outbox.enqueue_save_many(changed + histories)
+        return len(changed), bill
+
+    @staticmethod
+    def _apply_paid_delta(bill, count_delta, amount_delta, now):
+        """Move a locked bill's counters by F() deltas and (un)settle it; True when it just settled"""
+        BillSplit.objects.filter(pk=bill.pk).update(
+            paid_count=F('paid_count') + count_delta,
+            paid_amount=F('paid_amount') + amount_delta,
+        )
+        bill.refresh_from_db(fields=['paid_count', 'paid_amount', 'total_amount', 'item_count'])
+        # Equal splits can leave a rounding cent, so all items paid also settles
+        settled = bill.paid_count >= bill.item_count or bill.remaining_amount <= 0
+        newly_settled = settled and not bill.is_settled
+        if settled != bill.is_settled:
+            bill.is_settled = settled
+            bill.settled_at = now if settled else None
+        bill.save(update_fields=['is_settled', 'settled_at', 'updated_at'])
+        return newly_settled
+
+    @staticmethod
+    def _payment_history(bill, item):
+        return BillSplitHistory(
+            bill_split=bill,
+            action='paid' if item.is_paid else 'amount_changed',
+            description=f'{item.person.name} marked as {"paid" if item.is_paid else "unpaid"} - ${item.amount}',
+        )
+
+    @staticmethod
+    def _settled_history(bill):
+        return BillSplitHistory(bill_split=bill, action='settled', description=f'Bill "{bill.title}" settled')
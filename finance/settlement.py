@@ -0,0 +1,91 @@
+"""
+Minimum cash-flow settlement across every open bill split.
+
+Each unpaid BillSplitItem is a debt from its person to whoever paid the bill
+(BillSplit.paid_by, or the app owner when unset). All debts are netted into
+one balance per person in integer paise, then settled greedily: the largest
+debtor pays the largest creditor until one of them is square. Every step
+zeroes at least one balance, so n people with non-zero balances need at most
+n - 1 transfers, and the heaps keep the whole plan O(n log n).
+"""
+import heapq
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+from .models import BillSplitItem, Person
+
+
+# Balance key for bills with no paid_by: the app owner
+OWNER = None
+
+
+def to_paise(amount):
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+def from_paise(paise):
+    return (Decimal(paise) / 100).quantize(Decimal('0.01'))
+
+
+def net_balances():
+    """Net unpaid items into {person id (OWNER for the app owner): paise}; positive is owed money"""
+    debts = (
+        BillSplitItem.objects.filter(is_paid=False, bill_split__is_settled=False)
+        .exclude(person_id=F('bill_split__paid_by_id'))
+        .order_by()
+        .values('person_id', creditor=F('bill_split__paid_by_id'))
+        .annotate(total=Sum('amount'))
+    )
+    balances = {}
+    for row in debts:
+        paise = to_paise(row['total'])
+        balances[row['person_id']] = balances.get(row['person_id'], 0) - paise
+        balances[row['creditor']] = balances.get(row['creditor'], 0) + paise
+    return {key: paise for key, paise in balances.items() if paise}
+
+
+def minimize_transfers(balances):
+    """Greedy max-heap settlement of {key: paise}; returns [(debtor, creditor, paise)]
+
+    Balances must sum to zero. The sequence number in each heap entry keeps
+    ties ordered without ever comparing keys (which may be None).
+    """
+    if sum(balances.values()) != 0:
+        raise ValueError('Balances do not sum to zero')
+    creditors = [(-paise, i, key) for i, (key, paise) in enumerate(balances.items()) if paise > 0]
+    debtors = [(paise, i, key) for i, (key, paise) in enumerate(balances.items()) if paise < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, ci, creditor = heapq.heappop(creditors)
+        debt, di, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, ci, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, di, debtor))
+    return transfers
+
+
+def _party(person):
+    if person is None:
+        return {'person_id': None, 'name': 'You', 'upi_id': None}
+    return {'person_id': person.pk, 'name': person.name, 'upi_id': person.upi_id}
+
+
+def settlement_plan():
+    """The minimal list of payments that settles every open bill, with UPI ids"""
+    transfers = minimize_transfers(net_balances())
+    people = Person.objects.in_bulk({key for t in transfers for key in t[:2] if key is not OWNER})
+    return [
+        {
+            'from': _party(people.get(debtor)),
+            'to': _party(people.get(creditor)),
+            'amount': str(from_paise(paise)),
+        }
+        for debtor, creditor, paise in transfers
+    ]
@@ -2,59 +2,41 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 from .models import CashTransaction, BillSplit, BillSplitItem, Person, BillSplitHistory
-from . import mongo_sync
+from . import export_state, outbox
+from .services import bill_split_items_created
 
 
-@receiver(post_save, sender=CashTransaction)
-def sync_cash_tx_on_save(sender, instance: CashTransaction, created: bool, **kwargs):
-    # Upsert document in MongoDB Atlas; silently skip if not configured
-    try:
-        mongo_sync.upsert_transaction(instance)
-    except Exception:
-        # Do not block request lifecycle on sync failures
-        pass
+SYNCED_MODELS = (CashTransaction, BillSplit, BillSplitItem, Person, BillSplitHistory)
 
 
-@receiver(post_delete, sender=CashTransaction)
-def sync_cash_tx_on_delete(sender, instance: CashTransaction, **kwargs):
-    try:
-        mongo_sync.delete_transaction(instance.pk)
-    except Exception:
-        pass
+# Each handler only records the pending MongoDB write in the outbox table,
+# inside the caller's transaction; run_mongo_sync_worker ships it later.
 
+@receiver(post_save)
+def queue_sync_on_save(sender, instance, created: bool, raw: bool = False, **kwargs):
+    if raw or sender not in SYNCED_MODELS:
+        return
+    outbox.enqueue_save(instance, created)
 
-@receiver(post_save, sender=BillSplit)
-def sync_bill_split_on_save(sender, instance: BillSplit, created: bool, **kwargs):
-    try:
-        mongo_sync.upsert_bill_split(instance)
-    except Exception:
-        pass
 
+@receiver(post_delete)
+def queue_sync_on_delete(sender, instance, **kwargs):
+    if sender not in SYNCED_MODELS:
+        return
+    outbox.enqueue_delete(instance)
 
-@receiver(post_save, sender=BillSplitItem)
-def sync_bill_split_item_on_save(sender, instance: BillSplitItem, created: bool, **kwargs):
-    try:
-        mongo_sync.upsert_bill_split_item(instance)
-        # Create transaction record if payment was made
-        if instance.is_paid and instance.paid_at:
-            mongo_sync.create_payment_transaction(instance, 'payment', 'completed')
-    except Exception:
-        pass
 
-
-@receiver(post_save, sender=Person)
-def sync_person_on_save(sender, instance: Person, created: bool, **kwargs):
-    try:
-        mongo_sync.upsert_person(instance)
-    except Exception:
-        pass
-
-
-@receiver(post_save, sender=BillSplitHistory)
-def sync_bill_split_history_on_save(sender, instance: BillSplitHistory, created: bool, **kwargs):
-    try:
-        mongo_sync.upsert_bill_split_history(instance)
-    except Exception:
-        pass
+@receiver(post_delete)
+def record_export_tombstone(sender, instance, **kwargs):
+    # Lets `--since-last-run` exports replicate deletes
+    if sender not in SYNCED_MODELS:
+        return
+    export_state.record_tombstone(instance)
+    if sender is BillSplitItem and instance.is_paid:
+        export_state.record_payment_tombstones([(instance, instance.paid_at)])
 
 
+@receiver(bill_split_items_created)
+def queue_sync_bill_split_items(sender, bill_split: BillSplit, items, **kwargs):
+    # bulk_create skips post_save, so queue the whole bill's items in one insert
+    outbox.enqueue_save_many(items)
@@ -0,0 +1,335 @@
+"""
+Bank SMS ingestion into the cash ledger.
+
+Dumps are JSON arrays, NDJSON or concatenated objects (Android SMS backups
+and the README's sms.json), read incrementally so memory does not grow with
+the file. Each message is matched against precompiled regexes for its bank
+(picked from the sender id, e.g. "AD-HDFCBK") and then generic fallbacks;
+messages that are not a completed debit/credit (OTPs, reminders, mandates)
+are skipped. Rows are deduplicated on a SHA-1 of sender, date and body,
+which CashTransaction.sms_hash stores under a unique index, and written
+in chunks with INSERT ... ON CONFLICT DO NOTHING RETURNING (SQLite and
+PostgreSQL; other backends use bulk_create(ignore_conflicts=True) and read
+the ids back). Bulk inserts skip the model signals, so categories, ledger
+rollups, dirty feature months and Mongo outbox rows are filled in here for
+exactly the rows the chunk inserted.
+"""
+import codecs
+import hashlib
+import json
+import re
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import features, ledger, outbox
+from .categories import default_categorizer
+from .models import CashTransaction
+from .splits import parse_amount
+
+
+AMOUNT = r'(?P<amount>\d[\d,]*(?:\.\d{1,2})?)'
+CURRENCY = r'(?:rs\.?|inr|₹)\s*'
+PARTY = r'(?P<party>[\w@.&\'* -]{2,60}?)'
+# "credited to your account from X": the party is X, not "your account"
+NOT_ACCOUNT = r'(?!(?:your|you|a/c|ac|acct|account)\b)'
+
+# Every other direction word in the patterns is a debit
+CREDIT_WORDS = {'credited', 'received', 'deposited'}
+
+
+def _compile(*patterns):
+    return [re.compile(p, re.IGNORECASE) for p in patterns]
+
+
+BANK_PATTERNS = {
+    'HDFC': _compile(
+        CURRENCY + AMOUNT + r'\s+(?P<dir>debited|credited)\s+(?:from|to)\s+a/c\s+\S+\s+on\s+\S+\s+'
+        r'(?:to|by|from)\s+(?:vpa\s+)?' + PARTY + r'\s*(?:\(|\.\s|$)',
+        r'money\s+(?P<dir>received)\s*-\s*' + CURRENCY + AMOUNT + r'\s+in\s+your\s+a/c\s+\S+\s+on\s+\S+\s+'
+        r'(?:from|by)\s+' + PARTY + r'\s*(?:\(|\.\s|$)',
+    ),
+    'SBI': _compile(
+        r'a/c\s+\S+\s+(?P<dir>debited|credited)\s+(?:by\s+)?(?:' + CURRENCY + r')?' + AMOUNT +
+        r'\s+on\s+(?:date\s+)?\S+\s*-?\s*(?:transferred\s+|trf\s+)?(?:to|from|by)\s+' + PARTY +
+        r'\s*(?:\.|ref\s*no|refno|$)',
+    ),
+    'ICICI': _compile(
+        r'acct\s+\S+\s+(?P<dir>debited|credited)\s+(?:for|with)\s+' + CURRENCY + AMOUNT +
+        r'\s+on\s+\S+?;?\s+' + PARTY + r'\s+(?:credited|debited)',
+    ),
+    'AXIS': _compile(
+        CURRENCY + AMOUNT + r'\s+(?P<dir>debited|credited)\s+(?:to\s+|from\s+)?a/c\s+(?:no\.?\s+)?\S+\s+'
+        r'.*?upi/\w+/\w+/' + PARTY + r'(?=\s+(?:not|avl|call|sms)\b|\s*/|\.\s|\s*$)',
+    ),
+    'KOTAK': _compile(
+        r'(?P<dir>sent|received)\s+' + CURRENCY + AMOUNT + r'\s+(?:from|in)\s+kotak\s+bank\s+a/?c\s+\S+\s+'
+        r'(?:to|from)\s+' + PARTY + r'\s+on\b',
+    ),
+}
+
+GENERIC_PATTERNS = _compile(
+    CURRENCY + AMOUNT + r'.{0,80}?\b(?P<dir>debited|credited|spent|received|sent|paid|withdrawn|deposited)\b'
+    r'(?:.{0,40}?\b(?:to|at|from|by)\s+' + NOT_ACCOUNT + r'(?:vpa\s+)?' + PARTY + r'(?=\s+(?:on|ref|upi|avl|via|info)\b|[.(;]|$))?',
+    r'\b(?P<dir>debited|credited|spent|received|sent|paid|withdrawn|deposited)\b.{0,40}?' + CURRENCY + AMOUNT +
+    r'(?:.{0,40}?\b(?:to|at|from|by)\s+' + NOT_ACCOUNT + r'(?:vpa\s+)?' + PARTY + r'(?=\s+(?:on|ref|upi|avl|via|info)\b|[.(;]|$))?',
+)
+
+# Sender ids look like "VM-HDFCBK"; the bank code is matched on its prefix
+SENDER_BANKS = (
+    ('HDFC', 'HDFC'),
+    ('SBI', 'SBI'),
+    ('ATMSBI', 'SBI'),
+    ('ICICI', 'ICICI'),
+    ('AXIS', 'AXIS'),
+    ('KOTAK', 'KOTAK'),
+)
+
+NOT_A_TRANSACTION = re.compile(
+    r'\b(?:otp|one time password|will be (?:debited|credited)|is due|due on|requested|declined|failed)\b',
+    re.IGNORECASE,
+)
+
+BODY_KEYS = ('body', 'message', 'text', 'msg')
+SENDER_KEYS = ('sender', 'address', 'from')
+DATE_KEYS = ('date', 'timestamp', 'time', 'received_at')
+
+_SEPARATORS = re.compile(r'[\s,\[\]]*')
+
+
+def iter_records(stream, chunk_size=1 << 16):
+    """Yield JSON objects from a JSON array, NDJSON or concatenated objects, read incrementally"""
+    decoder = json.JSONDecoder()
+    to_text = codecs.getincrementaldecoder('utf-8')().decode
+    buffer, pos, eof = '', 0, False
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                return
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = (to_text(chunk, final=eof) if isinstance(chunk, bytes) else chunk), 0
+            continue
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if eof:
+                raise
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + (to_text(chunk, final=eof) if isinstance(chunk, bytes) else chunk), 0
+            continue
+        yield record
+
+
+def _first(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+@lru_cache(maxsize=1024)
+def bank_for(sender):
+    code = sender.rsplit('-', 1)[-1].upper()
+    for prefix, bank in SENDER_BANKS:
+        if code.startswith(prefix):
+            return bank
+    return None
+
+
+def _epoch_seconds(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def parse_date(value):
+    """Aware datetime from epoch seconds/milliseconds or an ISO string; None when it is not a usable date"""
+    if value is None or isinstance(value, bool):
+        return None
+    seconds = _epoch_seconds(value)
+    if seconds is not None:
+        if seconds > 1e11:
+            seconds /= 1000  # Android backups store epoch milliseconds
+        try:
+            return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def message_hash(sender, date, body):
+    return hashlib.sha1(f'{sender}\x1f{date}\x1f{body}'.encode('utf-8')).hexdigest()
+
+
+def parse_message(body, sender=''):
+    """Return (type, amount, party, bank) for a completed transaction SMS, or None"""
+    if not body or NOT_A_TRANSACTION.search(body):
+        return None
+    bank = bank_for(sender) if sender else None
+    for regex in BANK_PATTERNS.get(bank, []) + GENERIC_PATTERNS:
+        match = regex.search(body)
+        if match is None:
+            continue
+        amount = parse_amount(match.group('amount').replace(',', ''))
+        if not amount:
+            continue
+        direction = match.group('dir').lower()
+        type_value = 'income' if direction in CREDIT_WORDS else 'expense'
+        party = (match.group('party') or '').strip(" .-*'")
+        return type_value, amount, party, bank
+    return None
+
+
+def transaction_from_record(record, categorize):
+    """Build an unsaved CashTransaction from one SMS record, or None when it is not one"""
+    if not isinstance(record, dict):
+        return None
+    body = _first(record, BODY_KEYS)
+    if not isinstance(body, str):
+        return None
+    sender = str(_first(record, SENDER_KEYS) or '')
+    date = _first(record, DATE_KEYS)
+    parsed = parse_message(body, sender)
+    if parsed is None:
+        return None
+    type_value, amount, party, bank = parsed
+    counterparty = party or bank or sender or 'Unknown'
+    description = f"{'Paid to' if type_value == 'expense' else 'Received from'} {counterparty}"[:255]
+    return CashTransaction(
+        description=description,
+        amount=amount,
+        type=type_value,
+        source_or_destination=counterparty[:255],
+        category=categorize(description),
+        created_at=parse_date(date) or timezone.now(),
+        sms_hash=message_hash(sender, date, body),
+    )
+
+
+MAX_ROWS_PER_INSERT = 2000
+INSERT_FIELDS = (
+    'description', 'amount', 'type', 'source_or_destination', 'category', 'created_at', 'updated_at', 'sms_hash',
+)
+
+
+def _batch_size(fields, rows):
+    # Django assumes SQLite's old 999-variable limit; ask the library for the real one
+    getlimit = getattr(connection.connection, 'getlimit', None) if connection.vendor == 'sqlite' else None
+    if getlimit is None:
+        return connection.ops.bulk_batch_size(fields, rows) or len(rows)
+    import sqlite3
+
+    return max(1, min(len(rows), MAX_ROWS_PER_INSERT, getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) // len(fields)))
+
+
+def _insert_returning(rows):
+    """INSERT ... ON CONFLICT (sms_hash) DO NOTHING RETURNING id, sms_hash, in multi-row statements
+
+    Returns {sms_hash: id} for exactly the rows this statement inserted, so a
+    row a concurrent ingest stored first is never counted twice.
+    """
+    quote = connection.ops.quote_name
+    fields = [CashTransaction._meta.get_field(name) for name in INSERT_FIELDS]
+    adapt_datetime = connection.ops.adapt_datetimefield_value
+    now = adapt_datetime(timezone.now())
+    table = quote(CashTransaction._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    placeholder = f"({', '.join(['%s'] * len(fields))})"
+    suffix = f"ON CONFLICT ({quote('sms_hash')}) DO NOTHING RETURNING {quote('id')}, {quote('sms_hash')}"
+    batch_size = _batch_size(fields, rows)
+    inserted = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = []
+            for row in batch:
+                params.extend((
+                    row.description, row.amount, row.type, row.source_or_destination, row.category,
+                    adapt_datetime(row.created_at), now, row.sms_hash,
+                ))
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholder] * len(batch))} {suffix}",
+                params,
+            )
+            inserted.update((sms_hash, pk) for pk, sms_hash in cursor.fetchall())
+    return inserted
+
+
+def _insert_reread(rows):
+    """bulk_create(ignore_conflicts=True), then read the new ids back by sms_hash"""
+    existing = set(
+        CashTransaction.objects.filter(sms_hash__in=[row.sms_hash for row in rows]).values_list('sms_hash', flat=True)
+    )
+    new = [row for row in rows if row.sms_hash not in existing]
+    CashTransaction.objects.bulk_create(new, ignore_conflicts=True)
+    return dict(
+        CashTransaction.objects.filter(sms_hash__in=[row.sms_hash for row in new]).values_list('sms_hash', 'id')
+    )
+
+
+def _write_chunk(rows, stats, dry_run):
+    unique = {}
+    for row in rows:
+        unique.setdefault(row.sms_hash, row)
+    if dry_run:
+        existing = set(
+            CashTransaction.objects.filter(sms_hash__in=list(unique)).values_list('sms_hash', flat=True)
+        )
+        inserted = len(unique) - len(existing)
+        stats['inserted'] += inserted
+        stats['duplicates'] += len(rows) - inserted
+        return
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert and connection.vendor in ('sqlite', 'postgresql'):
+            ids = _insert_returning(list(unique.values()))
+        else:
+            ids = _insert_reread(list(unique.values()))
+        new = []
+        for sms_hash, pk in ids.items():
+            row = unique[sms_hash]
+            row.pk = pk
+            row._state.adding = False
+            new.append(row)
+        # Only rows this chunk actually inserted feed the rollups, features and outbox
+        ledger.apply_bulk(new)
+        features.mark_dirty_for(new)
+        outbox.enqueue_save_many(new, created=True)
+    stats['inserted'] += len(new)
+    stats['duplicates'] += len(rows) - len(new)
+
+
+def ingest(records, chunk_size=5000, dry_run=False):
+    """Parse and store SMS records; returns counts of read/parsed/inserted/duplicates/skipped"""
+    # Descriptions repeat per merchant, so most lookups are cache hits
+    categorize = lru_cache(maxsize=1 << 16)(default_categorizer().categorize)
+    stats = {'read': 0, 'parsed': 0, 'inserted': 0, 'duplicates': 0, 'skipped': 0}
+    chunk = []
+    for record in records:
+        stats['read'] += 1
+        row = transaction_from_record(record, categorize)
+        if row is None:
+            stats['skipped'] += 1
+            continue
+        stats['parsed'] += 1
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _write_chunk(chunk, stats, dry_run)
+            chunk = []
+    if chunk:
+        _write_chunk(chunk, stats, dry_run)
+    return stats
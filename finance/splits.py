@@ -0,0 +1,113 @@
+"""
+Exact bill split allocation in integer minor units (paise).
+
+Every split type is reduced to integer weights and allocated with the
+largest-remainder method: each share is floor(total * weight / sum of
+weights), and the paise left over go one each to the shares with the
+largest remainders (earliest participant first on ties). Shares therefore
+always add up to the total exactly, and the arithmetic is plain Python
+ints, so thousands of participants never go through a Decimal context.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+
+CENT = Decimal('0.01')
+# Largest amount the max_digits=12, decimal_places=2 amount fields can store
+MAX_AMOUNT = Decimal('9999999999.99')
+
+SPLIT_TYPES = ('equal', 'custom', 'percentage', 'weighted')
+
+# Percentages are kept to two decimals, i.e. in basis points
+PERCENT_SCALE = 100
+# Weights are kept to six decimals
+WEIGHT_SCALE = 10 ** 6
+
+
+class SplitError(ValueError):
+    """Raised when the split inputs cannot be allocated"""
+
+
+def parse_amount(raw, default=None):
+    """Parse user input into a Decimal rounded to paise; `default` when blank, invalid or too large"""
+    try:
+        value = Decimal(str(raw).strip())
+        if not value.is_finite():
+            return default
+        value = value.quantize(CENT, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        return default
+    if abs(value) > MAX_AMOUNT:
+        return default
+    return value
+
+
+def to_minor(amount):
+    return int(Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def from_minor(minor):
+    return Decimal(minor).scaleb(-2)
+
+
+def _scaled(values, scale, label):
+    scaled = []
+    for value in values:
+        try:
+            number = Decimal(str(value).strip() or '0')
+        except InvalidOperation:
+            raise SplitError(f'Invalid {label}: {value!r}')
+        if number < 0 or not number.is_finite():
+            raise SplitError(f'Invalid {label}: {value!r}')
+        scaled.append(int((number * scale).to_integral_value(rounding=ROUND_HALF_UP)))
+    return scaled
+
+
+def allocate(total_minor, weights):
+    """Split `total_minor` paise proportionally to integer `weights` (largest remainder)"""
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        raise SplitError('Split weights must add up to more than zero')
+    shares = []
+    remainders = []
+    for weight in weights:
+        share, remainder = divmod(total_minor * weight, weight_sum)
+        shares.append(share)
+        remainders.append(remainder)
+    leftover = total_minor - sum(shares)
+    if leftover:
+        for i in sorted(range(len(shares)), key=lambda i: -remainders[i])[:leftover]:
+            shares[i] += 1
+    return shares
+
+
+def split_minor(total_minor, count, split_type='equal', values=()):
+    """Allocate `total_minor` paise over `count` participants; returns a list of ints"""
+    if count <= 0:
+        raise SplitError('At least one person is required')
+    if total_minor < 0:
+        raise SplitError('Total amount cannot be negative')
+    values = list(values)[:count]
+    values += [''] * (count - len(values))
+
+    if split_type == 'equal':
+        return allocate(total_minor, [1] * count)
+    if split_type == 'percentage':
+        weights = _scaled(values, PERCENT_SCALE, 'percentage')
+        if sum(weights) != 100 * PERCENT_SCALE:
+            raise SplitError(f'Percentages add up to {from_minor(sum(weights))}%, not 100%')
+        return allocate(total_minor, weights)
+    if split_type == 'weighted':
+        return allocate(total_minor, _scaled(values, WEIGHT_SCALE, 'weight'))
+    if split_type == 'custom':
+        shares = _scaled(values, 100, 'amount')
+        if sum(shares) != total_minor:
+            raise SplitError(
+                f'Custom amounts add up to {from_minor(sum(shares))}, not {from_minor(total_minor)}'
+            )
+        return shares
+    raise SplitError(f'Unknown split type: {split_type}')
+
+
+def split_amount(total_amount, count, split_type='equal', values=()):
+    """Like split_minor() but in and out in Decimal rupees"""
+    return [from_minor(share) for share in split_minor(to_minor(total_amount), count, split_type, values)]
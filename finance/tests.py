@@ -0,0 +1,747 @@
+import base64
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipIf
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    categories, export_state, features, ledger, ml, mongo_sync, outbox, pagination, prediction_cache, settlement, sms, splits,
+    training,
+)
+from .categories import Categorizer, trie_pattern
+from .features import FEATURES, TARGET
+from .management.commands.check_query_plans import check_plans, explain, hot_queries, plan_problems
+from .management.commands.convert_savings_dataset import Command as ConvertSavingsDataset
+from .models import (
+    BillSplit, BillSplitItem, CashTransaction, ExportTombstone, ExportWatermark, MongoOutbox, Person, SavingsFeatures,
+)
+from .services import BillSplitService
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+class PlanProblemsTests(SimpleTestCase):
+    def test_search_passes(self):
+        self.assertEqual(plan_problems(['SEARCH t USING INDEX t_idx (a=?)']), [])
+
+    def test_table_scan_fails(self):
+        self.assertEqual(plan_problems(['SCAN t'], bounded=True), ['SCAN t'])
+
+    def test_full_index_scan_fails_unless_bounded(self):
+        detail = 'SCAN t USING INDEX t_created_idx'
+        self.assertEqual(plan_problems([detail]), [detail])
+        self.assertEqual(plan_problems([detail], bounded=True), [])
+
+    def test_partial_index_scan_passes(self):
+        self.assertEqual(plan_problems(['SCAN t USING COVERING INDEX t_open_idx'], partial={'t_open_idx'}), [])
+
+    def test_temp_sort_fails(self):
+        detail = 'USE TEMP B-TREE FOR ORDER BY'
+        self.assertEqual(plan_problems(['SEARCH t USING INDEX t_idx (a=?)', detail], bounded=True), [detail])
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_an_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plans are checked on SQLite')
+        for label, details, problems in check_plans():
+            with self.subTest(label, plan=details):
+                self.assertEqual(problems, [])
+
+    def test_unsettled_bills_read_the_partial_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plans are checked on SQLite')
+        with connection.cursor() as cursor:
+            details = explain(cursor, hot_queries()['unsettled bills'])
+        self.assertIn('billsplit_unsettled_idx', ' '.join(details))
+
+
+def cash(amount='10.00', type_value='expense', **fields):
+    fields.setdefault('description', 'Test')
+    fields.setdefault('source_or_destination', 'Shop')
+    return CashTransaction.objects.create(amount=amount, type=type_value, **fields)
+
+
+@skipIf(mongomock is None, 'mongomock is not installed')
+class OutboxDrainTests(TestCase):
+    def setUp(self):
+        self.mongo = mongomock.MongoClient()
+
+    def get_database(self, alias):
+        return self.mongo[alias]
+
+    def collection(self, type_value):
+        database, name = mongo_sync.cash_collection(type_value)
+        return self.mongo[database][name]
+
+    def test_drain_upserts_and_empties_the_outbox(self):
+        tx = cash()
+        queued = MongoOutbox.objects.count()
+        self.assertEqual(outbox.drain(self.get_database), (queued, 0))
+        self.assertFalse(MongoOutbox.objects.exists())
+        self.assertEqual(self.collection('expense').count_documents({'django_id': tx.pk}), 1)
+
+    def test_edit_and_delete_follow_the_row(self):
+        tx = cash()
+        outbox.drain(self.get_database)
+        tx.type = 'income'
+        tx.save()
+        outbox.drain(self.get_database)
+        self.assertEqual(self.collection('expense').count_documents({'django_id': tx.pk}), 0)
+        self.assertEqual(self.collection('income').count_documents({'django_id': tx.pk}), 1)
+        pk = tx.pk
+        tx.delete()
+        outbox.drain(self.get_database)
+        self.assertEqual(self.collection('income').count_documents({'django_id': pk}), 0)
+
+    def test_redelivery_is_idempotent(self):
+        tx = cash()
+        outbox.enqueue_save(tx)
+        outbox.drain(self.get_database)
+        outbox.enqueue_save(tx)
+        outbox.drain(self.get_database)
+        self.assertEqual(self.collection('expense').count_documents({'django_id': tx.pk}), 1)
+
+    def test_failed_write_backs_off(self):
+        def unreachable(alias):
+            raise mongo_sync.MongoSyncError('no server')
+
+        cash()
+        queued = MongoOutbox.objects.count()
+        with self.assertLogs('finance.outbox', 'WARNING'):
+            self.assertEqual(outbox.drain(unreachable), (0, queued))
+        row = MongoOutbox.objects.first()
+        self.assertEqual(row.attempts, 1)
+        self.assertIn('no server', row.last_error)
+        self.assertGreater(row.available_at, timezone.now())
+        self.assertEqual(outbox.drain(self.get_database), (0, 0))
+
+        MongoOutbox.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.drain(self.get_database), (queued, 0))
+
+
+    def test_retry_does_not_overwrite_a_newer_sent_change(self):
+        def unreachable(alias):
+            raise mongo_sync.MongoSyncError('no server')
+
+        tx = cash(description='v1')
+        with self.assertLogs('finance.outbox', 'WARNING'):
+            outbox.drain(unreachable)
+        tx.description = 'v2'
+        tx.save()
+        outbox.drain(self.get_database)
+        MongoOutbox.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        outbox.drain(self.get_database)
+        self.assertFalse(MongoOutbox.objects.exists())
+        document = self.collection('expense').find_one({'django_id': tx.pk})
+        self.assertEqual(document['description'], 'v2')
+
+    def test_new_transaction_queues_no_delete(self):
+        cash()
+        self.assertEqual(list(MongoOutbox.objects.values_list('operation', flat=True)), ['upsert'])
+
+@skipIf(mongomock is None, 'mongomock is not installed')
+class OutboxTransactionTests(TransactionTestCase):
+    def test_bulk_write_runs_outside_a_transaction(self):
+        mongo = mongomock.MongoClient()
+        seen = []
+
+        class Collection:
+            def __init__(self, collection):
+                self.collection = collection
+
+            def bulk_write(self, operations, **kwargs):
+                seen.append(connection.in_atomic_block)
+                # A web request can write while the worker waits on MongoDB
+                cash('1.00', 'income')
+                return self.collection.bulk_write(operations, **kwargs)
+
+        def get_database(alias):
+            return {
+                name: Collection(mongo[alias][name])
+                for _, name in (mongo_sync.cash_collection('income'), mongo_sync.cash_collection('expense'))
+            }
+
+        cash()
+        outbox.drain(get_database)
+        self.assertTrue(seen)
+        self.assertFalse(any(seen))
+        # Rows queued by the concurrent write stay for the next drain
+        self.assertTrue(MongoOutbox.objects.filter(attempts=0).exists())
+
+
+class ExportTombstoneTests(TestCase):
+    def test_no_tombstones_without_incremental_exports(self):
+        cash().delete()
+        self.assertFalse(ExportTombstone.objects.exists())
+
+    def test_delete_leaves_a_tombstone_once_a_watermark_exists(self):
+        tx = cash()
+        export_state.ensure_watermarks(['finance.cash'])
+        pk = tx.pk
+        tx.delete()
+        self.assertEqual(list(ExportTombstone.objects.values_list('key', flat=True)), [{'django_id': pk}])
+
+    def test_prune_drops_tombstones_older_than_every_watermark(self):
+        ExportWatermark.objects.create(name='finance.cash')
+        now = timezone.now()
+        ExportTombstone.objects.create(database='finance', collection='expenses', key={'django_id': 1},
+                                       deleted_at=now - timedelta(days=1))
+        ExportTombstone.objects.create(database='finance', collection='expenses', key={'django_id': 2},
+                                       deleted_at=now + timedelta(minutes=1))
+        self.assertEqual(export_state.prune_tombstones(), 1)
+        self.assertEqual(list(ExportTombstone.objects.values_list('key', flat=True)), [{'django_id': 2}])
+
+
+    def test_changed_since_last_run_only_reads_watermarks(self):
+        export_state.changed_since_last_run(CashTransaction.objects.all(), 'finance.cash', 'updated_at')
+        self.assertFalse(ExportWatermark.objects.exists())
+        export_state.ensure_watermarks(['finance.cash', 'bill_split.users'])
+        export_state.ensure_watermarks(['finance.cash'])
+        self.assertEqual(ExportWatermark.objects.count(), 2)
+
+
+class PaymentTombstoneTests(TestCase):
+    def setUp(self):
+        export_state.ensure_watermarks(['bill_split.transactions'])
+        self.bill = bills_for(2, bills=1)
+        self.items = list(BillSplitItem.objects.filter(bill_split=self.bill).order_by('pk'))
+
+    def payment_keys(self):
+        return list(ExportTombstone.objects.filter(key__has_key='transaction_id').values_list('key', flat=True))
+
+    def test_unpaying_an_item_tombstones_its_payment_document(self):
+        item, _ = BillSplitService.set_paid(self.items[0].pk, True)
+        document = mongo_sync.payment_transaction_document(item)
+        BillSplitService.set_paid(item.pk, False)
+        self.assertEqual(self.payment_keys(), [{'transaction_id': document['transaction_id']}])
+
+    def test_batch_unpay_tombstones_only_undone_payments(self):
+        BillSplitService.set_paid_many(self.bill.pk, {item.pk: True for item in self.items})
+        BillSplitService.set_paid_many(self.bill.pk, {self.items[0].pk: False, self.items[1].pk: True})
+        self.assertEqual(len(self.payment_keys()), 1)
+        self.assertTrue(self.payment_keys()[0]['transaction_id'].startswith(f'txn_{self.items[0].pk}_'))
+
+    def test_deleting_a_paid_item_tombstones_its_payment_document(self):
+        item, _ = BillSplitService.set_paid(self.items[0].pk, True)
+        document = mongo_sync.payment_transaction_document(item)
+        item.delete()
+        self.assertEqual(self.payment_keys(), [{'transaction_id': document['transaction_id']}])
+
+
+@skipIf(mongomock is None, 'mongomock is not installed')
+class BillSplitExportTests(TransactionTestCase):
+    def test_unpaid_payment_is_removed_by_the_next_incremental_export(self):
+        client = mongomock.MongoClient()
+        bill = bills_for(2, bills=1)
+        item = BillSplitItem.objects.filter(bill_split=bill).first()
+        BillSplitService.set_paid(item.pk, True)
+        database = client[mongo_sync.database_name('bill_split', mongo_sync.load_config())]
+        transactions = database[mongo_sync.bill_split_collection('transactions')[1]]
+
+        with mock.patch.object(mongo_sync, 'get_client', return_value=client):
+            call_command('export_bill_splits_to_mongo', '--since-last-run', '--workers', '1', stdout=io.StringIO())
+            self.assertEqual(transactions.count_documents({}), 1)
+            BillSplitService.set_paid(item.pk, False)
+            call_command('export_bill_splits_to_mongo', '--since-last-run', '--workers', '1', stdout=io.StringIO())
+        self.assertEqual(transactions.count_documents({}), 0)
+
+def bills_for(participants, bills=6):
+    """`bills` equal splits of 100.00 among `participants` new people; returns the last bill"""
+    people = Person.objects.bulk_create([
+        Person(name=f'Person {i}', upi_id=f'person{i}@upi') for i in range(participants)
+    ])
+    for n in range(bills):
+        bill = BillSplitService.create(
+            title=f'Bill {n}', total_amount='100.00',
+            person_ids=[person.pk for person in people], paid_by_id=people[0].pk,
+        )
+    return bill
+
+
+class BillSplitQueryCountTests(TestCase):
+    SIZES = (1, 10, 100)
+
+    def test_home_page_queries_do_not_grow_with_participants(self):
+        for participants in self.SIZES:
+            with self.subTest(participants=participants):
+                bills_for(participants)
+                with self.assertNumQueries(5):
+                    response = self.client.get(reverse('bill_split_home'))
+                self.assertEqual(response.status_code, 200)
+
+    def test_detail_page_queries_do_not_grow_with_participants(self):
+        for participants in self.SIZES:
+            with self.subTest(participants=participants):
+                bill = bills_for(participants, bills=1)
+                with self.assertNumQueries(5):
+                    response = self.client.get(reverse('bill_split_detail', args=[bill.pk]))
+                self.assertContains(response, f'Person {participants - 1}')
+
+
+class MarkPaymentsQueryCountTests(TestCase):
+    def post(self, bill, changes):
+        payload = {'items': [{'item_id': pk, 'is_paid': is_paid} for pk, is_paid in changes.items()]}
+        return self.client.post(reverse('mark_payments', args=[bill.pk]), json.dumps(payload),
+                                content_type='application/json')
+
+    def test_settling_a_bill_runs_a_fixed_number_of_queries(self):
+        for participants in (2, 20, 200):
+            with self.subTest(participants=participants):
+                bill = bills_for(participants, bills=1)
+                ids = BillSplitItem.objects.filter(bill_split=bill).values_list('pk', flat=True)
+                with self.assertNumQueries(14):
+                    response = self.post(bill, {pk: True for pk in ids})
+                self.assertEqual(response.json()['updated'], participants)
+                self.assertTrue(response.json()['is_settled'])
+
+    def test_mixed_batch_updates_each_item(self):
+        bill = bills_for(4, bills=1)
+        ids = list(BillSplitItem.objects.filter(bill_split=bill).order_by('pk').values_list('pk', flat=True))
+        self.post(bill, {pk: True for pk in ids[:2]})
+        response = self.post(bill, {ids[0]: False, ids[2]: True, ids[3]: True})
+        self.assertEqual(response.json()['updated'], 3)
+        items = BillSplitItem.objects.filter(bill_split=bill).order_by('pk')
+        self.assertEqual([item.is_paid for item in items], [False, True, True, True])
+        self.assertEqual([item.paid_at is not None for item in items], [False, True, True, True])
+        self.assertEqual(response.json()['paid_count'], 3)
+
+def random_balances(rng, people):
+    """{person: paise} for `people` random balances that sum to zero"""
+    balances = {key: rng.randint(-500000, 500000) for key in range(people - 1)}
+    balances[people - 1] = -sum(balances.values())
+    return balances
+
+
+class MinimizeTransfersTests(SimpleTestCase):
+    def assertSettles(self, balances):
+        transfers = settlement.minimize_transfers(balances)
+        left = dict(balances)
+        for debtor, creditor, paise in transfers:
+            self.assertGreater(paise, 0)
+            left[debtor] += paise
+            left[creditor] -= paise
+        # Money is conserved: every balance ends at exactly zero
+        self.assertEqual({key for key, paise in left.items() if paise}, set())
+        nonzero = sum(1 for paise in balances.values() if paise)
+        self.assertLessEqual(len(transfers), max(nonzero - 1, 0))
+        return transfers
+
+    def test_random_balances_settle_in_at_most_n_minus_1_transfers(self):
+        rng = random.Random(16)
+        for _ in range(200):
+            people = rng.randint(1, 60)
+            with self.subTest(people=people):
+                self.assertSettles(random_balances(rng, people))
+
+    def test_owner_key_and_zero_balances(self):
+        transfers = self.assertSettles({settlement.OWNER: 1500, 1: -1000, 2: -500, 3: 0})
+        self.assertEqual(sorted(transfers, key=lambda t: t[0]), [(1, None, 1000), (2, None, 500)])
+
+    def test_unbalanced_input_is_rejected(self):
+        with self.assertRaises(ValueError):
+            settlement.minimize_transfers({1: 100, 2: -99})
+
+
+class NetBalancesTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = Person.objects.bulk_create([
+            Person(name=name, upi_id=f'{name.lower()}@upi') for name in ('Alice', 'Bob', 'Carol')
+        ])
+
+    def test_bill_without_payer_is_owed_to_the_owner(self):
+        BillSplitService.create(title='Dinner', total_amount='90.00',
+                                person_ids=[self.alice.pk, self.bob.pk, self.carol.pk])
+        self.assertEqual(settlement.net_balances(), {
+            settlement.OWNER: 9000, self.alice.pk: -3000, self.bob.pk: -3000, self.carol.pk: -3000,
+        })
+
+    def test_payer_share_is_not_a_debt(self):
+        BillSplitService.create(title='Cab', total_amount='60.00',
+                                person_ids=[self.alice.pk, self.bob.pk], paid_by_id=self.alice.pk)
+        self.assertEqual(settlement.net_balances(), {self.alice.pk: 3000, self.bob.pk: -3000})
+
+    def test_balances_net_across_bills_and_skip_paid_items(self):
+        BillSplitService.create(title='Cab', total_amount='60.00',
+                                person_ids=[self.alice.pk, self.bob.pk], paid_by_id=self.alice.pk)
+        BillSplitService.create(title='Lunch', total_amount='100.00',
+                                person_ids=[self.alice.pk, self.bob.pk], paid_by_id=self.bob.pk)
+        owner_bill = BillSplitService.create(title='Tickets', total_amount='30.01',
+                                             person_ids=[self.bob.pk, self.carol.pk])
+        BillSplitService.set_paid(owner_bill.billsplititem_set.get(person=self.carol).pk, True)
+        balances = settlement.net_balances()
+        self.assertEqual(sum(balances.values()), 0)
+        self.assertEqual(balances[self.alice.pk], 3000 - 5000)
+        self.assertNotIn(self.carol.pk, balances)
+        self.assertEqual(len(settlement.minimize_transfers(balances)), 2)
+
+
+class ParseAmountTests(SimpleTestCase):
+    def test_rounds_to_paise(self):
+        self.assertEqual(splits.parse_amount(' 12.345 '), Decimal('12.35'))
+
+    def test_invalid_or_out_of_range_input_gives_the_default(self):
+        for raw in ('', 'abc', 'nan', 'inf', '1e30', '-1e11', '10000000000'):
+            with self.subTest(raw=raw):
+                self.assertEqual(splits.parse_amount(raw, default=Decimal('0')), Decimal('0'))
+
+    def test_largest_storable_amount_is_accepted(self):
+        self.assertEqual(splits.parse_amount('9999999999.99'), splits.MAX_AMOUNT)
+
+
+class SplitConservationTests(SimpleTestCase):
+    def test_every_split_type_adds_up_exactly(self):
+        rng = random.Random(17)
+        for _ in range(300):
+            count = rng.randint(1, 200)
+            total = rng.randint(0, 10 ** 9)
+            cents = [rng.randint(1, 10000) for _ in range(count)]
+            percentages = splits.allocate(100 * splits.PERCENT_SCALE, cents)
+            cases = {
+                'equal': (),
+                'weighted': [str(Decimal(c) / 1000) for c in cents],
+                'percentage': [str(Decimal(p) / splits.PERCENT_SCALE) for p in percentages],
+                'custom': [str(splits.from_minor(share)) for share in splits.allocate(total, cents)],
+            }
+            for split_type, values in cases.items():
+                with self.subTest(split_type=split_type, count=count, total=total):
+                    shares = splits.split_minor(total, count, split_type, values)
+                    self.assertEqual(len(shares), count)
+                    self.assertEqual(sum(shares), total)
+                    self.assertTrue(all(share >= 0 for share in shares))
+
+    def test_equal_shares_differ_by_at_most_one_paisa(self):
+        shares = splits.split_minor(10000, 3)
+        self.assertEqual(shares, [3334, 3333, 3333])
+
+
+class AmountInputTests(TestCase):
+    def test_huge_cash_amount_does_not_error(self):
+        response = self.client.post(reverse('cash'), {
+            'cash_desc': 'Huge', 'cash_amount': '1e30', 'cash_type': 'expense', 'cash_source': 'Shop',
+        })
+        self.assertEqual(response.status_code, 302)
+
+    def test_huge_bill_total_is_rejected(self):
+        person = Person.objects.create(name='Alice', upi_id='alice@upi')
+        response = self.client.post(reverse('create_bill_split'), {
+            'title': 'Huge', 'total_amount': '1e30', 'people': [person.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(BillSplit.objects.exists())
+
+
+class SmsIngestTests(TestCase):
+    messages = [
+        {'address': 'VM-HDFCBK', 'date': 1697040000000,
+         'body': 'Rs.250.00 debited from a/c **1234 on 12-10-23 to VPA zomato@hdfcbank (UPI Ref No 1). Not you?'},
+        {'address': 'VM-HDFCBK', 'date': 1697040060000,
+         'body': 'Money Received - INR 1,000.50 in your A/c XX1234 on 12-10-23 from RAHUL (UPI Ref No 2).'},
+        {'address': 'AX-AXISBK', 'date': 1699718400000,
+         'body': 'INR 75.25 debited A/c no. XX1234 12-11-23 10:00:00 UPI/P2M/3/UBER Not you? SMS BLOCK'},
+        {'address': 'XY-HDFCBK', 'date': 1697040120000,
+         'body': '123456 is your OTP for txn of Rs 99.00 at SWIGGY. Do not share.'},
+    ]
+
+    def test_ingest_queues_one_outbox_upsert_per_inserted_row(self):
+        stats = sms.ingest(self.messages)
+        self.assertEqual((stats['inserted'], stats['skipped']), (3, 1))
+        ids = set(CashTransaction.objects.values_list('pk', flat=True))
+        queued = MongoOutbox.objects.filter(operation='upsert')
+        self.assertEqual({row.key['django_id'] for row in queued}, ids)
+        self.assertFalse(MongoOutbox.objects.exclude(operation='upsert').exists())
+        self.assertEqual(ledger.verify_rollups(), [])
+
+    def test_reingest_writes_nothing(self):
+        sms.ingest(self.messages)
+        queued = MongoOutbox.objects.count()
+        stats = sms.ingest(self.messages)
+        self.assertEqual((stats['inserted'], stats['duplicates']), (0, 3))
+        self.assertEqual(MongoOutbox.objects.count(), queued)
+        self.assertEqual(ledger.verify_rollups(), [])
+
+    def test_row_stored_by_another_ingest_is_not_counted_twice(self):
+        existing = sms.transaction_from_record(self.messages[0], lambda description: 'other')
+        existing.save()
+        outbox_before = MongoOutbox.objects.count()
+        stats = sms.ingest(self.messages)
+        self.assertEqual((stats['inserted'], stats['duplicates']), (2, 1))
+        self.assertEqual(MongoOutbox.objects.count() - outbox_before, 2)
+        self.assertEqual(ledger.verify_rollups(), [])
+
+    def test_bad_dates_fall_back_instead_of_aborting(self):
+        body = self.messages[0]['body']
+        records = [dict(self.messages[0], date=date_value, body=f'{body} {i}')
+                   for i, date_value in enumerate((99999999999999999999, 1e300, True, 'not a date'))]
+        before = timezone.now()
+        stats = sms.ingest(records)
+        self.assertEqual(stats['inserted'], 4)
+        self.assertTrue(all(tx.created_at >= before for tx in CashTransaction.objects.all()))
+
+    def test_parse_date_accepts_fractional_epoch_strings(self):
+        self.assertEqual(sms.parse_date('1700000000.5').timestamp(), 1700000000.5)
+        self.assertEqual(sms.parse_date('1700000000500').timestamp(), 1700000000.5)
+        self.assertIsNone(sms.parse_date(False))
+
+    def test_reread_fallback_returns_only_new_rows(self):
+        rows = [sms.transaction_from_record(message, lambda description: 'other') for message in self.messages[:3]]
+        rows[0].save()
+        inserted = sms._insert_reread(rows)
+        self.assertEqual(set(inserted), {rows[1].sms_hash, rows[2].sms_hash})
+        self.assertEqual(CashTransaction.objects.count(), 3)
+
+
+class _FakeModel:
+    version = 'test'
+    target = 'max_possible_saving'
+    features = FEATURES
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict_many(self, rows):
+        self.calls += 1
+        return [float(sum(row)) for row in rows]
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def setUp(self):
+        prediction_cache.reset()
+        self.addCleanup(prediction_cache.reset)
+
+    def test_month_index_does_not_use_prediction_slots(self):
+        months = [date(2024, month, 1) for month in (1, 2, 3)]
+        prediction_cache.predict_cached(_FakeModel(), [[1.0], [2.0], [3.0]], months=months)
+        self.assertEqual(len(prediction_cache.backend()), 3)
+        self.assertEqual(len(prediction_cache.month_index()), 3)
+
+    def test_invalidate_months_drops_prediction_and_index_entry(self):
+        model = _FakeModel()
+        months = [date(2024, 1, 1), date(2024, 2, 1)]
+        prediction_cache.predict_cached(model, [[1.0], [2.0]], months=months)
+        self.assertEqual(prediction_cache.invalidate_months([date(2024, 1, 1)]), 1)
+        self.assertEqual((len(prediction_cache.backend()), len(prediction_cache.month_index())), (1, 1))
+        prediction_cache.predict_cached(model, [[1.0], [2.0]], months=months)
+        self.assertEqual(model.calls, 2)
+        self.assertEqual(prediction_cache.stats()['hits'], 1)
+
+
+class PredictMonthsTests(TestCase):
+    def setUp(self):
+        prediction_cache.reset()
+        self.addCleanup(prediction_cache.reset)
+
+    def test_reads_stored_features_without_refreshing(self):
+        now = timezone.now()
+        SavingsFeatures.objects.create(month=date(2024, 1, 1), income=100, computed_at=now)
+        SavingsFeatures.objects.create(month=date(2024, 2, 1), income=200, computed_at=now, dirty_at=now)
+        with mock.patch.object(ml, 'get_model', return_value=_FakeModel()), \
+                mock.patch('finance.features.refresh_features') as refresh:
+            predictions = ml.predict_months()
+        refresh.assert_not_called()
+        self.assertEqual(predictions, [
+            {'month': '2024-01', 'prediction': 100.0, 'stale': False},
+            {'month': '2024-02', 'prediction': 200.0, 'stale': True},
+        ])
+        self.assertTrue(SavingsFeatures.objects.filter(dirty_at__isnull=False).exists())
+
+
+class LedgerTrainingTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        months = [date(2023, month, 1) for month in range(1, 9)] + [date(2023, 10, 1)]
+        for i, month in enumerate(months):
+            income, spend = 1000.0 + 100 * i, 400.0 + 37 * i
+            SavingsFeatures.objects.create(month=month, income=income, total_spend=spend,
+                                           net_saving=income - spend, computed_at=now)
+
+    def test_ledger_label_is_next_months_net_saving(self):
+        X, y, target = training.load_dataset(ledger=True)
+        self.assertEqual(target, 'next_month_net_saving')
+        # August has no stored September and October has no November, so both drop
+        self.assertEqual([month.month for month in X.index], list(range(1, 8)))
+        self.assertNotIn('net_saving', X.columns)
+        same_month = X['income'] - X['total_spend']
+        self.assertEqual(list(y), list(same_month + 63.0))
+
+    def test_ledger_model_is_not_promoted_by_default(self):
+        with tempfile.TemporaryDirectory() as directory:
+            served = Path(directory) / 'served.pkl'
+            with override_settings(SAVINGS_MODEL_PATH=served):
+                call_command('train_savings_model', '--ledger', '--families', 'ridge', '--n-iter', '1',
+                             '--folds', '2', '--n-jobs', '1', '--out-dir', directory, stdout=io.StringIO())
+            self.assertFalse(served.exists())
+
+
+class OutOfCoreTrainingTests(SimpleTestCase):
+    def write_csv(self, directory, rows=40, blank_row=5):
+        path = Path(directory) / 'savings.csv'
+        rng = random.Random(0)
+        lines = [','.join(FEATURES + [TARGET])]
+        for i in range(rows):
+            values = [f'{rng.uniform(0, 1000):.2f}' for _ in FEATURES]
+            values.append(f'{sum(map(float, values)) / 10:.2f}')
+            if i == blank_row:
+                values[0] = ''
+            lines.append(','.join(values))
+        path.write_text('\n'.join(lines) + '\n')
+        return path
+
+    def test_incomplete_rows_are_dropped_and_counted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_csv(directory)
+            artifact = training.train_out_of_core(
+                lambda: training.iter_chunks(path, 7), epochs=2, log=lambda message: None,
+            )
+        rows = artifact['metrics']['rows']
+        self.assertEqual(rows['dropped'], 1)
+        self.assertEqual(rows['train'] + rows['test'], 39)
+
+    def test_peak_rss_is_optional(self):
+        with mock.patch.dict('sys.modules', {'resource': None, 'psutil': None}):
+            self.assertIsNone(training.peak_rss_mb())
+        self.assertEqual(training.format_mb(None), 'n/a')
+
+
+def _exit_without_result(path, target, results):
+    os._exit(3)
+
+
+class DatasetBenchmarkTests(SimpleTestCase):
+    def test_child_error_is_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'bad.csv'
+            path.write_text('a,b\n1,2\n')
+            with self.assertRaisesMessage(CommandError, 'DatasetError'):
+                ConvertSavingsDataset().benchmark(str(path), TARGET, timeout=60)
+
+    @skipIf(multiprocessing.get_start_method() != 'fork', 'the patched target only reaches a forked child')
+    def test_child_exit_without_result_is_reported(self):
+        with mock.patch('finance.management.commands.convert_savings_dataset.timed_load', _exit_without_result):
+            with self.assertRaisesMessage(CommandError, 'exited with code 3'):
+                ConvertSavingsDataset().benchmark('missing.csv', TARGET, timeout=60)
+
+
+class CategorizerTests(SimpleTestCase):
+    def setUp(self):
+        self.categorizer = Categorizer({
+            'food': ['restaurant', 'grocery', 'food'],
+            'transport': ['gas', 'uber', 'taxi'],
+            'entertainment': ['game', 'games', 'movie'],
+            'empty': [],
+        })
+
+    def test_descriptions_map_to_categories(self):
+        cases = {
+            'Dinner at RESTAURANT': 'food',
+            'Uber to airport': 'transport',
+            'gaming': 'other',
+            'Board games night': 'entertainment',
+            'Gas station': 'transport',
+            'Paid to NOBODY': 'other',
+            '': 'other',
+            None: 'other',
+        }
+        for description, category in cases.items():
+            with self.subTest(description=description):
+                self.assertEqual(self.categorizer.categorize(description), category)
+
+    def test_first_category_in_config_order_wins(self):
+        self.assertEqual(self.categorizer.categorize('uber eats food'), 'food')
+
+    def test_trie_matches_like_a_keyword_loop(self):
+        rng = random.Random(0)
+        words = [''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))) for _ in range(30)]
+        regex = re.compile(trie_pattern(words))
+        for _ in range(300):
+            text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 8)))
+            with self.subTest(text=text):
+                self.assertEqual(bool(regex.search(text)), any(word in text for word in words))
+
+
+class CategoryBackfillTests(TestCase):
+    def test_backfill_moves_category_and_updated_at_and_dirties_months(self):
+        tx = cash(description='Dinner at restaurant', created_at=timezone.now() - timedelta(days=90))
+        stale = timezone.now() - timedelta(days=30)
+        CashTransaction.objects.filter(pk=tx.pk).update(category='other', updated_at=stale)
+        SavingsFeatures.objects.all().delete()
+
+        call_command('categorize_transactions', stdout=io.StringIO())
+        tx.refresh_from_db()
+        self.assertEqual(tx.category, 'food')
+        self.assertGreater(tx.updated_at, stale)
+        month = features.month_start(tx.created_at)
+        self.assertTrue(SavingsFeatures.objects.filter(month=month, dirty_at__isnull=False).exists())
+
+    def test_unchanged_rows_are_left_alone(self):
+        tx = cash(description='Dinner at restaurant')
+        before = CashTransaction.objects.get(pk=tx.pk).updated_at
+        self.assertEqual(categories.backfill(), (1, 0))
+        self.assertEqual(CashTransaction.objects.get(pk=tx.pk).updated_at, before)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        base = timezone.now() - timedelta(days=1)
+        # Pairs share a created_at, so only the id breaks the tie
+        self.rows = [cash(created_at=base + timedelta(minutes=i // 2)) for i in range(7)]
+
+    def walk(self, page_size, descending):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = pagination.keyset_page(CashTransaction.objects.all(), cursor, page_size, descending)
+            seen.extend(row.pk for row in rows)
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_every_row_once_in_both_orders(self):
+        ascending = sorted(self.rows, key=lambda tx: (tx.created_at, tx.pk))
+        for page_size in (1, 2, 3, 7, 50):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(self.walk(page_size, descending=False), [tx.pk for tx in ascending])
+                self.assertEqual(self.walk(page_size, descending=True), [tx.pk for tx in reversed(ascending)])
+
+    def test_cursor_round_trip(self):
+        tx = self.rows[3]
+        self.assertEqual(pagination.decode_cursor(pagination.encode_cursor(tx.created_at, tx.pk)),
+                         (tx.created_at, tx.pk))
+
+    def test_malformed_cursors_return_the_first_page(self):
+        first, _ = pagination.keyset_page(CashTransaction.objects.all(), None, 3)
+        forged = [
+            'not base64!', 'é', '====', base64.urlsafe_b64encode(b'garbage').decode(),
+            base64.urlsafe_b64encode(b'2024-01-01T00:00:00|abc').decode(),
+            base64.urlsafe_b64encode(b'\xff\xfe|1').decode(),
+            base64.urlsafe_b64encode(f'2024-01-01T00:00:00+00:00|{10 ** 30}'.encode()).decode(),
+        ]
+        for cursor in forged:
+            with self.subTest(cursor=cursor):
+                rows, _ = pagination.keyset_page(CashTransaction.objects.all(), cursor, 3)
+                self.assertEqual(rows, first)
+
+    def test_naive_cursor_is_read_as_current_timezone(self):
+        cursor = base64.urlsafe_b64encode(b'2999-01-01T00:00:00|1').decode()
+        created_at, _ = pagination.decode_cursor(cursor)
+        self.assertTrue(timezone.is_aware(created_at))
+
+    def test_cash_page_survives_forged_cursors(self):
+        cursor = base64.urlsafe_b64encode(f'2024-01-01T00:00:00|{10 ** 30}'.encode()).decode()
+        response = self.client.get(reverse('cash'), {'income_after': cursor, 'expense_after': 'é%%'})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,416 @@
+"""
+Training pipeline for the savings model.
+
+train() searches several model families (scaled Ridge and ElasticNet,
+histogram gradient boosting, a random forest) with a seeded
+RandomizedSearchCV per family, run in parallel over folds and candidates
+(n_jobs=-1). The search runs on a seeded sample of the training split
+(`search_rows`) so it stays in minutes on a million-row table. The winner
+is cross-validated once more to log per-fold timings, refit on the whole
+training split and scored on the held-out test split.
+
+train_out_of_core() is the alternative for tables larger than RAM: it
+streams CSV chunks, Parquet row groups or Arrow record batches through StandardScaler.partial_fit
+and SGDRegressor.partial_fit, so memory stays at about one chunk, and it
+reports the process's peak RSS.
+
+Every run writes a versioned directory with the joblib artifact and a
+metrics.json. The artifact is the same dict finance_Model.py saves, plus a
+version and the metrics, so finance.ml can serve it; promote() swaps it into
+the served path atomically.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+
+from . import datasets
+from .features import FEATURES, LEDGER_FORECAST_TARGET, LEDGER_TARGET, TARGET, feature_frame
+
+
+DEFAULT_CSV_PATH = Path(settings.BASE_DIR) / 'ML Model' / 'finance_savings_dataset.csv'
+DEFAULT_ARTIFACT_DIR = Path(settings.BASE_DIR) / 'ML Model' / 'artifacts'
+FOREST_MAX_SAMPLES = 20000
+
+
+class TrainingError(Exception):
+    """Raised when there is no usable data or no model could be fitted"""
+
+
+def model_families(seed, n_rows=None):
+    """{name: (estimator, search space)} for every candidate family"""
+    from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import ElasticNet, Ridge
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    # Bound each forest's bootstrap so its trees stay cheap on large tables
+    max_samples = FOREST_MAX_SAMPLES if n_rows and n_rows > FOREST_MAX_SAMPLES else None
+    return {
+        'ridge': (
+            Pipeline([('scaler', StandardScaler()), ('model', Ridge())]),
+            {'model__alpha': [0.01, 0.1, 1.0, 10.0, 100.0, 1000.0]},
+        ),
+        'elasticnet': (
+            Pipeline([('scaler', StandardScaler()), ('model', ElasticNet(max_iter=5000, random_state=seed))]),
+            {'model__alpha': [0.01, 0.1, 1.0, 10.0], 'model__l1_ratio': [0.1, 0.5, 0.9]},
+        ),
+        'hist_gradient_boosting': (
+            Pipeline([('model', HistGradientBoostingRegressor(random_state=seed))]),
+            {
+                'model__learning_rate': [0.05, 0.1, 0.2],
+                'model__max_leaf_nodes': [15, 31, 63],
+                'model__l2_regularization': [0.0, 1.0],
+            },
+        ),
+        'random_forest': (
+            # Trees are built serially; the search parallelizes across fits instead
+            Pipeline([('model', RandomForestRegressor(n_estimators=50, max_samples=max_samples, n_jobs=1, random_state=seed))]),
+            {'model__max_depth': [12, 24], 'model__min_samples_leaf': [5, 20], 'model__max_features': [0.5, 1.0]},
+        ),
+    }
+
+
+def with_next_month_target(frame):
+    """Add LEDGER_FORECAST_TARGET: the following calendar month's net_saving, NaN when it is not stored"""
+    import pandas as pd
+
+    months = pd.PeriodIndex(pd.to_datetime(frame.index), freq='M')
+    observed = pd.Series(frame[LEDGER_TARGET].to_numpy(), index=months)
+    frame = frame.copy()
+    frame[LEDGER_FORECAST_TARGET] = observed.reindex(months + 1).to_numpy()
+    return frame
+
+
+def load_dataset(path=None, ledger=False):
+    """Return (X, y, target name) from a CSV/Parquet/Arrow dataset or the SavingsFeatures table
+
+    With `ledger`, each month's features are labelled with the next month's
+    net_saving; the same month's value is income - total_spend, which the
+    features already contain.
+    """
+    if ledger:
+        frame = feature_frame()
+        missing = [name for name in FEATURES + [LEDGER_TARGET] if name not in frame.columns]
+        if missing:
+            raise TrainingError(f'Dataset is missing columns: {", ".join(missing)}')
+        frame = with_next_month_target(frame)
+        target = LEDGER_FORECAST_TARGET
+    else:
+        target = TARGET
+        try:
+            frame = datasets.load_frame(path or DEFAULT_CSV_PATH, target)
+        except datasets.DatasetError as e:
+            raise TrainingError(str(e))
+    frame = frame[FEATURES + [target]].dropna()
+    if len(frame) < 5:
+        raise TrainingError(f'Need at least 5 complete rows to train, found {len(frame)}')
+    # Columnar datasets stay float32 (and memory-mapped for Arrow) until scikit-learn converts them
+    return frame[FEATURES], frame[target], target
+
+
+def data_hash(X, y):
+    import pandas as pd
+
+    digest = hashlib.sha1(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def regression_metrics(y_true, y_pred):
+    import numpy as np
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    return {
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'r2': float(r2_score(y_true, y_pred)) if len(y_true) > 1 else None,
+    }
+
+
+def train(X, y, target=TARGET, families=None, n_iter=10, folds=5, search_rows=200000,
+          test_size=0.2, n_jobs=-1, seed=42, log=print):
+    """Search, select, refit and evaluate; returns the artifact dict"""
+    import numpy as np
+    import sklearn
+    from sklearn.base import clone
+    from sklearn.model_selection import KFold, ParameterGrid, RandomizedSearchCV, cross_validate, train_test_split
+
+    candidates = model_families(seed, n_rows=len(X))
+    names = families or list(candidates)
+    unknown = [name for name in names if name not in candidates]
+    if unknown:
+        raise TrainingError(f'Unknown model families: {", ".join(unknown)} (choose from {", ".join(candidates)})')
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=max(1, int(test_size * len(X))), random_state=seed
+    )
+    X_search, y_search = X_train, y_train
+    if len(X_train) > search_rows:
+        X_search = X_train.sample(n=search_rows, random_state=seed)
+        y_search = y_train.loc[X_search.index]
+    cv = KFold(n_splits=max(2, min(folds, len(X_search))), shuffle=True, random_state=seed)
+    log(f'Training on {len(X_train)} rows ({len(X_search)} in the search), testing on {len(X_test)}, '
+        f'{cv.n_splits}-fold CV.')
+
+    results = []
+    for name in names:
+        estimator, space = candidates[name]
+        started = time.perf_counter()
+        search = RandomizedSearchCV(
+            estimator, space, n_iter=min(n_iter, len(ParameterGrid(space))), cv=cv,
+            scoring='neg_mean_absolute_error', n_jobs=n_jobs, random_state=seed, refit=False,
+            error_score=np.nan,
+        )
+        search.fit(X_search, y_search)
+        seconds = time.perf_counter() - started
+        scores = search.cv_results_['mean_test_score']
+        if np.isnan(scores).all():
+            log(f'{name:>24}: every candidate failed to fit ({seconds:.1f}s)')
+            continue
+        best = int(np.nanargmax(scores))
+        results.append({
+            'family': name,
+            'params': search.cv_results_['params'][best],
+            'cv_mae': float(-scores[best]),
+            'mean_fit_time': float(search.cv_results_['mean_fit_time'][best]),
+            'search_seconds': round(seconds, 3),
+            'candidates': len(scores),
+        })
+        log(f'{name:>24}: CV MAE {-scores[best]:,.2f} with {search.cv_results_["params"][best]} '
+            f'({len(scores)} candidates in {seconds:.1f}s)')
+    if not results:
+        raise TrainingError('No model family could be fitted')
+
+    winner = min(results, key=lambda result: result['cv_mae'])
+    estimator, _ = candidates[winner['family']]
+    model = clone(estimator).set_params(**winner['params'])
+
+    folds_report = cross_validate(
+        model, X_search, y_search, cv=cv, n_jobs=n_jobs,
+        scoring={'mae': 'neg_mean_absolute_error', 'rmse': 'neg_root_mean_squared_error'},
+    )
+    fold_log = []
+    for i in range(cv.n_splits):
+        fold = {
+            'fold': i,
+            'fit_time': float(folds_report['fit_time'][i]),
+            'score_time': float(folds_report['score_time'][i]),
+            'mae': float(-folds_report['test_mae'][i]),
+            'rmse': float(-folds_report['test_rmse'][i]),
+        }
+        fold_log.append(fold)
+        log(f'  fold {i}: fit {fold["fit_time"]:.3f}s, score {fold["score_time"]:.3f}s, '
+            f'MAE {fold["mae"]:,.2f}, RMSE {fold["rmse"]:,.2f}')
+
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    refit_seconds = time.perf_counter() - started
+    test_metrics = regression_metrics(y_test, model.predict(X_test))
+    log(f'Selected {winner["family"]}; refit in {refit_seconds:.1f}s. '
+        f'Test MAE {test_metrics["mae"]:,.2f}, RMSE {test_metrics["rmse"]:,.2f}, R² {test_metrics["r2"]}')
+
+    hashed = data_hash(X, y)
+    version = f'{datetime.now(dt_timezone.utc):%Y%m%dT%H%M%SZ}-{hashed[:8]}'
+    metrics = {
+        'version': version,
+        'family': winner['family'],
+        'params': winner['params'],
+        'test': test_metrics,
+        'cv_folds': fold_log,
+        'search': results,
+        'refit_seconds': round(refit_seconds, 3),
+        'rows': {'train': len(X_train), 'search': len(X_search), 'test': len(X_test)},
+        'data_sha1': hashed,
+        'seed': seed,
+        'sklearn': sklearn.__version__,
+    }
+    return {
+        'pipeline': model,
+        'features': FEATURES,
+        'target': target,
+        'version': version,
+        'metrics': metrics,
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB; None when the platform cannot tell"""
+    import sys
+
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil exposes the peak working set, when it is installed
+        try:
+            import psutil
+        except ImportError:
+            return None
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        return None if peak is None else peak / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def format_mb(value):
+    return 'n/a' if value is None else f'{value:,.0f} MiB'
+
+
+def iter_chunks(path, chunksize, target=TARGET):
+    """Yield DataFrames of FEATURES + target from a CSV, Parquet or Arrow file, `chunksize` rows at a time"""
+    try:
+        yield from datasets.iter_frames(path, chunksize, target)
+    except datasets.DatasetError as e:
+        raise TrainingError(str(e))
+
+
+def train_out_of_core(chunks, target=TARGET, epochs=5, test_size=0.2, seed=42, log=print):
+    """Fit StandardScaler + SGDRegressor with partial_fit over `chunks`, a callable returning a fresh chunk iterator
+
+    Memory is bounded by one chunk: a first pass fits the scaler and target
+    statistics, each epoch re-reads the data for SGDRegressor.partial_fit,
+    and a last pass scores the held-out rows (every 1/test_size-th row).
+    Rows with a missing value are dropped from every pass, as load_dataset()
+    does in memory.
+    """
+    import numpy as np
+    import sklearn
+    from sklearn.linear_model import SGDRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    holdout_every = max(2, int(round(1 / test_size)))
+    rng = np.random.default_rng(seed)
+
+    def split(frame, offset):
+        test = (np.arange(offset, offset + len(frame)) % holdout_every) == 0
+        return frame[~test], frame[test]
+
+    def complete_chunks():
+        for frame in chunks():
+            yield frame.dropna()
+
+    started = time.perf_counter()
+    scaler = StandardScaler()
+    digest = hashlib.sha1()
+    n_train = n_test = n_chunks = n_dropped = 0
+    y_sum = y_sq = 0.0
+    offset = 0
+    for frame in chunks():
+        digest.update(frame.to_numpy().tobytes())
+        complete = frame.dropna()
+        n_dropped += len(frame) - len(complete)
+        frame = complete
+        train_rows, _ = split(frame, offset)
+        offset += len(frame)
+        n_chunks += 1
+        if len(train_rows):
+            scaler.partial_fit(train_rows[FEATURES])
+            y = train_rows[target].to_numpy(dtype=np.float64)
+            y_sum += y.sum()
+            y_sq += (y ** 2).sum()
+            n_train += len(y)
+        n_test += len(frame) - len(train_rows)
+    if n_train < 2 or n_test < 1:
+        raise TrainingError(f'Need at least 2 training and 1 test row, found {n_train} and {n_test}')
+    y_mean = y_sum / n_train
+    y_std = float(np.sqrt(max(y_sq / n_train - y_mean ** 2, 0.0))) or 1.0
+    log(f'Scaler pass over {n_chunks} chunks: {n_train} training and {n_test} test rows '
+        f'({n_dropped} incomplete rows dropped) in {time.perf_counter() - started:.1f}s, '
+        f'peak RSS {format_mb(peak_rss_mb())}.')
+
+    # The target is standardized for SGD and the coefficients are mapped back afterwards
+    model = SGDRegressor(penalty='l2', alpha=1e-5, learning_rate='invscaling', eta0=0.01, random_state=seed)
+    for epoch in range(epochs):
+        epoch_started = time.perf_counter()
+        offset = 0
+        for frame in complete_chunks():
+            train_rows, _ = split(frame, offset)
+            offset += len(frame)
+            if not len(train_rows):
+                continue
+            order = rng.permutation(len(train_rows))
+            X = scaler.transform(train_rows[FEATURES].iloc[order])
+            y = (train_rows[target].to_numpy(dtype=np.float64)[order] - y_mean) / y_std
+            model.partial_fit(X, y)
+        log(f'  epoch {epoch}: {time.perf_counter() - epoch_started:.1f}s, peak RSS {format_mb(peak_rss_mb())}')
+    model.coef_ = model.coef_ * y_std
+    model.intercept_ = model.intercept_ * y_std + y_mean
+    pipeline = Pipeline([('scaler', scaler), ('model', model)])
+
+    abs_error = sq_error = t_sum = t_sq = 0.0
+    offset = 0
+    for frame in complete_chunks():
+        _, test_rows = split(frame, offset)
+        offset += len(frame)
+        if not len(test_rows):
+            continue
+        y = test_rows[target].to_numpy(dtype=np.float64)
+        error = y - pipeline.predict(test_rows[FEATURES])
+        abs_error += np.abs(error).sum()
+        sq_error += (error ** 2).sum()
+        t_sum += y.sum()
+        t_sq += (y ** 2).sum()
+    total_ss = t_sq - t_sum ** 2 / n_test
+    test_metrics = {
+        'mae': float(abs_error / n_test),
+        'rmse': float(np.sqrt(sq_error / n_test)),
+        'r2': float(1 - sq_error / total_ss) if total_ss > 0 else None,
+    }
+    seconds = time.perf_counter() - started
+    peak = peak_rss_mb()
+    log(f'Out-of-core SGD in {seconds:.1f}s. Test MAE {test_metrics["mae"]:,.2f}, '
+        f'RMSE {test_metrics["rmse"]:,.2f}, R² {test_metrics["r2"]}; peak RSS {format_mb(peak)}')
+
+    hashed = digest.hexdigest()
+    version = f'{datetime.now(dt_timezone.utc):%Y%m%dT%H%M%SZ}-{hashed[:8]}'
+    metrics = {
+        'version': version,
+        'family': 'sgd_out_of_core',
+        'params': model.get_params(),
+        'epochs': epochs,
+        'test': test_metrics,
+        'rows': {'train': n_train, 'test': n_test, 'dropped': n_dropped, 'chunks': n_chunks},
+        'seconds': round(seconds, 3),
+        'peak_rss_mb': None if peak is None else round(peak, 1),
+        'data_sha1': hashed,
+        'seed': seed,
+        'sklearn': sklearn.__version__,
+    }
+    return {
+        'pipeline': pipeline,
+        'features': FEATURES,
+        'target': target,
+        'version': version,
+        'metrics': metrics,
+    }
+
+
+def save_artifact(artifact, out_dir=None):
+    """Write <out_dir>/<version>/model.pkl and metrics.json; returns the model path"""
+    import joblib
+
+    directory = Path(out_dir or DEFAULT_ARTIFACT_DIR) / artifact['version']
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / 'model.pkl'
+    # Uncompressed, so finance.ml can memory-map the arrays
+    joblib.dump(artifact, path)
+    with open(directory / 'metrics.json', 'w', encoding='utf-8') as f:
+        json.dump(artifact['metrics'], f, indent=2, default=str)
+    return path
+
+
+def promote(path, served_path):
+    """Atomically replace the served model with the artifact at `path`"""
+    served_path = Path(served_path)
+    served_path.parent.mkdir(parents=True, exist_ok=True)
+    staging = served_path.with_name(served_path.name + '.tmp')
+    shutil.copyfile(path, staging)
+    os.replace(staging, served_path)
+    return served_path
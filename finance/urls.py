@@ -4,6 +4,10 @@ from . import views
 
 urlpatterns = [
     path('', views.cash_list_create, name='cash'),
+    path('export/', views.cash_export, name='cash_export'),
+    path('sms/ingest/', views.ingest_sms, name='ingest_sms'),
+    path('ml/predict/', views.predict_savings, name='predict_savings'),
+    path('ml/cache/', views.prediction_cache_stats, name='prediction_cache_stats'),
     path('<int:pk>/edit/', views.cash_edit, name='cash_edit'),
     path('<int:pk>/delete/', views.cash_delete, name='cash_delete'),
     
@@ -13,6 +17,8 @@ urlpatterns = [
     path('bill-split/from-transaction/<int:tx_pk>/', views.create_bill_from_transaction, name='create_bill_from_transaction'),
     path('bill-split/<int:pk>/', views.bill_split_detail, name='bill_split_detail'),
     path('bill-split/mark-payment/<int:pk>/', views.mark_payment, name='mark_payment'),
+    path('bill-split/<int:pk>/mark-payments/', views.mark_payments, name='mark_payments'),
+    path('bill-split/settlement/', views.settlement_plan, name='settlement_plan'),
     path('bill-split/add-person/', views.add_person, name='add_person'),
 ]
 
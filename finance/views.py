@@ -1,12 +1,22 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
+from datetime import datetime
 from decimal import Decimal
+import csv
 import json
-from .models import CashTransaction, BillSplit, BillSplitItem, Person, BillSplitHistory
+from .models import CashTransaction, BillSplit, Person
+from . import ml, prediction_cache, settlement, sms
+from .pagination import keyset_page
+from .services import BillSplitError, BillSplitService, cash_totals
+from .splits import parse_amount
+
+
+PAGE_SIZE = 50
+EXPORT_CHUNK_SIZE = 2000
 
 
 def cash_list_create(request):
@@ -16,10 +26,7 @@ def cash_list_create(request):
         type_value = request.POST.get('cash_type', 'expense').strip()
         source_or_destination = request.POST.get('cash_source', '').strip()
 
-        try:
-            amount = float(amount_raw)
-        except ValueError:
-            amount = 0
+        amount = parse_amount(amount_raw, default=Decimal('0'))
 
         if description and type_value in ('income', 'expense'):
             CashTransaction.objects.create(
@@ -30,24 +37,65 @@ def cash_list_create(request):
             )
         return redirect(reverse('cash'))
 
-    transactions = CashTransaction.objects.all()
-    income_list = [t for t in transactions if t.type == 'income']
-    expense_list = [t for t in transactions if t.type == 'expense']
-
-    total_income = sum(t.amount for t in income_list)
-    total_expense = sum(t.amount for t in expense_list)
-    total_balance = total_income - total_expense
+    totals = cash_totals()
+    income_after = request.GET.get('income_after', '')
+    expense_after = request.GET.get('expense_after', '')
+    income_list, income_next = keyset_page(
+        CashTransaction.objects.filter(type='income'), income_after, PAGE_SIZE
+    )
+    expense_list, expense_next = keyset_page(
+        CashTransaction.objects.filter(type='expense'), expense_after, PAGE_SIZE
+    )
 
     context = {
         'income_transactions': income_list,
         'expense_transactions': expense_list,
-        'total_income': total_income,
-        'total_expense': total_expense,
-        'total_balance': total_balance,
+        'income_after': income_after,
+        'expense_after': expense_after,
+        'income_next': income_next,
+        'expense_next': expense_next,
+        'total_income': totals['income'],
+        'total_expense': totals['expense'],
+        'total_balance': totals['balance'],
     }
     return render(request, 'cash.html', context)
 
 
+class _Echo:
+    """File-like object whose write() hands the row back for streaming"""
+    def write(self, value):
+        return value
+
+
+def cash_export(request):
+    """Stream the whole cash ledger as CSV (default) or NDJSON"""
+    export_format = request.GET.get('format', 'csv')
+    fields = ('id', 'created_at', 'type', 'amount', 'description', 'source_or_destination')
+    rows = (
+        CashTransaction.objects.order_by('created_at', 'id')
+        .values_list(*fields)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    if export_format == 'ndjson':
+        def lines():
+            for row in rows:
+                yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
+        response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="cash_transactions.ndjson"'
+        return response
+
+    writer = csv.writer(_Echo())
+
+    def csv_rows():
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow(row)
+    response = StreamingHttpResponse(csv_rows(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="cash_transactions.csv"'
+    return response
+
+
 def cash_edit(request, pk: int):
     tx = get_object_or_404(CashTransaction, pk=pk)
     if request.method == 'POST':
@@ -55,10 +103,7 @@ def cash_edit(request, pk: int):
         amount_raw = request.POST.get('cash_amount', str(tx.amount)).strip()
         tx.type = request.POST.get('cash_type', tx.type).strip()
         tx.source_or_destination = request.POST.get('cash_source', tx.source_or_destination).strip()
-        try:
-            tx.amount = float(amount_raw)
-        except ValueError:
-            pass
+        tx.amount = parse_amount(amount_raw, default=tx.amount)
         tx.save()
         return redirect(reverse('cash'))
 
@@ -73,10 +118,56 @@ def cash_delete(request, pk: int):
     return render(request, 'cash_delete_confirm.html', {'t': tx})
 
 
+@csrf_exempt
+def ingest_sms(request):
+    """Bulk-import bank SMS posted as a JSON array or NDJSON body"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+    try:
+        stats = sms.ingest(sms.iter_records(request))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f'Invalid JSON: {e}'})
+    return JsonResponse({'success': True, **stats})
+
+
+@csrf_exempt
+def predict_savings(request):
+    """Savings-model predictions for posted feature rows, or for stored months on GET"""
+    try:
+        model = ml.get_model()
+        if request.method == 'POST':
+            try:
+                data = json.loads(request.body)
+                rows = data['rows'] if 'rows' in data else [data['features']]
+            except (ValueError, TypeError, KeyError) as e:
+                return JsonResponse({'success': False, 'error': f'Invalid payload: {e}'})
+            predictions = [round(float(value), 2) for value in model.predict_many(rows)]
+        else:
+            months = request.GET.getlist('month')
+            try:
+                months = [datetime.strptime(month, '%Y-%m').date() for month in months] or None
+            except ValueError:
+                return JsonResponse({'success': False, 'error': 'month must look like YYYY-MM'})
+            predictions = ml.predict_months(months)
+    except ml.ModelError as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    return JsonResponse({
+        'success': True,
+        'model_version': model.version,
+        'target': model.target,
+        'predictions': predictions,
+    })
+
+
+def prediction_cache_stats(request):
+    """Hit/miss counters of this worker's savings prediction cache"""
+    return JsonResponse({'success': True, **prediction_cache.stats()})
+
+
 def bill_split_home(request):
     """Main bill splitting page"""
     recent_transactions = CashTransaction.objects.filter(type='expense').order_by('-created_at')[:10]
-    recent_bills = BillSplit.objects.all().order_by('-created_at')[:5]
+    recent_bills = BillSplit.objects.order_by('-created_at')[:5]
     people = Person.objects.all().order_by('name')
     
     context = {
@@ -95,11 +186,11 @@ def create_bill_split(request):
         total_amount = request.POST.get('total_amount', '0').strip()
         split_type = request.POST.get('split_type', 'equal')
         person_ids = request.POST.getlist('people')
-        custom_amounts = request.POST.getlist('custom_amounts')
+        custom_amounts = [request.POST.get(f'custom_amount_{pk}', '') for pk in person_ids]
+        paid_by = request.POST.get('paid_by', '').strip()
         
-        try:
-            total_amount = Decimal(total_amount)
-        except (ValueError, TypeError):
+        total_amount = parse_amount(total_amount)
+        if total_amount is None:
             messages.error(request, 'Invalid total amount')
             return redirect('bill_split_home')
         
@@ -107,43 +198,19 @@ def create_bill_split(request):
             messages.error(request, 'Title and at least one person are required')
             return redirect('bill_split_home')
         
-        # Create bill split
-        bill_split = BillSplit.objects.create(
-            title=title,
-            description=description,
-            total_amount=total_amount,
-            split_type=split_type
-        )
-        
-        # Create split items
-        if split_type == 'equal':
-            amount_per_person = total_amount / len(person_ids)
-            for person_id in person_ids:
-                person = get_object_or_404(Person, pk=person_id)
-                BillSplitItem.objects.create(
-                    bill_split=bill_split,
-                    person=person,
-                    amount=amount_per_person
-                )
-        else:  # custom amounts
-            for i, person_id in enumerate(person_ids):
-                person = get_object_or_404(Person, pk=person_id)
-                try:
-                    amount = Decimal(custom_amounts[i]) if i < len(custom_amounts) else Decimal('0')
-                except (ValueError, TypeError):
-                    amount = Decimal('0')
-                BillSplitItem.objects.create(
-                    bill_split=bill_split,
-                    person=person,
-                    amount=amount
-                )
-        
-        # Create history entry
-        BillSplitHistory.objects.create(
-            bill_split=bill_split,
-            action='created',
-            description=f'Bill "{title}" created with {len(person_ids)} people, total ${total_amount}'
-        )
+        try:
+            bill_split = BillSplitService.create(
+                title=title,
+                description=description,
+                total_amount=total_amount,
+                split_type=split_type,
+                person_ids=person_ids,
+                custom_amounts=custom_amounts,
+                paid_by_id=int(paid_by) if paid_by.isdigit() else None,
+            )
+        except BillSplitError as e:
+            messages.error(request, str(e))
+            return redirect('bill_split_home')
         
         messages.success(request, f'Bill split "{title}" created successfully!')
         return redirect('bill_split_detail', pk=bill_split.pk)
@@ -159,49 +226,25 @@ def create_bill_from_transaction(request, tx_pk):
     if request.method == 'POST':
         person_ids = request.POST.getlist('people')
         split_type = request.POST.get('split_type', 'equal')
-        custom_amounts = request.POST.getlist('custom_amounts')
+        custom_amounts = [request.POST.get(f'custom_amount_{pk}', '') for pk in person_ids]
         
         if not person_ids:
             messages.error(request, 'At least one person is required')
             return redirect('bill_split_home')
         
-        # Create bill split
-        bill_split = BillSplit.objects.create(
-            title=f"Split: {transaction.description}",
-            description=f"Created from transaction: {transaction.description}",
-            total_amount=abs(transaction.amount),
-            split_type=split_type
-        )
-        
-        # Create split items
-        if split_type == 'equal':
-            amount_per_person = abs(transaction.amount) / len(person_ids)
-            for person_id in person_ids:
-                person = get_object_or_404(Person, pk=person_id)
-                BillSplitItem.objects.create(
-                    bill_split=bill_split,
-                    person=person,
-                    amount=amount_per_person
-                )
-        else:  # custom amounts
-            for i, person_id in enumerate(person_ids):
-                person = get_object_or_404(Person, pk=person_id)
-                try:
-                    amount = Decimal(custom_amounts[i]) if i < len(custom_amounts) else Decimal('0')
-                except (ValueError, TypeError):
-                    amount = Decimal('0')
-                BillSplitItem.objects.create(
-                    bill_split=bill_split,
-                    person=person,
-                    amount=amount
-                )
-        
-        # Create history entry
-        BillSplitHistory.objects.create(
-            bill_split=bill_split,
-            action='created',
-            description=f'Bill created from transaction "{transaction.description}" with {len(person_ids)} people'
-        )
+        try:
+            bill_split = BillSplitService.create(
+                title=f"Split: {transaction.description}",
+                description=f"Created from transaction: {transaction.description}",
+                total_amount=abs(transaction.amount),
+                split_type=split_type,
+                person_ids=person_ids,
+                custom_amounts=custom_amounts,
+                history_description=f'Bill created from transaction "{transaction.description}" with {len(person_ids)} people',
+            )
+        except BillSplitError as e:
+            messages.error(request, str(e))
+            return redirect('bill_split_home')
         
         messages.success(request, f'Bill split created from transaction!')
         return redirect('bill_split_detail', pk=bill_split.pk)
@@ -216,7 +259,7 @@ def create_bill_from_transaction(request, tx_pk):
 def bill_split_detail(request, pk):
     """View bill split details"""
     bill_split = get_object_or_404(BillSplit, pk=pk)
-    split_items = bill_split.billsplititem_set.all()
+    split_items = bill_split.billsplititem_set.select_related('person')
     history = bill_split.billsplithistory_set.all()
     
     context = {
@@ -233,31 +276,55 @@ def mark_payment(request, pk):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            item = get_object_or_404(BillSplitItem, pk=pk)
-            is_paid = data.get('is_paid', False)
-            
-            item.is_paid = is_paid
-            if is_paid:
-                item.paid_at = timezone.now()
-            else:
-                item.paid_at = None
-            item.save()
-            
-            # Create history entry
-            action = 'paid' if is_paid else 'unpaid'
-            BillSplitHistory.objects.create(
-                bill_split=item.bill_split,
-                action='paid' if is_paid else 'amount_changed',
-                description=f'{item.person.name} marked as {"paid" if is_paid else "unpaid"} - ${item.amount}'
-            )
-            
-            return JsonResponse({'success': True, 'is_paid': is_paid})
+            is_paid = bool(data.get('is_paid', False))
+            item, bill = BillSplitService.set_paid(pk, is_paid)
+            return JsonResponse({
+                'success': True,
+                'is_paid': item.is_paid,
+                'paid_amount': str(bill.paid_amount),
+                'remaining_amount': str(bill.remaining_amount),
+                'is_settled': bill.is_settled,
+            })
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
     
     return JsonResponse({'success': False, 'error': 'Invalid request'})
 
 
+@csrf_exempt
+def mark_payments(request, pk):
+    """Mark many split items of one bill as paid/unpaid in a single request"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+    try:
+        data = json.loads(request.body)
+        changes = {int(entry['item_id']): bool(entry.get('is_paid', False)) for entry in data['items']}
+    except (ValueError, TypeError, KeyError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid payload: {e}'})
+
+    try:
+        updated, bill = BillSplitService.set_paid_many(pk, changes)
+    except BillSplit.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Bill split not found'})
+    except BillSplitError as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    return JsonResponse({
+        'success': True,
+        'updated': updated,
+        'item_count': bill.item_count,
+        'paid_count': bill.paid_count,
+        'paid_amount': str(bill.paid_amount),
+        'remaining_amount': str(bill.remaining_amount),
+        'is_settled': bill.is_settled,
+    })
+
+
+def settlement_plan(request):
+    """Minimal set of UPI payments that settles every open bill"""
+    transfers = settlement.settlement_plan()
+    return JsonResponse({'success': True, 'count': len(transfers), 'transfers': transfers})
+
+
 def add_person(request):
     """Add a new person"""
     if request.method == 'POST':
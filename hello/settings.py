@@ -77,6 +77,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Model writes and their MongoDB outbox rows commit together
+        'ATOMIC_REQUESTS': True,
     }
 }
 
@@ -1,14 +1,22 @@
 from django.shortcuts import render
 from finance.models import CashTransaction
+from finance.pagination import keyset_page
+from finance import ml
+from finance.categories import categorize
+from finance.services import cash_totals, category_breakdown
+
+
+PAGE_SIZE = 50
 
 
 def landing(request):
     # Get real cash transactions from database
     cash_transactions = CashTransaction.objects.all()
     
-    # Calculate totals
-    cash_income = sum(t.amount for t in cash_transactions if t.type == 'income')
-    cash_expense = sum(t.amount for t in cash_transactions if t.type == 'expense')
+    # Calculate totals in the database instead of iterating every row
+    totals = cash_totals()
+    cash_income = totals['income']
+    cash_expense = totals['expense']
     
     # Mock online transactions for demo (you can replace with real data later)
     online_income = 1800
@@ -55,22 +63,27 @@ def landing(request):
 
 
 def all_transactions(request):
-    # Reuse or fetch transactions; using stub data for now
+    sort_order = request.GET.get('sort', 'desc')  # 'asc' or 'desc'
+    after = request.GET.get('after', '')
+    rows, next_cursor = keyset_page(
+        CashTransaction.objects.all(), after, PAGE_SIZE, descending=(sort_order != 'asc')
+    )
+
     transactions = [
-        {"date": "2025-10-01", "description": "Salary", "amount": 2500, "type": "income"},
-        {"date": "2025-10-02", "description": "Rent", "amount": -800, "type": "expense"},
-        {"date": "2025-10-03", "description": "Groceries", "amount": -120, "type": "expense"},
-        {"date": "2025-09-28", "description": "Dining", "amount": -45.5, "type": "expense"},
-        {"date": "2025-09-25", "description": "Freelance", "amount": 400, "type": "income"},
+        {
+            "date": t.created_at.strftime("%Y-%m-%d"),
+            "description": t.description,
+            "amount": t.amount if t.type == 'income' else -t.amount,
+            "type": t.type,
+        }
+        for t in rows
     ]
 
-    sort_order = request.GET.get('sort', 'desc')  # 'asc' or 'desc'
-    reverse = (sort_order != 'asc')
-    transactions_sorted = sorted(transactions, key=lambda t: t["date"], reverse=reverse)
-
     return render(request, 'transactions.html', {
-        'transactions': transactions_sorted,
+        'transactions': transactions,
         'sort': sort_order,
+        'after': after,
+        'next_cursor': next_cursor,
     })
 
 
@@ -78,9 +91,10 @@ def ai_agent(request):
     # Get real cash transactions from database
     cash_transactions = CashTransaction.objects.all()
     
-    # Calculate totals
-    cash_income = sum(t.amount for t in cash_transactions if t.type == 'income')
-    cash_expense = sum(t.amount for t in cash_transactions if t.type == 'expense')
+    # Calculate totals in the database instead of iterating every row
+    totals = cash_totals()
+    cash_income = totals['income']
+    cash_expense = totals['expense']
     
     # Mock online transactions for demo
     online_income = 1800
@@ -97,7 +111,8 @@ def ai_agent(request):
             "date": t.created_at.strftime("%Y-%m-%d"),
             "description": f"[Cash] {t.description}",
             "amount": t.amount,
-            "type": t.type
+            "type": t.type,
+            "category": t.category,
         })
     
     # Add some mock online transactions
@@ -106,10 +121,27 @@ def ai_agent(request):
         {"date": "2025-10-14", "description": "[Online] Rent Payment", "amount": -800, "type": "expense"},
         {"date": "2025-10-13", "description": "[Online] Grocery Shopping", "amount": -150, "type": "expense"},
     ]
+    for t in online_transactions:
+        t["category"] = categorize(t["description"])
     recent_transactions = recent_transactions + online_transactions[:3-len(recent_transactions)]
+
+    # Whole-ledger expense breakdown as one GROUP BY on the stored category
+    breakdown = [
+        {"category": row["category"], "total": float(row["total"]), "count": row["count"]}
+        for row in category_breakdown()
+    ]
+
+    # Savings-model estimate for the latest month with computed features
+    try:
+        predictions = ml.predict_months()
+    except ml.ModelError:
+        predictions = []
+    savings_prediction = predictions[-1] if predictions else None
     
     context = {
         'transactions': recent_transactions,
+        'category_breakdown': breakdown,
+        'savings_prediction': savings_prediction,
         'cash_income': cash_income,
         'cash_expense': cash_expense,
         'online_income': online_income,
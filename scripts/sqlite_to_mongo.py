@@ -7,21 +7,62 @@ This script is intentionally conservative: it reads tables and inserts documents
 deleting existing data. It supports exporting to JSON files (optional) and importing
 from JSON files if configured.
 
+Tables are streamed with fetchmany() in fixed-size chunks and migrated in parallel, one
+worker per table. After every chunk the last migrated rowid is written to a checkpoint
+file, so a killed migration resumes where it stopped; the checkpoint is removed once the
+table is done, so the next run copies every row again. Documents are upserted on the
+table's `id` column so a replayed chunk or a re-run does not create duplicates.
+
+Optional JSON exports are streamed row by row (JSON array or NDJSON, optionally gzip/zstd
+compressed); `--import` reads the configured files back line by line through mmap, and
+falls back to incremental decoding for pretty-printed exports from older versions.
+
 Run from project root (where manage.py lives):
-  python scripts\sqlite_to_mongo.py
+  python scripts\\sqlite_to_mongo.py [--workers 4] [--chunk-size 1000] [--dry-run] [--restart]
+  python scripts\\sqlite_to_mongo.py --json-format ndjson --compress gzip
+  python scripts\\sqlite_to_mongo.py --import
 
 """
+import argparse
+import codecs
+import gzip
+import io
+import itertools
 import json
+import mmap
 import os
+import re
 import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ReplaceOne
 
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONFIG_PATH = os.path.join(ROOT, 'static', 'config', 'mongo_transfer.json')
 SQLITE_DB = os.path.join(ROOT, 'db.sqlite3')
+CHECKPOINT_DIR = os.path.join(ROOT, 'exports', 'checkpoints')
+
+# Known tables: the config's collection names are tried first, then these Django tables
+DJANGO_TABLES = [
+    'finance_cashtransaction',
+    'finance_person',
+    'finance_billsplit',
+    'finance_billsplititem',
+    'finance_billsplithistory',
+    'expenses',
+    'incomes'
+]
+
+BILL_SPLIT_TABLES = {
+    'users': 'finance_person',
+    'bills': 'finance_billsplit',
+    'bill_items': 'finance_billsplititem',
+    'transactions': 'finance_cashtransaction',
+    'history': 'finance_billsplithistory'
+}
 
 
 def load_config():
@@ -29,14 +70,48 @@ def load_config():
         return json.load(f)
 
 
-def sqlite_rows(table_name):
-    conn = sqlite3.connect(SQLITE_DB)
+def connect_sqlite():
+    # Read-only: the migration never writes to the source database
+    conn = sqlite3.connect(f'file:{SQLITE_DB}?mode=ro', uri=True)
     conn.row_factory = sqlite3.Row
+    return conn
+
+
+def sqlite_tables():
+    conn = connect_sqlite()
+    try:
+        return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+
+
+def sqlite_chunks(conn, table_name, after_rowid=0, chunk_size=1000):
+    """Yield lists of (rowid, row dict) in rowid order, never holding more than one chunk"""
     cur = conn.cursor()
-    cur.execute(f"SELECT * FROM {table_name}")
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+    cur.execute(
+        f'SELECT rowid AS "__rowid__", * FROM "{table_name}" WHERE rowid > ? ORDER BY rowid',
+        (after_rowid,)
+    )
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunk = []
+        for r in rows:
+            row = dict(r)
+            chunk.append((row.pop('__rowid__'), row))
+        yield chunk
+
+
+def sqlite_rows(table_name, chunk_size=1000):
+    """Stream every row of a table as a dict"""
+    conn = connect_sqlite()
+    try:
+        for chunk in sqlite_chunks(conn, table_name, chunk_size=chunk_size):
+            for _, row in chunk:
+                yield row
+    finally:
+        conn.close()
 
 
 def convert_row_types(row):
@@ -53,114 +128,348 @@ def convert_row_types(row):
     return out
 
 
+def checkpoint_path(coll_name, table):
+    return os.path.join(CHECKPOINT_DIR, f'{coll_name}__{table}.json')
+
+
+def read_checkpoint(coll_name, table):
+    try:
+        with open(checkpoint_path(coll_name, table), 'r', encoding='utf-8') as f:
+            return int(json.load(f).get('last_rowid', 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def write_checkpoint(coll_name, table, last_rowid, migrated):
+    # Write-then-rename so a crash never leaves a truncated checkpoint behind
+    path = checkpoint_path(coll_name, table)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'last_rowid': last_rowid, 'migrated': migrated}, f)
+    os.replace(tmp, path)
+
+
+def clear_checkpoint(coll_name, table):
+    try:
+        os.remove(checkpoint_path(coll_name, table))
+    except FileNotFoundError:
+        pass
+
+
+def migrate_table(db, coll_name, table, chunk_size, dry_run=False, restart=False):
+    """Stream one table into one collection; returns a summary dict"""
+    after = 0 if (restart or dry_run) else read_checkpoint(coll_name, table)
+    migrated = 0
+    started = time.perf_counter()
+    collection = None if dry_run else db[coll_name]
+    if collection is not None:
+        # Upserts below are keyed on the sqlite id column
+        collection.create_index('id')
+
+    conn = connect_sqlite()
+    try:
+        for chunk in sqlite_chunks(conn, table, after, chunk_size):
+            docs = [convert_row_types(row) for _, row in chunk]
+            if collection is not None:
+                ops = [ReplaceOne({'id': d['id']}, d, upsert=True) for d in docs if 'id' in d]
+                plain = [d for d in docs if 'id' not in d]
+                if ops:
+                    collection.bulk_write(ops, ordered=False)
+                if plain:
+                    collection.insert_many(plain, ordered=False)
+            migrated += len(docs)
+            after = chunk[-1][0]
+            if not dry_run:
+                write_checkpoint(coll_name, table, after, migrated)
+    finally:
+        conn.close()
+    if not dry_run:
+        # Finished: the next run copies the whole table again, picking up edited rows
+        clear_checkpoint(coll_name, table)
+
+    seconds = time.perf_counter() - started
+    return {
+        'imported': migrated,
+        'table': table,
+        'last_rowid': after,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(migrated / seconds) if seconds else 0,
+    }
+
+
+# -- JSON export/import --------------------------------------------------------
+#
+# Exports are encoded one row at a time straight from the SQLite cursor into a
+# buffered (optionally compressed) file, so memory stays flat however large the
+# table is. Both formats put exactly one document per line: NDJSON, or a JSON
+# array written as "[", one element per line, "]". Imports read the file back
+# line by line (through mmap when uncompressed).
+
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+WRITE_BUFFER = 1 << 20
+
+
+def open_text_output(path, compression=None):
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit('zstd compression requires the optional "zstandard" package')
+        raw = open(path, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw, closefd=True), encoding='utf-8')
+    return open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER)
+
+
+def write_json_stream(docs, out, fmt='json'):
+    """Encode documents one by one into `out`; returns the number written"""
+    encode = json.JSONEncoder(default=str, ensure_ascii=False).encode
+    count = 0
+    if fmt == 'ndjson':
+        for doc in docs:
+            out.write(encode(doc))
+            out.write('\n')
+            count += 1
+        return count
+
+    out.write('[\n')
+    for doc in docs:
+        if count:
+            out.write(',\n')
+        out.write(encode(doc))
+        count += 1
+    out.write('\n]\n')
+    return count
+
+
+def export_json(table, out_file, fmt='json', compression=None):
+    suffix = COMPRESSION_SUFFIXES.get(compression, '')
+    if suffix and not out_file.endswith(suffix):
+        out_file += suffix
+    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+    docs = (convert_row_types(r) for r in sqlite_rows(table))
+    with open_text_output(out_file, compression) as f:
+        count = write_json_stream(docs, f, fmt)
+    print(f"Wrote {count} rows to export JSON {out_file}")
+
+
+def _open_binary(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def _binary_lines(path):
+    """Yield raw lines of a (possibly compressed) file without loading it"""
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as f:
+            yield from f
+    elif path.endswith('.zst'):
+        import zstandard
+        with open(path, 'rb') as raw:
+            yield from io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+    else:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from iter(mm.readline, b'')
+
+
+_SEPARATORS = re.compile(r'[\s,\[\]]*')
+
+
+def iter_json_stream(path, chunk_size=1 << 16):
+    """Decode any JSON array (pretty-printed too), NDJSON or concatenated objects, a chunk at a time"""
+    decoder = json.JSONDecoder()
+    to_text = codecs.getincrementaldecoder('utf-8')().decode
+    buffer, pos, eof = '', 0, False
+    with _open_binary(path) as f:
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos < len(buffer):
+                try:
+                    doc, pos = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if eof:
+                        raise SystemExit(f"{path} is not valid JSON")
+                else:
+                    yield doc
+                    continue
+            elif eof:
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + to_text(chunk, final=eof), 0
+
+
+def iter_json_documents(path):
+    """Parse an export document by document
+
+    Files this script writes hold one document per line and are read through
+    mmap; pretty-printed (indent=2) or single-line arrays from older versions
+    fall back to iter_json_stream(), skipping the documents already yielded.
+    """
+    count = 0
+    for line in _binary_lines(path):
+        line = line.strip()
+        if line.endswith(b','):
+            line = line[:-1]
+        if line.startswith(b','):
+            line = line[1:]
+        if not line or line in (b'[', b']'):
+            continue
+        try:
+            doc = json.loads(line)
+        except ValueError:
+            break
+        if not isinstance(doc, dict):  # a whole array on one line
+            break
+        yield doc
+        count += 1
+    else:
+        return
+    yield from itertools.islice(iter_json_stream(path), count, None)
+
+
+def parse_dates(doc, date_fields):
+    for field in date_fields:
+        value = doc.get(field)
+        if isinstance(value, str):
+            try:
+                doc[field] = datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    return doc
+
+
+def import_json(db, coll_name, in_file, upsert=False, date_fields=(), chunk_size=1000):
+    """Stream a JSON export back into MongoDB in chunks; returns the document count"""
+    collection = db[coll_name]
+    count = 0
+    chunk = []
+
+    def flush():
+        if not chunk:
+            return
+        if upsert:
+            ops = [ReplaceOne({'id': d['id']}, d, upsert=True) for d in chunk if 'id' in d]
+            plain = [d for d in chunk if 'id' not in d]
+            if ops:
+                collection.bulk_write(ops, ordered=False)
+            if plain:
+                collection.insert_many(plain, ordered=False)
+        else:
+            collection.insert_many(chunk, ordered=False)
+        chunk.clear()
+
+    for doc in iter_json_documents(in_file):
+        chunk.append(parse_dates(doc, date_fields))
+        count += 1
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+    return count
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Copy rows from db.sqlite3 into MongoDB Atlas')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per fetchmany()/bulk_write chunk')
+    parser.add_argument('--workers', type=int, default=4, help='Tables migrated in parallel')
+    parser.add_argument('--dry-run', action='store_true', help='Read and convert rows only; report rows/sec per table')
+    parser.add_argument('--restart', action='store_true', help='Ignore checkpoints left by an interrupted run and migrate every table from the start')
+    parser.add_argument('--json-format', choices=['json', 'ndjson'], default=None, help='Format for the optional JSON exports (default: config or json)')
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], default=None, help='Compress the optional JSON exports')
+    parser.add_argument('--import', dest='import_files', action='store_true', help='Import the files listed in config.import into MongoDB and exit')
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
     cfg = load_config()
-    atlas_uri = cfg['mongodb'].get('atlas_uri') or os.environ.get(cfg['mongodb'].get('atlas_uri_env'))
-    if not atlas_uri:
-        raise SystemExit('MongoDB Atlas URI not found in config or environment')
 
+    db = None
     db_name = cfg['mongodb'].get('database')
-    client = MongoClient(atlas_uri)
-    db = client[db_name]
+    if not args.dry_run:
+        atlas_uri = cfg['mongodb'].get('atlas_uri') or os.environ.get(cfg['mongodb'].get('atlas_uri_env'))
+        if not atlas_uri:
+            raise SystemExit('MongoDB Atlas URI not found in config or environment')
+        client = MongoClient(atlas_uri)
+        db = client[db_name]
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+
+    if args.import_files:
+        if db is None:
+            raise SystemExit('--import cannot be combined with --dry-run')
+        for i in cfg.get('import', {}).get('collections', []):
+            in_file = os.path.join(ROOT, i.get('input_file'))
+            if not os.path.exists(in_file):
+                print(f"Import file not found: {in_file}")
+                continue
+            count = import_json(db, i.get('name'), in_file, i.get('upsert', False), i.get('date_fields', []), args.chunk_size)
+            print(f"Imported {count} documents into '{db_name}.{i.get('name')}' from {in_file}")
+        return
 
     # Ensure exports/imports directories exist
     exports_dir = os.path.join(ROOT, 'exports')
     os.makedirs(exports_dir, exist_ok=True)
 
-    # Map simple tables to configured collections
-    coll_map = cfg['mongodb'].get('collections', {})
-
-    # Basic mapping: check for tables corresponding to collections
+    tables = sqlite_tables()
     summary = {}
-    for table, coll_name in coll_map.items():
-        # Guess the sqlite table name from Django model names used in this project
-        # Known tables: finance_cashtransaction, finance_person, finance_billsplit, finance_billsplititem, finance_billsplithistory
-        # But config expects 'expenses' and 'incomes' - we'll attempt to read those tables first
-        sqlite_table_candidates = [table]
-
-        # additionally try common Django table names
-        possible = [
-            'finance_cashtransaction',
-            'finance_person',
-            'finance_billsplit',
-            'finance_billsplititem',
-            'finance_billsplithistory',
-            'expenses',
-            'incomes'
-        ]
-        sqlite_table_candidates.extend([p for p in possible if p not in sqlite_table_candidates])
-
-        rows = []
-        found_table = None
-        for t in sqlite_table_candidates:
-            try:
-                rows = sqlite_rows(t)
-                found_table = t
-                break
-            except Exception:
-                continue
+    jobs = []
 
+    # Map simple tables to configured collections: the config expects 'expenses' and
+    # 'incomes', so try a table of that name first, then the Django tables
+    coll_map = cfg['mongodb'].get('collections', {})
+    for table, coll_name in coll_map.items():
+        candidates = [table] + [p for p in DJANGO_TABLES if p != table]
+        found_table = next((t for t in candidates if t in tables), None)
         if found_table is None:
             print(f"No sqlite table found for target collection '{coll_name}' (tried candidates)")
             summary[coll_name] = {'imported': 0, 'note': 'no table found'}
             continue
-
-        docs = [convert_row_types(r) for r in rows]
-        if docs:
-            # Remove sqlite's implicit id column name 'id' if present: keep as-is, Mongo will create _id
-            for d in docs:
-                if 'id' in d and '_id' not in d:
-                    # keep id as a field, but also allow Mongo to generate its own _id
-                    pass
-
-            res = db[coll_name].insert_many(docs)
-            print(f"Inserted {len(res.inserted_ids)} documents into '{db_name}.{coll_name}' from table '{found_table}'")
-            summary[coll_name] = {'imported': len(res.inserted_ids), 'table': found_table}
-        else:
-            print(f"No rows found in sqlite table '{found_table}' for collection '{coll_name}'")
-            summary[coll_name] = {'imported': 0, 'table': found_table}
+        jobs.append((coll_name, found_table))
 
         # Optionally write an export JSON
         export_cfgs = cfg.get('export', {}).get('collections', [])
         for e in export_cfgs:
-            if e.get('name') == table:
-                out_file = os.path.join(ROOT, e.get('output_file'))
-                os.makedirs(os.path.dirname(out_file), exist_ok=True)
-                with open(out_file, 'w', encoding='utf-8') as f:
-                    json.dump(docs, f, default=str, indent=2)
-                print(f"Wrote export JSON to {out_file}")
+            if e.get('name') == table and not args.dry_run:
+                export_json(
+                    found_table,
+                    os.path.join(ROOT, e.get('output_file')),
+                    fmt=args.json_format or e.get('format', 'json'),
+                    compression=args.compress or e.get('compression'),
+                )
 
     # handle bill_split collections (if present)
     bs_map = cfg['mongodb'].get('bill_split_collections', {})
     if bs_map:
-        # Map Django bill split tables
-        django_map = {
-            'users': 'finance_person',
-            'bills': 'finance_billsplit',
-            'bill_items': 'finance_billsplititem',
-            'transactions': 'finance_cashtransaction',
-            'history': 'finance_billsplithistory'
-        }
-        for coll, sqlite_table in django_map.items():
+        for coll, sqlite_table in BILL_SPLIT_TABLES.items():
             coll_name = bs_map.get(coll) or coll
-            try:
-                rows = sqlite_rows(sqlite_table)
-            except Exception:
+            if sqlite_table not in tables:
                 print(f"No sqlite table '{sqlite_table}' for bill-split collection '{coll_name}'")
                 summary[coll_name] = {'imported': 0, 'note': 'no table found'}
                 continue
+            jobs.append((coll_name, sqlite_table))
 
-            docs = [convert_row_types(r) for r in rows]
-            if docs:
-                res = db[coll_name].insert_many(docs)
-                print(f"Inserted {len(res.inserted_ids)} documents into '{db_name}.{coll_name}' from table '{sqlite_table}'")
-                summary[coll_name] = {'imported': len(res.inserted_ids), 'table': sqlite_table}
-            else:
-                print(f"No rows to import for '{sqlite_table}'")
-                summary[coll_name] = {'imported': 0, 'table': sqlite_table}
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {
+            coll_name: pool.submit(migrate_table, db, coll_name, table, args.chunk_size, args.dry_run, args.restart)
+            for coll_name, table in jobs
+        }
+        for coll_name, future in futures.items():
+            result = future.result()
+            summary[coll_name] = result
+            verb = 'Read' if args.dry_run else 'Migrated'
+            print(f"{verb} {result['imported']} rows from '{result['table']}' into '{db_name}.{coll_name}' "
+                  f"in {result['seconds']}s ({result['rows_per_sec']} rows/sec)")
 
     # Summary
-    print('\nMigration summary:')
+    print('\nDry run throughput:' if args.dry_run else '\nMigration summary:')
     for k, v in summary.items():
         print(f" - {k}: {v}")
 
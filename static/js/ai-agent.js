@@ -7,6 +7,7 @@ class AIFinancialAgent {
         this.onlineExpense = window.onlineExpense || 0;
         this.totalIncome = window.totalIncome || 0;
         this.totalExpense = window.totalExpense || 0;
+        this.categoryBreakdown = window.categoryBreakdown || [];
         
         this.config = null;
         this.categoryAnalysis = {};
@@ -126,7 +127,7 @@ class AIFinancialAgent {
 
         // Analyze each transaction
         this.transactions.forEach(transaction => {
-            const category = this.categorizeTransaction(transaction.description);
+            const category = transaction.category || this.categorizeTransaction(transaction.description);
             const amount = Math.abs(transaction.amount);
             
             // Category analysis
@@ -137,8 +138,14 @@ class AIFinancialAgent {
                     transactions: []
                 };
             }
-            this.categoryAnalysis[category].total += amount;
-            this.categoryAnalysis[category].count += 1;
+            // Cash expenses are already counted in the server breakdown below
+            const counted = this.categoryBreakdown.length > 0
+                && transaction.type === 'expense'
+                && transaction.description.includes('[Cash]');
+            if (!counted) {
+                this.categoryAnalysis[category].total += amount;
+                this.categoryAnalysis[category].count += 1;
+            }
             this.categoryAnalysis[category].transactions.push(transaction);
 
             // Method analysis
@@ -154,6 +161,15 @@ class AIFinancialAgent {
             this.spendingPatterns.byDay[dayKey] += amount;
         });
 
+        // Ledger-wide cash expense totals per category, from one GROUP BY on the server
+        this.categoryBreakdown.forEach(row => {
+            if (!this.categoryAnalysis[row.category]) {
+                this.categoryAnalysis[row.category] = { total: 0, count: 0, transactions: [] };
+            }
+            this.categoryAnalysis[row.category].total += row.total;
+            this.categoryAnalysis[row.category].count += row.count;
+        });
+
         console.log('Transaction analysis completed:', {
             categoryAnalysis: this.categoryAnalysis,
             spendingPatterns: this.spendingPatterns